@@ -1,13 +1,43 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks, Header, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import Text, any_, bindparam, cast, delete, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from app.core.config import settings
+from app.core.http_cache import table_version, make_etag, is_not_modified, not_modified, cached_json
+from app.core.loop_monitor import loop_monitor
+from app.core.profiling import (
+    PROFILE_DEFAULT_INTERVAL_MS, PROFILE_FORMATS, PROFILE_MAX_SECONDS, PROFILE_MODES, is_admin_token, profiler
+)
 from app.db.session import get_db, engine, AsyncSessionLocal
-from app.db.models import Base, IntelligenceSource, IntelligenceItem, ContractTask, ContractRisk
+from app.db.models import Base, CrawlJob, CrawlRun, IntelligenceSource, IntelligenceItem, IntelligenceItemBody, ContractBatch, ContractTask, ContractRisk
+from app.services.cache_service import CACHE_NAMES, cache_service
 from app.services.crawler import crawler_service
 from app.services.ai_engine import ai_engine, check_keyword_relevance
 from app.services.contract_parser import contract_parser
+from app.services.crawl_queue import JOB_STATUSES, crawl_queue
+from app.services.crawl_runs import CRAWL_STAGES, CrawlRunTrace, crawl_run_service
+from app.services.frontier import crawl_frontier
+from app.services.llm_usage import LLM_PURPOSES, USAGE_GROUPS, llm_attribution, llm_usage
+from app.services.scheduler import crawl_scheduler, reschedule_source
+from app.services.contract_analysis import (
+    analyze_contract_text, build_risk_rows, contract_task_event, expand_uploads, process_contract_batch_background
+)
+from app.services.desensitizer import rehydrate
+from app.services.events import event_bus
+from app.services.date_parser import parse_publish_date
+from app.services.trends import TREND_GROUPS, TREND_MAX_DAYS, trend_service
+from app.services.url_normalizer import normalize_url
+from app.services.search import (
+    CJK_GRAM_MAX, HEADLINE_OPTIONS, parse_search_query, escape_like, render_headline, mark_terms, highlight_snippet
+)
 import asyncio
-from datetime import datetime
+import base64
+import traceback
+import uuid
+import zipfile
+from datetime import date, datetime
 from urllib.parse import urljoin
 
 router = APIRouter()
@@ -17,74 +47,224 @@ router = APIRouter()
 async def init_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # 事件循环延迟监控（阻塞超过阈值时记录调用栈）
+    asyncio.create_task(loop_monitor.run_periodic())
+    # 拉取其他 worker 发布的缓存失效记录
+    asyncio.create_task(cache_service.run_periodic())
+    # 定时重算趋势汇总
+    asyncio.create_task(trend_service.run_periodic())
+    # LLM 用量批量写库
+    asyncio.create_task(llm_usage.run_periodic())
+    # 采集任务队列：恢复中断的信源，启动本进程的 worker（CRAWL_WORKERS=0 时只入队，由独立 worker 进程消费）
+    await crawl_queue.recover()
+    try:
+        await crawl_run_service.prune()
+    except Exception as e:
+        print(f"[CrawlRuns] Prune failed: {e}")
+    if settings.CRAWL_WORKERS > 0:
+        crawl_queue.start_workers(run_crawl_job)
+    # 按信源更新频率自适应定时采集
+    asyncio.create_task(crawl_scheduler.run_periodic())
+
+@router.on_event("shutdown")
+async def flush_llm_usage():
+    try:
+        await llm_usage.flush()
+    except Exception as e:
+        print(f"[LLMUsage] Final flush failed: {e}")
+
+# --- INGESTION HELPERS ---
+async def find_existing_urls(db: AsyncSession, normalized_urls: list) -> set:
+    """单次查询返回已采集的规范化 URL"""
+    if not normalized_urls:
+        return set()
+    result = await db.execute(
+        select(IntelligenceItem.normalized_url).where(
+            IntelligenceItem.normalized_url == any_(bindparam("links", normalized_urls, type_=ARRAY(Text)))
+        )
+    )
+    return set(result.scalars().all())
+
+
+async def insert_intelligence_items(db: AsyncSession, source_id: str, results: list) -> list:
+    """批量写入情报及正文（INSERT ... ON CONFLICT DO NOTHING），返回实际插入的记录"""
+    rows = {}
+    bodies = {}
+    now = datetime.utcnow()
+    for result in results:
+        normalized = normalize_url(result["url"])
+        if normalized in rows:
+            continue
+        item_id = str(uuid.uuid4())
+        rows[normalized] = {
+            "id": item_id,
+            "source_id": source_id,
+            "title": result["title"],
+            "title_zh": result.get("title_zh"),
+            "publish_date": result["publish_date"],
+            "published_on": parse_publish_date(result["publish_date"]),
+            "content_type": result["content_type"],
+            "summary": result["summary"],
+            "risk_tags": result["risk_tags"],
+            "risk_hint": result["risk_hint"],
+            "url": result["url"],
+            "normalized_url": normalized,
+            "relevance_score": 0.9,
+            "created_at": now,
+            "updated_at": now,
+        }
+        bodies[item_id] = {
+            "item_id": item_id,
+            "original_text": result["original_text"],
+            "translated_text": result["translated_text"],
+        }
+    if not rows:
+        return []
+
+    inserted = await db.execute(
+        pg_insert(IntelligenceItem)
+        .values(list(rows.values()))
+        .on_conflict_do_nothing(index_elements=["normalized_url"])
+        .returning(IntelligenceItem.id)
+    )
+    inserted_ids = inserted.scalars().all()
+    rows_by_id = {row["id"]: row for row in rows.values()}
+    inserted_rows = [rows_by_id[i] for i in inserted_ids]
+    if inserted_rows:
+        await db.execute(pg_insert(IntelligenceItemBody).values([bodies[i] for i in inserted_ids]))
+        # 同一事务内更新趋势汇总
+        await trend_service.record_items(db, inserted_rows)
+    skipped = len(rows) - len(inserted_rows)
+    if skipped:
+        print(f"[Dedup] {skipped} items already inserted by a concurrent crawl")
+    return inserted_rows
+
+
+def item_event(row: dict) -> dict:
+    """新情报事件：与列表接口默认字段一致"""
+    return {name: row["url"] if name == "source_url" else row.get(name) for name in LIST_DEFAULT_FIELDS}
+
+
+def source_event(source: IntelligenceSource) -> dict:
+    return {
+        "id": source.id,
+        "url": source.url,
+        "status": source.status,
+        "last_crawled_at": source.last_crawled_at,
+        "error_message": source.error_message,
+        "crawl_interval_minutes": source.crawl_interval_minutes,
+        "next_crawl_at": source.next_crawl_at,
+        "last_new_items": source.last_new_items,
+        "items_per_run": source.items_per_run,
+        "created_at": source.created_at
+    }
 
 # --- BACKGROUND TASK: Process Source ---
-async def process_source_background(source_id: str, url: str):
-    """后台处理信源爬取和AI分析"""
+# 待采集队列超过每轮处理量的该倍数时，跳过列表页抓取和链接发现，只消化队列
+DRAIN_ONLY_BACKLOG_FACTOR = 2
+
+async def process_source_background(source_id: str, url: str) -> bool:
+    """后台处理信源爬取和AI分析，返回是否成功（失败时由任务队列按退避重试）；每次运行写一条采集记录"""
+    trace = CrawlRunTrace(source_id)
+    try:
+        with llm_attribution(source_id=source_id):
+            return await crawl_source(source_id, url, trace)
+    finally:
+        if trace.outcome != "skipped":
+            await trace.save()
+
+async def crawl_source(source_id: str, url: str, trace: CrawlRunTrace) -> bool:
     async with AsyncSessionLocal() as db:
         try:
             source = await db.get(IntelligenceSource, source_id)
             if not source:
-                return
-            
-            # 1. Crawl Seed
-            markdown = await crawler_service.fetch_page(url)
-            if not markdown:
-                source.status = "error"
-                source.error_message = "Crawl failed (Empty content)"
-                await db.commit()
-                return
-
-            # 2. Smart Discovery
-            discovery = await ai_engine.detect_and_extract_links(markdown, url)
-            
-            # 获取已采集的URL列表（用于去重）
-            existing_urls_result = await db.execute(
-                select(IntelligenceItem.url).where(IntelligenceItem.url.isnot(None))
-            )
-            existing_urls = set(row[0] for row in existing_urls_result.fetchall())
-            print(f"[Dedup] Found {len(existing_urls)} existing URLs in database")
+                trace.outcome = "skipped"
+                return True
             
+            items_per_run = source.items_per_run or settings.CRAWL_ITEMS_PER_RUN
+            backlog = await crawl_frontier.pending_count(db, source.id)
             items_to_process = []
-            if discovery.get("page_type") == "list" and discovery.get("links"):
-                # 先去重，再限制数量（这样每次都能采集新文章）
-                all_links = discovery['links']
-                new_links = []
-                for link in all_links:
-                    full_url = urljoin(url, link)
-                    if full_url not in existing_urls:
-                        new_links.append(full_url)
-                    else:
-                        print(f"[Dedup] Skipping already collected: {full_url}")
-                
-                # 限制每次最多采集3篇新文章
-                links_to_process = new_links[:3]
-                print(f"Detected List Page. Processing {len(links_to_process)} new links (from {len(all_links)} total, {len(new_links)} new)")
-                items_to_process = links_to_process
+
+            if backlog >= items_per_run * DRAIN_ONLY_BACKLOG_FACTOR:
+                # 待采集队列积压较多：本轮只消化队列，不再抓取列表页和调用链接发现
+                print(f"[Frontier] {backlog} links pending, skipping discovery for {url}")
             else:
-                # 单篇文章也检查去重
-                if url not in existing_urls:
-                    items_to_process.append((url, markdown))
+                # 1. Crawl Seed
+                async with trace.span("seed_fetch"):
+                    markdown = await crawler_service.fetch_page(url)
+                if not markdown:
+                    trace.outcome = "fetch_failed"
+                    source.status = "error"
+                    source.error_message = "Crawl failed (Empty content)"
+                    reschedule_source(source, 0, ok=False, has_backlog=backlog > 0)
+                    await db.commit()
+                    event_bus.publish("source.status", source_event(source))
+                    return False
+
+                # 2. Smart Discovery
+                async with trace.span("discovery"):
+                    discovery = await ai_engine.detect_and_extract_links(markdown, url)
+
+                if discovery.get("page_type") == "list" and discovery.get("links"):
+                    # 去重后全部写入待采集队列，本轮按优先级处理其中一部分
+                    all_links = discovery['links']
+                    candidates = {}
+                    for link in all_links:
+                        full_url = urljoin(url, link)
+                        candidates.setdefault(normalize_url(full_url), full_url)
+                    async with trace.span("dedup"):
+                        existing_urls = await find_existing_urls(db, list(candidates))
+                        new_links = [(key, full_url) for key, full_url in candidates.items() if key not in existing_urls]
+                        added = await crawl_frontier.add_links(db, source.id, new_links)
+                    trace.items_discovered = len(new_links)
+                    print(f"[Dedup] {len(existing_urls)} of {len(candidates)} candidate links already collected")
+                    print(f"Detected List Page. {len(new_links)} new links ({added} newly queued) from {len(all_links)} total")
                 else:
-                    print(f"[Dedup] Skipping already collected: {url}")
+                    # 单篇文章也检查去重
+                    async with trace.span("dedup"):
+                        collected = await find_existing_urls(db, [normalize_url(url)])
+                    if not collected:
+                        items_to_process.append((url, markdown))
+                    else:
+                        print(f"[Dedup] Skipping already collected: {url}")
+
+            # 3. 从待采集队列取本轮要处理的链接（含以往轮次发现但未处理的）
+            async with trace.span("dedup"):
+                frontier_links = await crawl_frontier.next_links(db, source.id, items_per_run - len(items_to_process))
+                collected = await find_existing_urls(db, [link.normalized_url for link in frontier_links])
+            frontier_ids = {}
+            already_collected = []
+            for link in frontier_links:
+                if link.normalized_url in collected:
+                    already_collected.append(link.id)
+                else:
+                    frontier_ids[link.url] = link.id
+                    items_to_process.append(link.url)
+            await crawl_frontier.finish(db, already_collected, [])
             
             if not items_to_process:
                 print(f"[Dedup] All links already collected, nothing new to process")
+                trace.outcome = "no_new"
                 source.status = "active"
                 source.last_crawled_at = datetime.utcnow()
+                reschedule_source(source, 0)
                 await db.commit()
-                return
+                event_bus.publish("source.status", source_event(source))
+                return True
 
             processed_count = 0
             errors = []
+            fetch_failed = set()
 
             # 并行爬取所有文章
             async def process_single_item(item):
                 try:
                     if isinstance(item, str):
                         target_url = item
-                        target_md = await crawler_service.fetch_page(target_url)
+                        async with trace.span("item_fetch"):
+                            target_md = await crawler_service.fetch_page(target_url)
                         if not target_md: 
+                            fetch_failed.add(target_url)
                             return None
                     else:
                         target_url, target_md = item
@@ -96,7 +276,8 @@ async def process_source_background(source_id: str, url: str):
                         return None
                     
                     # Extract with URL for site-specific hints
-                    data = await ai_engine.extract_intelligence(target_md, target_url)
+                    async with trace.span("extraction"):
+                        data = await ai_engine.extract_intelligence(target_md, target_url)
                     if not data.get("title"): 
                         return None
                     
@@ -170,44 +351,65 @@ async def process_source_background(source_id: str, url: str):
             
             results = await asyncio.gather(*[limited_process(item) for item in items_to_process])
             
-            # 保存结果
-            for result in results:
-                if result:
-                    db_item = IntelligenceItem(
-                        source_id=source.id,
-                        title=result["title"],
-                        title_zh=result.get("title_zh"),
-                        publish_date=result["publish_date"],
-                        content_type=result["content_type"],
-                        summary=result["summary"],
-                        risk_tags=result["risk_tags"],
-                        risk_hint=result["risk_hint"],
-                        url=result["url"],
-                        original_text=result["original_text"],
-                        translated_text=result["translated_text"],
-                        relevance_score=0.9
-                    )
-                    db.add(db_item)
-                    processed_count += 1
-
-            source.status = "active" if processed_count > 0 else "error"
-            source.last_crawled_at = datetime.utcnow()
-            if not processed_count:
-                source.error_message = "No articles extracted"
-            
-            await db.commit()
-            print(f"Source {url} processed: {processed_count} items")
+            # 保存结果：批量插入，规范化 URL 冲突（并发采集到同一篇）时跳过
+            extracted = [r for r in results if r]
+            async with trace.span("db_write"):
+                inserted_rows = await insert_intelligence_items(db, source.id, extracted)
+                processed_count = len(inserted_rows)
+
+                # 已处理的链接移出队列（包括被过滤的），抓取失败的留待下一轮重试
+                await crawl_frontier.finish(
+                    db,
+                    [link_id for link_url, link_id in frontier_ids.items() if link_url not in fetch_failed],
+                    [link_id for link_url, link_id in frontier_ids.items() if link_url in fetch_failed],
+                )
+                backlog = await crawl_frontier.pending_count(db, source.id)
+
+                source.status = "active" if extracted else "error"
+                source.last_crawled_at = datetime.utcnow()
+                if not extracted:
+                    source.error_message = "No articles extracted"
+                reschedule_source(source, processed_count, ok=bool(extracted), has_backlog=backlog > 0)
+                
+                await db.commit()
+            trace.outcome = "ok" if extracted else "no_articles"
+            trace.items_processed = len(items_to_process)
+            trace.items_inserted = processed_count
+            if inserted_rows:
+                event_bus.publish("item.created", [item_event(row) for row in inserted_rows])
+            event_bus.publish("source.status", source_event(source))
+            print(f"Source {url} processed: {processed_count} items, {backlog} links left in frontier")
+            return bool(extracted)
             
         except Exception as e:
             print(f"Background task error: {e}")
+            trace.outcome = "error"
+            trace.error = traceback.format_exc()
             try:
                 source = await db.get(IntelligenceSource, source_id)
                 if source:
                     source.status = "error"
                     source.error_message = str(e)[:200]
+                    reschedule_source(source, 0, ok=False)
                     await db.commit()
+                    event_bus.publish("source.status", source_event(source))
             except:
                 pass
+            return False
+
+
+async def run_crawl_job(source_id: str, url: str) -> bool:
+    """任务队列的处理函数：领取后标记为处理中，再执行采集"""
+    async with AsyncSessionLocal() as db:
+        source = await db.get(IntelligenceSource, source_id)
+        if not source:
+            return True
+        if source.status != "processing":
+            source.status = "processing"
+            source.error_message = None
+            await db.commit()
+            event_bus.publish("source.status", source_event(source))
+    return await process_source_background(source_id, url)
 
 # --- INTELLIGENCE ENDPOINTS ---
 
@@ -227,102 +429,414 @@ async def add_source(url: str, background_tasks: BackgroundTasks, db: AsyncSessi
     # 2. Create source with pending status
     source = IntelligenceSource(url=url, status="processing")
     db.add(source)
+    await db.flush()
+    
+    # 3. Queue background processing（与信源在同一事务中入队）
+    await crawl_queue.enqueue(db, [source.id])
     await db.commit()
+    crawl_queue.wake()
     await db.refresh(source)
-    
-    # 3. Start background processing
-    asyncio.create_task(process_source_background(source.id, url))
+    event_bus.publish("source.status", source_event(source))
     
     return {"status": "processing", "source_id": source.id, "message": "Source added, processing in background"}
 
+# 列表默认不返回正文大字段，需要时通过 fields 显式指定
+LIST_DEFAULT_FIELDS = [
+    "id", "source_id", "source_url", "title", "title_zh", "publish_date", "published_on", "content_type",
+    "summary", "risk_tags", "risk_hint", "relevance_score", "created_at",
+]
+LIST_LARGE_FIELDS = ["original_text", "translated_text"]
+LIST_MAX_LIMIT = 500
+
+
+def encode_cursor(sort_key, item_id: str) -> str:
+    raw = f"{sort_key.isoformat()}|{item_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        sort_key, item_id = raw.split("|", 1)
+        return datetime.fromisoformat(sort_key), item_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_list_fields(fields: str = None) -> list:
+    if not fields:
+        return LIST_DEFAULT_FIELDS
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    if requested == ["all"]:
+        return LIST_DEFAULT_FIELDS + LIST_LARGE_FIELDS
+    unknown = set(requested) - set(LIST_DEFAULT_FIELDS + LIST_LARGE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return ["id"] + [f for f in requested if f != "id"]
+
+
+def item_column(name: str):
+    """列表/详情字段对应的查询列；正文优先取正文表，兼容未迁移的旧列"""
+    if name == "source_url":
+        return func.coalesce(IntelligenceItem.url, IntelligenceSource.url).label("source_url")
+    if name in LIST_LARGE_FIELDS:
+        return func.coalesce(getattr(IntelligenceItemBody, name), getattr(IntelligenceItem, name)).label(name)
+    return getattr(IntelligenceItem, name)
+
+
+def apply_item_joins(query, field_names: list):
+    """只在请求了相关字段时才关联信源表/正文表"""
+    if "source_url" in field_names:
+        query = query.outerjoin(IntelligenceSource, IntelligenceItem.source_id == IntelligenceSource.id)
+    if any(name in LIST_LARGE_FIELDS for name in field_names):
+        query = query.outerjoin(IntelligenceItemBody, IntelligenceItemBody.item_id == IntelligenceItem.id)
+    return query
+
+
+def item_filter_conditions(
+    source_id: str = None,
+    content_type: str = None,
+    tag: str = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    published_from: date = None,
+    published_to: date = None,
+) -> list:
+    """情报筛选条件（列表/检索/按条件删除共用），各条件均有对应索引"""
+    conditions = []
+    if source_id:
+        conditions.append(IntelligenceItem.source_id == source_id)
+    if content_type:
+        conditions.append(IntelligenceItem.content_type == content_type)
+    if tag:
+        # 命中 risk_tags 的 GIN 表达式索引
+        conditions.append(cast(IntelligenceItem.risk_tags, JSONB).contains([tag]))
+    if date_from:
+        conditions.append(IntelligenceItem.created_at >= date_from)
+    if date_to:
+        conditions.append(IntelligenceItem.created_at < date_to)
+    # 发布日期范围为闭区间，走 published_on 索引
+    if published_from:
+        conditions.append(IntelligenceItem.published_on >= published_from)
+    if published_to:
+        conditions.append(IntelligenceItem.published_on <= published_to)
+    return conditions
+
+
 @router.get("/intelligence/list")
-async def list_intelligence(db: AsyncSession = Depends(get_db)):
-    # 性能优化: 使用 selectinload 预加载关联数据
-    from sqlalchemy.orm import selectinload
-    
+async def list_intelligence(
+    request: Request,
+    limit: int = Query(50, ge=1, le=LIST_MAX_LIMIT),
+    cursor: str = None,
+    fields: str = None,
+    sort: str = Query("created", pattern="^(created|published)$"),
+    source_id: str = None,
+    content_type: str = None,
+    tag: str = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    published_from: date = None,
+    published_to: date = None,
+    ids: str = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    情报列表 - 游标分页，默认按 (created_at, id) 倒序；sort=published 时按 (published_on, id) 倒序，
+    此时没有可识别发布日期的条目不会返回。
+    下一页游标通过响应头 X-Next-Cursor 返回；fields 为逗号分隔的字段投影（all 表示全部字段）。
+    """
+    sort_column = IntelligenceItem.published_on if sort == "published" else IntelligenceItem.created_at
+
+    field_names = parse_list_fields(fields)
+    if cursor:
+        decode_cursor(cursor)  # 先校验游标，避免无效游标命中 304
+
+    # 表版本未变化时直接返回 304；source_url 字段依赖信源表
+    versions = [await table_version(db, IntelligenceItem)]
+    if "source_url" in field_names:
+        versions.append(await table_version(db, IntelligenceSource))
+    etag = make_etag(request, *versions)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    columns = [item_column(name) for name in field_names]
+    # 游标所需的排序键
+    columns += [sort_column.label("_sort_key"), IntelligenceItem.id.label("_id")]
+
+    query = apply_item_joins(select(*columns), field_names)
+
+    query = query.where(*item_filter_conditions(
+        source_id, content_type, tag, date_from, date_to, published_from, published_to
+    ))
+    if sort == "published":
+        query = query.where(IntelligenceItem.published_on.isnot(None))
+    if ids:
+        query = query.where(IntelligenceItem.id.in_([i for i in ids.split(",") if i]))
+    if cursor:
+        cursor_key, cursor_id = decode_cursor(cursor)
+        if sort == "published":
+            cursor_key = cursor_key.date()
+        query = query.where(tuple_(sort_column, IntelligenceItem.id) < tuple_(cursor_key, cursor_id))
+
+    query = query.order_by(sort_column.desc(), IntelligenceItem.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1]._sort_key, rows[-1]._id)
+
+    return cached_json([{name: getattr(row, name) for name in field_names} for row in rows], etag, headers)
+
+@router.get("/intelligence/item/{item_id}")
+async def get_intelligence_item(item_id: str, db: AsyncSession = Depends(get_db)):
+    """情报详情 - 含正文和译文"""
+    field_names = LIST_DEFAULT_FIELDS + LIST_LARGE_FIELDS
+    query = apply_item_joins(select(*[item_column(name) for name in field_names]), field_names)
+    row = (await db.execute(query.where(IntelligenceItem.id == item_id))).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return {name: getattr(row, name) for name in field_names}
+
+@router.get("/intelligence/trends")
+async def get_intelligence_trends(
+    days: int = Query(30, ge=1, le=TREND_MAX_DAYS),
+    group_by: str = Query("none", pattern=f"^({'|'.join(TREND_GROUPS)})$"),
+    top: int = Query(8, ge=1, le=50),
+    source_id: str = None,
+    content_type: str = None,
+    tag: str = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    风险趋势 - 读取日汇总表，返回可直接绘图的按日序列。
+    group_by: none / tag / source / content_type，分组时只返回数量最多的 top 组。
+    """
+    return await trend_service.get_trends(
+        db, days=days, group_by=group_by, top=top,
+        source_id=source_id, content_type=content_type, tag=tag
+    )
+
+
+SEARCH_MAX_LIMIT = 100
+
+
+@router.get("/intelligence/search")
+async def search_intelligence(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0, le=10000),
+    source_id: str = None,
+    content_type: str = None,
+    tag: str = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    published_from: date = None,
+    published_to: date = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    情报全文检索 - 英文走 search_vector（tsvector GIN 索引），中文按汉字串走 search_text（pg_trgm GIN 索引），
+    一两个字的汉字串走 search_grams（数组 GIN 索引）。
+    多个条件同时满足，按相关度倒序返回，highlight 为带 <mark> 的 HTML 片段。
+    """
+    latin, cjk_terms = parse_search_query(q)
+    if not latin and not cjk_terms:
+        raise HTTPException(status_code=400, detail="Empty search query")
+
+    conditions = []
+    rank = literal(0.0)
+    tsquery = None
+    if latin:
+        tsquery = func.websearch_to_tsquery("english", latin)
+        conditions.append(IntelligenceItem.search_vector.op("@@")(tsquery))
+        rank = rank + func.ts_rank_cd(IntelligenceItem.search_vector, tsquery)
+    for term in cjk_terms:
+        if len(term) <= CJK_GRAM_MAX:
+            conditions.append(IntelligenceItem.search_grams.contains([term]))
+        else:
+            conditions.append(IntelligenceItem.search_text.ilike(f"%{escape_like(term)}%", escape="\\"))
+        rank = rank + func.word_similarity(term, IntelligenceItem.search_text)
+
+    conditions += item_filter_conditions(
+        source_id, content_type, tag, date_from, date_to, published_from, published_to
+    )
+
+    # 先在索引列上排序分页，只对当前页生成 ts_headline
+    ranked = (
+        select(IntelligenceItem.id.label("id"), rank.label("rank"))
+        .where(*conditions)
+        .order_by(rank.desc(), IntelligenceItem.created_at.desc())
+        .limit(limit)
+        .offset(offset)
+        .subquery()
+    )
+
+    columns = [item_column(name) for name in LIST_DEFAULT_FIELDS] + [ranked.c.rank]
+    if tsquery is not None:
+        headline_source = func.coalesce(IntelligenceItem.summary, IntelligenceItem.title, "")
+        columns.append(func.ts_headline("english", headline_source, tsquery, HEADLINE_OPTIONS).label("headline"))
+
+    query = select(*columns).select_from(IntelligenceItem).join(ranked, ranked.c.id == IntelligenceItem.id)
+    query = apply_item_joins(query, LIST_DEFAULT_FIELDS)
+    query = query.order_by(ranked.c.rank.desc(), IntelligenceItem.created_at.desc())
+    rows = (await db.execute(query)).all()
+
+    results = []
+    for row in rows:
+        item = {name: getattr(row, name) for name in LIST_DEFAULT_FIELDS}
+        item["rank"] = round(row.rank or 0.0, 4)
+        if tsquery is not None:
+            item["highlight"] = mark_terms(render_headline(row.headline), cjk_terms)
+        else:
+            # 纯中文查询：取首个包含命中词的字段做片段
+            text = next(
+                (t for t in (row.title_zh, row.summary, row.risk_hint, row.title) if t and any(term in t for term in cjk_terms)),
+                row.summary or row.title_zh or row.title
+            )
+            item["highlight"] = highlight_snippet(text, cjk_terms)
+        results.append(item)
+    return results
+
+# 单次删除超过该数量时不逐条推送 id，改为通知前端重新同步
+DELETE_EVENT_MAX_IDS = 500
+
+
+async def delete_items_where(db: AsyncSession, *conditions) -> list:
+    """
+    按条件一次性删除情报（正文由外键级联删除），同时扣减趋势汇总。
+    返回被删除的 id 列表；调用方负责提交事务。
+    """
     result = await db.execute(
-        select(IntelligenceItem)
-        .options(selectinload(IntelligenceItem.source))
-        .order_by(IntelligenceItem.created_at.desc())
+        delete(IntelligenceItem)
+        .where(*conditions)
+        .returning(
+            IntelligenceItem.id, IntelligenceItem.source_id, IntelligenceItem.content_type,
+            IntelligenceItem.risk_tags, IntelligenceItem.published_on, IntelligenceItem.created_at
+        )
+        .execution_options(synchronize_session=False)
     )
-    
-    response = []
-    for item in result.scalars().all():
-        data = {
-            "id": item.id,
-            "source_id": item.source_id,
-            "source_url": item.url if item.url else item.source.url,
-            "title": item.title,
-            "title_zh": item.title_zh,
-            "publish_date": item.publish_date,
-            "content_type": item.content_type,
-            "summary": item.summary,
-            "risk_tags": item.risk_tags,
-            "risk_hint": item.risk_hint,
-            "original_text": item.original_text,
-            "translated_text": item.translated_text,
-            "relevance_score": item.relevance_score
-        }
-        response.append(data)
-    return response
+    rows = [dict(row._mapping) for row in result]
+    if rows:
+        await trend_service.remove_items(db, rows)
+    return [row["id"] for row in rows]
+
+
+def publish_items_deleted(ids: list):
+    if len(ids) > DELETE_EVENT_MAX_IDS:
+        event_bus.publish("resync", {})
+    elif ids:
+        event_bus.publish("item.deleted", {"ids": ids})
+
 
 @router.delete("/intelligence/item/{item_id}")
 async def delete_intelligence_item(item_id: str, db: AsyncSession = Depends(get_db)):
-    item = await db.get(IntelligenceItem, item_id)
-    if not item:
+    deleted_ids = await delete_items_where(db, IntelligenceItem.id == item_id)
+    if not deleted_ids:
         raise HTTPException(status_code=404, detail="Item not found")
-    await db.delete(item)
     await db.commit()
+    publish_items_deleted(deleted_ids)
     return {"status": "deleted"}
 
 @router.post("/intelligence/batch-delete")
 async def batch_delete_intelligence_items(item_ids: list[str], db: AsyncSession = Depends(get_db)):
-    """批量删除情报条目"""
-    deleted_count = 0
-    for item_id in item_ids:
-        item = await db.get(IntelligenceItem, item_id)
-        if item:
-            await db.delete(item)
-            deleted_count += 1
+    """批量删除情报条目 - 单条 DELETE ... WHERE id = ANY(:ids)"""
+    if not item_ids:
+        return {"status": "deleted", "count": 0}
+    deleted_ids = await delete_items_where(
+        db, IntelligenceItem.id == any_(bindparam("ids", list(set(item_ids)), type_=ARRAY(Text)))
+    )
+    await db.commit()
+    publish_items_deleted(deleted_ids)
+    return {"status": "deleted", "count": len(deleted_ids)}
+
+@router.post("/intelligence/delete-by-filter")
+async def delete_intelligence_by_filter(
+    source_id: str = None,
+    content_type: str = None,
+    tag: str = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    published_from: date = None,
+    published_to: date = None,
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """按条件批量删除情报（信源 / 类型 / 标签 / 入库时间 / 发布日期）；dry_run=true 时只返回将删除的数量"""
+    conditions = item_filter_conditions(
+        source_id, content_type, tag, date_from, date_to, published_from, published_to
+    )
+    if not conditions:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+
+    if dry_run:
+        count = (await db.execute(select(func.count()).select_from(IntelligenceItem).where(*conditions))).scalar()
+        return {"status": "dry_run", "count": count}
+
+    deleted_ids = await delete_items_where(db, *conditions)
     await db.commit()
-    return {"status": "deleted", "count": deleted_count}
+    publish_items_deleted(deleted_ids)
+    print(f"[Delete] Deleted {len(deleted_ids)} items by filter")
+    return {"status": "deleted", "count": len(deleted_ids)}
 
 # --- SOURCE MANAGEMENT ENDPOINTS ---
 
 @router.get("/source/list")
-async def list_sources(db: AsyncSession = Depends(get_db)):
+async def list_sources(request: Request, db: AsyncSession = Depends(get_db)):
+    etag = make_etag(request, await table_version(db, IntelligenceSource))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
     result = await db.execute(select(IntelligenceSource))
     sources = result.scalars().all()
-    return [
-        {
-            "id": s.id,
-            "url": s.url,
-            "status": s.status,
-            "last_crawled_at": s.last_crawled_at,
-            "error_message": s.error_message,
-            "created_at": s.created_at
-        }
-        for s in sources
-    ]
+    return cached_json([source_event(s) for s in sources], etag)
 
 @router.delete("/source/{source_id}")
 async def delete_source(source_id: str, db: AsyncSession = Depends(get_db)):
     source = await db.get(IntelligenceSource, source_id)
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
-    await db.delete(source)
+    # 先集中删除该信源的情报（同时扣减趋势汇总），外键级联作为兜底
+    deleted_ids = await delete_items_where(db, IntelligenceItem.source_id == source_id)
+    await db.execute(delete(IntelligenceSource).where(IntelligenceSource.id == source_id))
     await db.commit()
+    publish_items_deleted(deleted_ids)
+    event_bus.publish("source.deleted", {"id": source_id})
     return {"status": "deleted"}
 
 @router.put("/source/{source_id}")
-async def update_source(source_id: str, url: str, db: AsyncSession = Depends(get_db)):
-    """更新信源 URL"""
+async def update_source(
+    source_id: str,
+    url: str = None,
+    items_per_run: int = Query(None, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+):
+    """更新信源 URL / 每轮处理的新文章数"""
     source = await db.get(IntelligenceSource, source_id)
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
-    source.url = url.strip()
+    if url:
+        source.url = url.strip()
+    if items_per_run is not None:
+        source.items_per_run = items_per_run
     await db.commit()
-    return {"status": "updated", "url": source.url}
+    event_bus.publish("source.status", source_event(source))
+    return {"status": "updated", "url": source.url, "items_per_run": source.items_per_run}
+
+@router.get("/source/{source_id}/frontier")
+async def get_source_frontier(source_id: str, limit: int = Query(50, ge=1, le=200), db: AsyncSession = Depends(get_db)):
+    """信源待采集队列（按处理优先级排序）"""
+    source = await db.get(IntelligenceSource, source_id)
+    if not source:
+        raise HTTPException(status_code=404, detail="Source not found")
+    links = await crawl_frontier.list_links(db, source_id, limit)
+    total = await crawl_frontier.pending_count(db, source_id)
+    return {
+        "total": total,
+        "links": [
+            {"url": link.url, "position": link.position, "attempts": link.attempts, "discovered_at": link.discovered_at}
+            for link in links
+        ],
+    }
 
 @router.post("/source/{source_id}/retry")
 async def retry_source(source_id: str, db: AsyncSession = Depends(get_db)):
@@ -331,12 +845,13 @@ async def retry_source(source_id: str, db: AsyncSession = Depends(get_db)):
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
     
-    # Update status and start background task
+    # Update status and queue background task
     source.status = "processing"
     source.error_message = None
+    await crawl_queue.enqueue(db, [source.id])
     await db.commit()
-    
-    asyncio.create_task(process_source_background(source.id, source.url))
+    crawl_queue.wake()
+    event_bus.publish("source.status", source_event(source))
     
     return {"status": "processing", "message": "Retry started in background"}
 
@@ -346,7 +861,7 @@ async def batch_crawl_sources(db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(IntelligenceSource))
     sources = result.scalars().all()
     
-    started_count = 0
+    started = []
     for source in sources:
         # 跳过正在处理的信源
         if source.status == "processing":
@@ -354,10 +869,14 @@ async def batch_crawl_sources(db: AsyncSession = Depends(get_db)):
         
         source.status = "processing"
         source.error_message = None
-        started_count += 1
-        asyncio.create_task(process_source_background(source.id, source.url))
+        started.append(source)
     
+    await crawl_queue.enqueue(db, [source.id for source in started])
     await db.commit()
+    crawl_queue.wake()
+    for source in started:
+        event_bus.publish("source.status", source_event(source))
+    started_count = len(started)
     
     return {
         "status": "processing", 
@@ -365,6 +884,226 @@ async def batch_crawl_sources(db: AsyncSession = Depends(get_db)):
         "count": started_count
     }
 
+# --- CRAWL JOBS ---
+
+CRAWL_JOB_MAX_LIMIT = 200
+
+def crawl_job_dict(job: CrawlJob) -> dict:
+    return {
+        "id": job.id,
+        "source_id": job.source_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_at": job.run_at,
+        "locked_by": job.locked_by,
+        "locked_until": job.locked_until,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+@router.get("/crawl/jobs")
+async def list_crawl_jobs(
+    status: str = Query(None),
+    source_id: str = None,
+    limit: int = Query(50, ge=1, le=CRAWL_JOB_MAX_LIMIT),
+    db: AsyncSession = Depends(get_db),
+):
+    """采集任务列表（按创建时间倒序）"""
+    if status and status not in JOB_STATUSES:
+        raise HTTPException(status_code=422, detail=f"status must be one of {', '.join(JOB_STATUSES)}")
+    query = select(CrawlJob).order_by(CrawlJob.created_at.desc()).limit(limit)
+    if status:
+        query = query.where(CrawlJob.status == status)
+    if source_id:
+        query = query.where(CrawlJob.source_id == source_id)
+    result = await db.execute(query)
+    return [crawl_job_dict(job) for job in result.scalars().all()]
+
+@router.get("/crawl/jobs/stats")
+async def crawl_job_stats(db: AsyncSession = Depends(get_db)):
+    """各状态任务数，以及最早一个到期未领取任务的等待时间"""
+    now = datetime.utcnow()
+    result = await db.execute(select(CrawlJob.status, func.count()).group_by(CrawlJob.status))
+    counts = {status: 0 for status in JOB_STATUSES}
+    counts.update(dict(result.all()))
+    oldest_due = (await db.execute(
+        select(func.min(CrawlJob.run_at)).where(CrawlJob.status == "queued", CrawlJob.run_at <= now)
+    )).scalar()
+    expired = (await db.execute(
+        select(func.count()).select_from(CrawlJob).where(CrawlJob.status == "running", CrawlJob.locked_until < now)
+    )).scalar()
+    return {
+        "counts": counts,
+        "expired_leases": expired,
+        "oldest_due_seconds": (now - oldest_due).total_seconds() if oldest_due else 0,
+    }
+
+@router.get("/crawl/jobs/{job_id}")
+async def get_crawl_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await db.get(CrawlJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Crawl job not found")
+    return crawl_job_dict(job)
+
+@router.get("/crawl/runs")
+async def list_crawl_runs(
+    source_id: str = None,
+    outcome: str = None,
+    limit: int = Query(50, ge=1, le=CRAWL_JOB_MAX_LIMIT),
+    db: AsyncSession = Depends(get_db),
+):
+    """采集记录（按开始时间倒序），包含各阶段耗时"""
+    query = select(CrawlRun).order_by(CrawlRun.started_at.desc()).limit(limit)
+    if source_id:
+        query = query.where(CrawlRun.source_id == source_id)
+    if outcome:
+        query = query.where(CrawlRun.outcome == outcome)
+    result = await db.execute(query)
+    return [
+        {
+            "id": run.id,
+            "source_id": run.source_id,
+            "started_at": run.started_at,
+            "duration_ms": run.duration_ms,
+            "outcome": run.outcome,
+            "error": run.error,
+            "items_discovered": run.items_discovered,
+            "items_processed": run.items_processed,
+            "items_inserted": run.items_inserted,
+            "stages": run.stages or {},
+        }
+        for run in result.scalars().all()
+    ]
+
+@router.get("/crawl/runs/stages")
+async def crawl_stage_stats(
+    days: int = Query(7, ge=1, le=90),
+    source_id: str = None,
+    stage: str = None,
+    by_day: bool = False,
+    top: int = Query(20, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    按 (信源, 阶段) 汇总耗时，默认按总耗时降序，用于找出最耗时的信源和阶段；
+    by_day=true 时再按天拆分（每天各取 top 条，最近的日期在前），查看某个信源各阶段耗时的变化
+    """
+    if stage and stage not in CRAWL_STAGES:
+        raise HTTPException(status_code=422, detail=f"stage must be one of {', '.join(CRAWL_STAGES)}")
+    return await crawl_run_service.slowest_stages(db, days, source_id, stage, by_day, top)
+
+# --- LLM USAGE ---
+
+@router.get("/llm/usage")
+async def get_llm_usage(
+    days: int = Query(30, ge=1, le=366),
+    group_by: str = "source",
+    purpose: str = None,
+    top: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    LLM 用量与成本汇总。group_by: source / purpose / contract / model / day；
+    按信源汇总时返回每条新增情报的 token 数（tokens_per_item）和成本（cost_per_item）
+    """
+    if group_by not in USAGE_GROUPS:
+        raise HTTPException(status_code=422, detail=f"group_by must be one of {', '.join(USAGE_GROUPS)}")
+    if purpose and purpose not in LLM_PURPOSES:
+        raise HTTPException(status_code=422, detail=f"purpose must be one of {', '.join(LLM_PURPOSES)}")
+    # 先写入缓冲区中的记录，保证刚发生的调用也能统计到；写入失败不影响查询已入库的数据
+    try:
+        await llm_usage.flush()
+    except Exception as e:
+        print(f"[LLMUsage] Flush before usage query failed: {e}")
+    return await llm_usage.get_usage(db, days, group_by, purpose, top)
+
+# --- ADMIN: PROFILING ---
+
+def require_admin(x_admin_token: str = Header(None)):
+    """管理接口鉴权；未配置 ADMIN_TOKEN 时管理接口不存在"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def profile_response(sampler, format: str, name: str):
+    if format == "collapsed":
+        return PlainTextResponse(sampler.collapsed())
+    return sampler.speedscope(name)
+
+
+@router.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_process(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    mode: str = "wall",
+    format: str = "speedscope",
+    interval_ms: float = Query(PROFILE_DEFAULT_INTERVAL_MS, ge=1, le=100),
+):
+    """
+    采样剖析当前进程 seconds 秒后返回结果。
+    mode: wall（所有线程 + 所有挂起的异步任务）/ cpu（只统计正在执行的线程栈）；
+    format: speedscope（JSON，可直接拖入 speedscope.app）/ collapsed（flamegraph.pl 折叠栈）
+    """
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {', '.join(PROFILE_MODES)}")
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {', '.join(PROFILE_FORMATS)}")
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    sampler = await profiler.profile(seconds, mode, interval_ms)
+    return profile_response(sampler, format, f"process {mode} {seconds:g}s")
+
+
+@router.get("/admin/profile/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_request_profile(profile_id: str, format: str = "speedscope"):
+    """取回请求级剖析结果（请求带 X-Profile 头时响应头中的 X-Profile-Id）"""
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {', '.join(PROFILE_FORMATS)}")
+    sampler = profiler.get(profile_id)
+    if not sampler:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile_response(sampler, format, f"request {profile_id}")
+
+
+@router.get("/admin/loop-lag", dependencies=[Depends(require_admin)])
+async def get_loop_lag():
+    """事件循环调度延迟分位数、按阻塞位置汇总的阻塞次数 / 时长，以及最近的阻塞调用栈"""
+    return loop_monitor.summary()
+
+
+@router.delete("/admin/cache", dependencies=[Depends(require_admin)])
+async def clear_cache(cache: str = None):
+    """清空缓存（共享层 + 所有 worker 的内存层）；cache 为 url / extraction，不传表示全部"""
+    if cache is not None and cache not in CACHE_NAMES:
+        raise HTTPException(status_code=422, detail=f"cache must be one of {', '.join(CACHE_NAMES)}")
+    names = (cache,) if cache else CACHE_NAMES
+    for future in cache_service.clear(names):
+        await asyncio.wrap_future(future)
+    return {"cleared": list(names)}
+
+# --- CHANGE FEED ---
+
+@router.get("/events")
+async def stream_events(request: Request):
+    """变更事件流（SSE）- 浏览器断线重连时通过 Last-Event-ID 补发错过的事件"""
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+
+    async def event_stream():
+        async for message in event_bus.subscribe(last_event_id):
+            if await request.is_disconnected():
+                break
+            yield message
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # --- CONTRACT ENDPOINTS ---
 
 
@@ -377,6 +1116,7 @@ async def upload_contract(file: UploadFile = File(...), db: AsyncSession = Depen
     await db.commit()
     await db.refresh(task)
     print(f"[Contract] Created task: {task.id}")
+    event_bus.publish("contract.task", contract_task_event(task))
     
     try:
         print(f"[Contract] Parsing file: {file.filename}")
@@ -385,109 +1125,128 @@ async def upload_contract(file: UploadFile = File(...), db: AsyncSession = Depen
             raise Exception(f"文件解析失败或内容过短 (长度: {len(text) if text else 0})")
         
         print(f"[Contract] Parsed {len(text)} chars, starting AI analysis...")
-        safe_text = contract_parser.desensitize(text)
-        
-        chunk_size = 6000
-        chunks = [safe_text[i:i+chunk_size] for i in range(0, len(safe_text), chunk_size)]
-        
-        all_ai_risks = []
-        overall_levels = []
-        
-        # 性能优化: 并行处理chunks
-        async def analyze_chunk(i: int, chunk: str):
-            print(f"[Contract] Analyzing chunk {i+1}/{min(len(chunks), 3)}...")
-            return await ai_engine.analyze_contract_clause(
-                chunk, 
-                context=f"{task.filename} (第{i+1}部分，共{min(len(chunks), 3)}部分)",
-                contract_type=""
-            )
-        
-        # 并行分析前3个chunks
-        results = await asyncio.gather(*[
-            analyze_chunk(i, chunk) 
-            for i, chunk in enumerate(chunks[:3])
-        ])
-        
-        for ai_result in results:
-            if ai_result.get("risks"):
-                all_ai_risks.extend(ai_result["risks"])
-            if ai_result.get("overall_risk_level"):
-                overall_levels.append(ai_result["overall_risk_level"])
-        
-        print(f"[Contract] Found {len(all_ai_risks)} risks")
-        
-        seen_clauses = set()
-        risk_count = 0
-        for risk in all_ai_risks:
-            clause_text = risk.get("clause_text", "")
-            clause_key = clause_text[:80] if clause_text else ""
-            if clause_key and clause_key not in seen_clauses:
-                seen_clauses.add(clause_key)
-                risk_count += 1
-                clause_id = risk.get("clause_id", "")
-                if not clause_id or clause_id == "无":
-                    clause_id = f"风险点-{risk_count}"
-                
-                db.add(ContractRisk(
-                    task_id=task.id,
-                    clause_text=clause_text,
-                    clause_id=clause_id,
-                    risk_category=risk.get("risk_category"),
-                    risk_level=risk.get("risk_level", "Low"),
-                    risk_reason=risk.get("risk_reason"),
-                    explanation=risk.get("explanation"),
-                    confidence=risk.get("confidence", 0.0)
-                ))
-        
-        if "High" in overall_levels or any(r.get("risk_level") == "High" for r in all_ai_risks):
-            task.overall_risk_level = "High"
-        elif "Medium" in overall_levels or any(r.get("risk_level") == "Medium" for r in all_ai_risks):
-            task.overall_risk_level = "Medium"
-        else:
-            task.overall_risk_level = "Low"
+        result = await analyze_contract_text(text, task.filename, task.id)
         
+        db.add_all(build_risk_rows(task.id, result["risks"]))
+        task.overall_risk_level = result["overall_risk_level"]
+        task.token_map = result["token_map"]
         task.status = "done"
         await db.commit()
         print(f"[Contract] Analysis complete: {task.overall_risk_level}")
+        event_bus.publish("contract.task", contract_task_event(task))
         
     except Exception as e:
         print(f"[Contract] ERROR: {e}")
         task.status = "failed"
         await db.commit()
+        event_bus.publish("contract.task", contract_task_event(task))
         raise HTTPException(status_code=500, detail=str(e))
 
     return {"task_id": task.id, "status": "done"}
 
+@router.post("/contract/batch-upload")
+async def batch_upload_contracts(files: list[UploadFile] = File(...), name: str = None, db: AsyncSession = Depends(get_db)):
+    """批量上传合同（ZIP 或多个文件）- 立即返回，后台并行解析和分析"""
+    uploads = [(f.filename, await f.read()) for f in files]
+    try:
+        contracts = expand_uploads(uploads)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not contracts:
+        raise HTTPException(status_code=400, detail="未找到可分析的合同文件（支持 PDF/DOCX 或包含它们的 ZIP）")
+    
+    batch = ContractBatch(name=name or files[0].filename, total_files=len(contracts), status="processing")
+    db.add(batch)
+    await db.flush()
+    
+    tasks = [ContractTask(filename=filename, batch_id=batch.id, status="processing") for filename, _ in contracts]
+    db.add_all(tasks)
+    await db.commit()
+    print(f"[Batch] Created batch {batch.id} with {len(tasks)} contracts")
+    for task in tasks:
+        event_bus.publish("contract.task", contract_task_event(task))
+    
+    asyncio.create_task(process_contract_batch_background(
+        batch.id,
+        [(task.id, filename, data) for task, (filename, data) in zip(tasks, contracts)]
+    ))
+    
+    return {"status": "processing", "batch_id": batch.id, "count": len(tasks), "task_ids": [t.id for t in tasks]}
+
+@router.get("/contract/batch/{batch_id}")
+async def get_contract_batch(batch_id: str, db: AsyncSession = Depends(get_db)):
+    """批次进度和组合级风险汇总"""
+    batch = await db.get(ContractBatch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    result = await db.execute(
+        select(ContractTask).where(ContractTask.batch_id == batch_id).order_by(ContractTask.filename)
+    )
+    tasks = result.scalars().all()
+    return {
+        "id": batch.id,
+        "name": batch.name,
+        "status": batch.status,
+        "total_files": batch.total_files,
+        "completed": sum(1 for t in tasks if t.status != "processing"),
+        "overall_risk_level": batch.overall_risk_level,
+        "summary": batch.summary,
+        "created_at": batch.created_at,
+        "finished_at": batch.finished_at,
+        "tasks": [
+            {"id": t.id, "filename": t.filename, "status": t.status, "overall_risk_level": t.overall_risk_level}
+            for t in tasks
+        ],
+    }
+
 @router.get("/contract/{task_id}/result")
-async def get_contract_result(task_id: str, db: AsyncSession = Depends(get_db)):
+async def get_contract_result(task_id: str, raw: bool = False, db: AsyncSession = Depends(get_db)):
+    """合同审核结果；默认把脱敏占位符还原为原文，raw=true 时返回脱敏文本"""
     task = await db.get(ContractTask, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     result = await db.execute(select(ContractRisk).where(ContractRisk.task_id == task_id))
     risks = result.scalars().all()
-    return {"task": task, "risks": risks}
+    token_map = None if raw else task.token_map
+    return {
+        "task": {
+            "id": task.id,
+            "batch_id": task.batch_id,
+            "filename": task.filename,
+            "upload_time": task.upload_time,
+            "status": task.status,
+            "overall_risk_level": task.overall_risk_level,
+        },
+        "risks": [
+            {
+                "id": r.id,
+                "task_id": r.task_id,
+                "clause_id": r.clause_id,
+                "clause_text": rehydrate(r.clause_text, token_map),
+                "risk_category": r.risk_category,
+                "risk_level": r.risk_level,
+                "risk_reason": rehydrate(r.risk_reason, token_map),
+                "explanation": rehydrate(r.explanation, token_map),
+                "confidence": r.confidence,
+            }
+            for r in risks
+        ],
+    }
 
 @router.get("/contract/list")
-async def list_contract_tasks(db: AsyncSession = Depends(get_db)):
+async def list_contract_tasks(request: Request, db: AsyncSession = Depends(get_db)):
+    etag = make_etag(request, await table_version(db, ContractTask))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
     result = await db.execute(select(ContractTask).order_by(ContractTask.upload_time.desc()))
     tasks = result.scalars().all()
-    return [
-        {
-            "id": t.id,
-            "filename": t.filename,
-            "status": t.status,
-            "overall_risk_level": t.overall_risk_level,
-            "created_at": t.upload_time
-        }
-        for t in tasks
-    ]
+    return cached_json([contract_task_event(t) for t in tasks], etag)
 
 @router.delete("/contract/{task_id}")
 async def delete_contract_task(task_id: str, db: AsyncSession = Depends(get_db)):
-    task = await db.get(ContractTask, task_id)
-    if not task:
+    # 风险点由外键级联删除
+    result = await db.execute(delete(ContractTask).where(ContractTask.id == task_id))
+    if not result.rowcount:
         raise HTTPException(status_code=404, detail="Task not found")
-    await db.execute(ContractRisk.__table__.delete().where(ContractRisk.task_id == task_id))
-    await db.delete(task)
     await db.commit()
     return {"status": "deleted"}
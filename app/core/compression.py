@@ -0,0 +1,143 @@
+"""
+响应压缩中间件
+- 客户端支持时优先 brotli（需安装 brotli 包），否则 gzip
+- 只压缩 JSON / 文本 / JS / CSS，且超过 COMPRESSION_MIN_SIZE 字节的响应
+- 事件流（text/event-stream）和已编码的响应原样透传
+- 压缩后 ETag 加上编码后缀，保证强 ETag 与实际字节一一对应
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只用 gzip
+    brotli = None
+
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # 动态内容用中等压缩级别，兼顾 CPU
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/javascript", "text/javascript",
+    "text/html", "text/css", "text/plain", "image/svg+xml",
+)
+
+
+def choose_encoding(accept_encoding: str):
+    """根据 Accept-Encoding 选择编码（忽略 q=0 的项）"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """给 ETag 加编码后缀：'"abc"' -> '"abc-br"'（弱 ETag 同样处理）"""
+    suffix = "-br" if encoding == "br" else "-gz"
+    if etag.endswith('"'):
+        return etag[:-1] + suffix + '"'
+    return etag + suffix
+
+
+def strip_encoding_suffix(if_none_match: str) -> str:
+    """去掉 If-None-Match 中各 ETag 的编码后缀"""
+    return if_none_match.replace('-br"', '"').replace('-gz"', '"')
+
+
+def add_vary_accept_encoding(headers: list) -> list:
+    """在 Vary 中加入 Accept-Encoding（已有 Vary 时追加，已包含或为 * 时不变）"""
+    values = [v.decode("latin-1") for k, v in headers if k == b"vary"]
+    fields = [f.strip().lower() for value in values for f in value.split(",")]
+    if "accept-encoding" in fields or "*" in fields:
+        return headers
+    vary = ", ".join(values + ["Accept-Encoding"])
+    return [(k, v) for k, v in headers if k != b"vary"] + [(b"vary", vary.encode("latin-1"))]
+
+
+class CompressionMiddleware:
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # 去掉 If-None-Match 中的编码后缀，下游按原始 ETag 比较（内容相同，只是编码不同）
+        scope = {**scope, "headers": [
+            (k, strip_encoding_suffix(v.decode("latin-1")).encode("latin-1")) if k == b"if-none-match" else (k, v)
+            for k, v in scope.get("headers") or []
+        ]}
+
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if not encoding or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+        chunks = []
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                response_headers = dict(message.get("headers") or [])
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip()
+                if (
+                    b"content-encoding" in response_headers
+                    or content_type not in COMPRESSIBLE_TYPES
+                    or message["status"] in (204, 206, 304)
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            response_headers = [
+                (k, v) for k, v in start_message.get("headers", [])
+                if k not in (b"content-length", b"etag")
+            ]
+            etag = dict(start_message.get("headers", [])).get(b"etag")
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                response_headers.append((b"content-encoding", encoding.encode()))
+                if etag:
+                    etag = encoded_etag(etag.decode("latin-1"), encoding).encode("latin-1")
+            if etag:
+                response_headers.append((b"etag", etag))
+            response_headers = add_vary_accept_encoding(response_headers)
+            response_headers.append((b"content-length", str(len(body)).encode()))
+
+            await send({**start_message, "headers": response_headers})
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
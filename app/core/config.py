@@ -13,11 +13,49 @@ class Settings(BaseSettings):
     DEEPSEEK_API_KEY: Optional[str] = os.getenv("DEEPSEEK_API_KEY")
     DEEPSEEK_BASE_URL: str = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
     DEEPSEEK_MODEL: str = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")  # 可选: deepseek-chat, deepseek-reasoner
+    # LLM 单价（美元 / 百万 token），用于成本统计；按实际账单调整
+    LLM_PRICE_INPUT_PER_M: float = float(os.getenv("LLM_PRICE_INPUT_PER_M", "0.27"))
+    LLM_PRICE_CACHED_INPUT_PER_M: float = float(os.getenv("LLM_PRICE_CACHED_INPUT_PER_M", "0.07"))  # 命中上下文缓存的输入
+    LLM_PRICE_OUTPUT_PER_M: float = float(os.getenv("LLM_PRICE_OUTPUT_PER_M", "1.10"))
+
+    # Admin
+    ADMIN_TOKEN: Optional[str] = os.getenv("ADMIN_TOKEN")  # 管理接口（性能剖析等）的访问令牌，请求头 X-Admin-Token；未设置时管理接口不可用
+    LOOP_LAG_THRESHOLD_MS: int = int(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))  # 事件循环被阻塞超过该值时记录阻塞位置的调用栈，0 表示只统计延迟
     
     # Crawler
     CRAWL_HEADLESS: bool = True
     LOW_MEMORY_MODE: bool = os.getenv("LOW_MEMORY_MODE", "false").lower() == "true"  # 低内存模式，禁用 Playwright
 
+    # Cache
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "sqlite")  # 共享缓存层：sqlite（同一主机的多个进程共用本地文件）/ redis（多主机）/ none（只用进程内存）
+    CACHE_NAMESPACE: str = os.getenv("CACHE_NAMESPACE", "risk")  # 共享层键前缀，多套部署共用同一 Redis 时区分；修改后旧缓存整体失效
+    CACHE_DIR: str = os.getenv("CACHE_DIR", "data/cache")  # sqlite 共享层的目录，留空表示只用内存缓存
+    CACHE_MEMORY_MB: int = int(os.getenv("CACHE_MEMORY_MB", "64"))  # 每个进程的内存缓存容量（URL 缓存占 3/4，提取结果占 1/4）
+    CACHE_DISK_MB: int = int(os.getenv("CACHE_DISK_MB", "1024"))  # sqlite 共享层容量，按压缩后的大小计算；redis 由服务端 maxmemory 控制
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Contract batch analysis
+    CONTRACT_PARSE_WORKERS: int = int(os.getenv("CONTRACT_PARSE_WORKERS", "0"))  # 解析进程数，0 表示按 CPU 核数
+    CONTRACT_BATCH_LLM_CONCURRENCY: int = int(os.getenv("CONTRACT_BATCH_LLM_CONCURRENCY", "4"))  # 同时进行 LLM 分析的合同数（所有批次共用）
+
+    # Crawl job queue
+    CRAWL_WORKERS: int = int(os.getenv("CRAWL_WORKERS", "3"))  # 每个进程的采集 worker 数，0 表示本进程不执行采集（由独立 worker 进程执行）
+    CRAWL_JOB_LEASE_SECONDS: int = int(os.getenv("CRAWL_JOB_LEASE_SECONDS", "300"))  # 任务租约时长，worker 崩溃后超时重新领取
+    CRAWL_JOB_MAX_ATTEMPTS: int = int(os.getenv("CRAWL_JOB_MAX_ATTEMPTS", "3"))
+    CRAWL_JOB_RETRY_BASE_SECONDS: int = int(os.getenv("CRAWL_JOB_RETRY_BASE_SECONDS", "60"))  # 重试退避基数（指数增长）
+
+    # Crawl frontier
+    CRAWL_ITEMS_PER_RUN: int = int(os.getenv("CRAWL_ITEMS_PER_RUN", "3"))  # 每轮最多处理的新文章数（可按信源覆盖），其余留在待采集队列
+
+    # Adaptive re-crawl scheduler
+    CRAWL_BUDGET_PER_HOUR: int = int(os.getenv("CRAWL_BUDGET_PER_HOUR", "60"))  # 每小时最多创建的采集任务数，0 表示关闭定时采集
+    CRAWL_INTERVAL_DEFAULT_MINUTES: int = int(os.getenv("CRAWL_INTERVAL_DEFAULT_MINUTES", "360"))  # 新信源的初始间隔
+    CRAWL_INTERVAL_MIN_MINUTES: int = int(os.getenv("CRAWL_INTERVAL_MIN_MINUTES", "30"))
+    CRAWL_INTERVAL_MAX_MINUTES: int = int(os.getenv("CRAWL_INTERVAL_MAX_MINUTES", "10080"))  # 长期无更新的信源最长一周采集一次
+
+    # Trends
+    TREND_ROLLUP_INTERVAL_MINUTES: int = int(os.getenv("TREND_ROLLUP_INTERVAL_MINUTES", "60"))  # 趋势汇总全量重算间隔，0 表示不重算
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,70 @@
+"""
+读接口的 HTTP 缓存
+- 表版本：count(*) + max(updated_at)，一次聚合查询即可判断数据是否变化；进程内缓存 TABLE_VERSION_TTL_SECONDS，
+  高频的列表请求（包括 304）不必每次都统计全表，写入最多延迟这么久反映到 ETag
+- ETag = 表版本 + 请求路径和参数的哈希；命中 If-None-Match 时返回 304，不再查询和序列化列表
+- 大列表用 orjson 序列化（未安装时退回标准 JSONResponse）
+"""
+import hashlib
+import time
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+try:
+    from fastapi.responses import ORJSONResponse
+    import orjson  # noqa: F401  ORJSONResponse 依赖 orjson
+    FastJSONResponse = ORJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+# 客户端可以缓存，但每次使用前必须用 ETag 重新验证
+CACHE_CONTROL = "no-cache"
+
+TABLE_VERSION_TTL_SECONDS = 2
+_table_versions = {}  # 表名 -> (过期时间, 版本)
+
+
+async def table_version(db: AsyncSession, model) -> str:
+    """表版本：行数变化（增删）或 updated_at 变化（修改）都会改变版本"""
+    cached = _table_versions.get(model.__tablename__)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    count, last_updated = (await db.execute(
+        select(func.count(), func.max(model.updated_at)).select_from(model)
+    )).one()
+    version = f"{count}:{last_updated.isoformat() if last_updated else ''}"
+    _table_versions[model.__tablename__] = (time.monotonic() + TABLE_VERSION_TTL_SECONDS, version)
+    return version
+
+
+def make_etag(request: Request, *versions: str) -> str:
+    """强 ETag：同一版本、同一请求参数得到的响应字节相同"""
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}|{'|'.join(versions)}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def cached_json(content, etag: str, headers: dict = None) -> Response:
+    """带 ETag 的 JSON 响应"""
+    return FastJSONResponse(
+        content=content,
+        headers={**(headers or {}), "ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
@@ -0,0 +1,145 @@
+"""
+事件循环延迟监控
+- 监控协程每隔 LOOP_LAG_INTERVAL 秒睡眠一次，实际唤醒时间超出的部分即调度延迟，写入 event_loop_lag_seconds
+- 看门狗线程检查监控协程的心跳：超过 LOOP_LAG_THRESHOLD_MS 未唤醒说明循环正被同步代码占用，
+  此时读取事件循环线程的调用栈（阻塞的函数仍在栈上），归因到栈上最深的项目代码帧
+- 最近的阻塞记录和按阻塞位置的汇总由 /api/admin/loop-lag 返回，便于定位需要移到线程池的同步调用
+看门狗线程只读取调用栈，指标统一在监控协程中（事件循环线程内）记录
+"""
+import asyncio
+import sys
+import sysconfig
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.core.performance import perf_stats
+from app.core.profiling import frame_label, frame_stack
+
+LOOP_LAG_INTERVAL = 0.05
+LOOP_LAG_WINDOW = 1200  # 保留最近的延迟样本数（约 1 分钟），用于计算分位数
+LOOP_STALL_HISTORY = 50  # 保留最近的阻塞记录数
+
+# 标准库和第三方库的帧不作为阻塞位置（归因到调用它们的项目代码）
+_LIBRARY_DIRS = tuple({sysconfig.get_paths()[key] for key in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+
+def _blocking_site(stack: list) -> str:
+    for frame in reversed(stack):
+        filename = frame[1]
+        if filename and not filename.startswith(_LIBRARY_DIRS) and not filename.startswith("<"):
+            return frame_label(frame)
+    return frame_label(stack[-1]) if stack else "unknown"
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LoopLagMonitor:
+
+    def __init__(self):
+        self.recent_lags = deque(maxlen=LOOP_LAG_WINDOW)
+        self.stalls = deque(maxlen=LOOP_STALL_HISTORY)
+        self.sites = {}  # 阻塞位置 -> {"count", "total_ms", "max_ms"}
+        self._beat = 0.0
+        self._captured: Optional[dict] = None
+        self._loop = None
+        self._loop_thread = None
+
+    @property
+    def threshold(self) -> float:
+        return settings.LOOP_LAG_THRESHOLD_MS / 1000
+
+    async def run_periodic(self):
+        """在事件循环内常驻运行（由 create_task 启动）"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        stop = threading.Event()
+        if self.threshold > 0:
+            threading.Thread(target=self._watch, args=(stop,), name="loop-watchdog", daemon=True).start()
+        try:
+            while True:
+                start = self._beat = time.perf_counter()
+                await asyncio.sleep(LOOP_LAG_INTERVAL)
+                lag = max(time.perf_counter() - start - LOOP_LAG_INTERVAL, 0.0)
+                self.record(lag, start)
+        finally:
+            stop.set()
+
+    def record(self, lag: float, beat: float):
+        perf_stats.loop_lag.observe(lag)
+        self.recent_lags.append(lag)
+        captured, self._captured = self._captured, None
+        if self.threshold <= 0 or lag < self.threshold:
+            return
+        if captured is None or captured["beat"] != beat:
+            # 阻塞刚好落在两次检查之间，没有取到调用栈
+            captured = {"at": datetime.utcnow(), "task": None, "stack": []}
+        site = _blocking_site(captured["stack"])
+        blocked_ms = round(lag * 1000, 1)
+        self.stalls.append({
+            "at": captured["at"].isoformat(),
+            "blocked_ms": blocked_ms,
+            "task": captured["task"],
+            "site": site,
+            "stack": [frame_label(frame) for frame in captured["stack"]],
+        })
+        totals = self.sites.setdefault(site, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        totals["count"] += 1
+        totals["total_ms"] += blocked_ms
+        totals["max_ms"] = max(totals["max_ms"], blocked_ms)
+        perf_stats.loop_stalls.inc(site)
+        print(f"[LoopLag] Event loop blocked {blocked_ms:.0f}ms in task {captured['task']}: {site}")
+
+    def _watch(self, stop: threading.Event):
+        """看门狗线程：心跳超时时记录一次事件循环线程的调用栈（每次阻塞只记录一次）"""
+        poll = max(self.threshold / 4, 0.005)
+        while not stop.wait(poll):
+            beat = self._beat
+            if time.perf_counter() - beat < LOOP_LAG_INTERVAL + self.threshold:
+                continue
+            if self._captured is not None and self._captured["beat"] == beat:
+                continue
+            try:
+                frame = sys._current_frames().get(self._loop_thread)
+                task = asyncio.current_task(self._loop)
+                self._captured = {
+                    "beat": beat,
+                    "at": datetime.utcnow(),
+                    "task": task.get_name() if task else None,
+                    "stack": frame_stack(frame),
+                }
+            except Exception:
+                # 与事件循环线程并发读取，偶发的竞争直接放弃本次记录
+                continue
+
+    def summary(self) -> dict:
+        lags = list(self.recent_lags)
+        sites = sorted(self.sites.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        return {
+            "threshold_ms": settings.LOOP_LAG_THRESHOLD_MS,
+            "lag_ms": {
+                "samples": len(lags),
+                "p50": round(_percentile(lags, 50) * 1000, 2),
+                "p95": round(_percentile(lags, 95) * 1000, 2),
+                "p99": round(_percentile(lags, 99) * 1000, 2),
+                "max": round(max(lags, default=0.0) * 1000, 2),
+            },
+            "sites": [
+                {"site": site, "count": totals["count"], "total_ms": round(totals["total_ms"], 1),
+                 "max_ms": totals["max_ms"]}
+                for site, totals in sites
+            ],
+            "recent_stalls": list(reversed(self.stalls)),
+        }
+
+
+# 全局单例
+loop_monitor = LoopLagMonitor()
@@ -1,123 +1,343 @@
 """
 性能监控工具
+- 进程内指标（直方图 / 计数器 / 仪表），由 /metrics 以 Prometheus 文本格式导出
+- 记录路径只做字典查找和数组计数，不加锁（单事件循环内调用）
+- 多 worker 部署时每个进程各自导出，由 Prometheus 按实例聚合
 """
+import asyncio
 import time
 import functools
 import logging
-from typing import Callable
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 当前请求累计的数据库耗时（由 HTTP 中间件设置，数据库事件累加）
+_request_db_time: ContextVar[Optional[list]] = ContextVar("request_db_time", default=None)
+
+# 当前采集阶段的计数（由采集记录设置，抓取 / LLM / 缓存处累加）
+current_span: ContextVar[Optional[dict]] = ContextVar("crawl_span", default=None)
+
+
+def note_span(**counters):
+    """在当前采集阶段上累加计数（bytes、tokens、cache_hits 等）；不在采集流程中时忽略"""
+    span = current_span.get()
+    if span is not None:
+        for key, value in counters.items():
+            span[key] = span.get(key, 0) + value
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [各桶计数..., +Inf 计数, sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def totals(self) -> Dict[Tuple, Tuple[int, float]]:
+        """labels -> (count, sum)"""
+        return {labels: (sum(series[:-1]), series[-1]) for labels, series in self._series.items()}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound) if bound == float("inf") else bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+    def clear(self):
+        self._series.clear()
+
+
+class Counter:
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+    def clear(self):
+        self._values.clear()
+
+
+class Gauge(Counter):
+
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+
+def domain_of(url: str) -> str:
+    try:
+        return (urlparse(url).hostname or "unknown").removeprefix("www.")
+    except ValueError:
+        return "unknown"
+
+
 def measure_time(func_name: str = None):
     """装饰器: 测量函数执行时间"""
     def decorator(func: Callable):
         @functools.wraps(func)
         async def async_wrapper(*args, **kwargs):
             name = func_name or func.__name__
-            start = time.time()
+            start = time.perf_counter()
             try:
                 result = await func(*args, **kwargs)
-                elapsed = time.time() - start
+                elapsed = time.perf_counter() - start
+                perf_stats.function_seconds.observe(elapsed, name)
                 logger.info(f"⏱️ {name} took {elapsed:.2f}s")
                 return result
             except Exception as e:
-                elapsed = time.time() - start
+                elapsed = time.perf_counter() - start
+                perf_stats.function_seconds.observe(elapsed, name)
                 logger.error(f"❌ {name} failed after {elapsed:.2f}s: {e}")
                 raise
-        
+
         @functools.wraps(func)
         def sync_wrapper(*args, **kwargs):
             name = func_name or func.__name__
-            start = time.time()
+            start = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
-                elapsed = time.time() - start
+                elapsed = time.perf_counter() - start
+                perf_stats.function_seconds.observe(elapsed, name)
                 logger.info(f"⏱️ {name} took {elapsed:.2f}s")
                 return result
             except Exception as e:
-                elapsed = time.time() - start
+                elapsed = time.perf_counter() - start
+                perf_stats.function_seconds.observe(elapsed, name)
                 logger.error(f"❌ {name} failed after {elapsed:.2f}s: {e}")
                 raise
-        
+
         # 判断是否是异步函数
-        import asyncio
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
         else:
             return sync_wrapper
-    
+
     return decorator
 
 
 class PerformanceStats:
     """性能统计"""
     def __init__(self):
-        self.stats = {
-            "crawl_count": 0,
-            "crawl_total_time": 0.0,
-            "ai_call_count": 0,
-            "ai_total_time": 0.0,
-            "cache_hits": 0,
-            "cache_misses": 0,
-        }
-    
+        self.fetch_seconds = Histogram(
+            "crawler_fetch_seconds", "Page fetch latency", ("domain", "tier", "outcome"))
+        self.llm_seconds = Histogram(
+            "llm_request_seconds", "LLM call latency", ("call_type", "outcome"))
+        self.llm_tokens = Histogram(
+            "llm_tokens", "Tokens per LLM call", ("call_type", "kind"), buckets=TOKEN_BUCKETS)
+        self.http_seconds = Histogram(
+            "http_request_seconds", "HTTP request latency", ("endpoint", "method", "status"))
+        self.db_seconds = Histogram(
+            "http_request_db_seconds", "Database time per HTTP request", ("endpoint",))
+        self.function_seconds = Histogram(
+            "function_seconds", "Duration of functions decorated with measure_time", ("name",))
+        self.cache_requests = Counter(
+            "cache_requests_total", "Cache lookups", ("cache", "result"))
+        self.inflight = Gauge(
+            "inflight_tasks", "Tasks currently running", ("kind",))
+        self.loop_lag = Histogram(
+            "event_loop_lag_seconds", "Event loop scheduling delay", buckets=LOOP_LAG_BUCKETS)
+        self.loop_stalls = Counter(
+            "event_loop_stalls_total", "Event loop stalls above the threshold by blocking site", ("site",))
+        self._metrics = [
+            self.fetch_seconds, self.llm_seconds, self.llm_tokens, self.http_seconds,
+            self.db_seconds, self.function_seconds, self.cache_requests, self.inflight,
+            self.loop_lag, self.loop_stalls,
+        ]
+
+    # --- 记录 ---
+
+    def record_fetch(self, url: str, tier: str, duration: float, ok: bool = True):
+        self.fetch_seconds.observe(duration, domain_of(url), tier, "ok" if ok else "error")
+
     def record_crawl(self, duration: float):
-        self.stats["crawl_count"] += 1
-        self.stats["crawl_total_time"] += duration
-    
-    def record_ai_call(self, duration: float):
-        self.stats["ai_call_count"] += 1
-        self.stats["ai_total_time"] += duration
-    
-    def record_cache_hit(self):
-        self.stats["cache_hits"] += 1
-    
-    def record_cache_miss(self):
-        self.stats["cache_misses"] += 1
-    
+        self.fetch_seconds.observe(duration, "unknown", "unknown", "ok")
+
+    def record_ai_call(self, duration: float, call_type: str = "other", ok: bool = True,
+                       prompt_tokens: int = None, completion_tokens: int = None):
+        self.llm_seconds.observe(duration, call_type, "ok" if ok else "error")
+        if prompt_tokens is not None:
+            self.llm_tokens.observe(prompt_tokens, call_type, "prompt")
+        if completion_tokens is not None:
+            self.llm_tokens.observe(completion_tokens, call_type, "completion")
+
+    def record_cache_hit(self, cache: str = "default"):
+        self.cache_requests.inc(cache, "hit")
+
+    def record_cache_miss(self, cache: str = "default"):
+        self.cache_requests.inc(cache, "miss")
+
+    def track_inflight(self, kind: str) -> "_Inflight":
+        """用法: async with perf_stats.track_inflight("crawl_job"): ..."""
+        return _Inflight(self.inflight, kind)
+
+    # --- 数据库耗时（按请求累计） ---
+
+    def instrument_engine(self, engine):
+        """在引擎上注册事件，把语句耗时累加到当前请求"""
+        from sqlalchemy import event
+
+        sync_engine = getattr(engine, "sync_engine", engine)
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["query_start"].pop()
+            accumulated = _request_db_time.get()
+            if accumulated is not None:
+                accumulated[0] += elapsed
+
+    # --- 导出 ---
+
+    def render(self, extra: Iterable = ()) -> str:
+        """Prometheus 文本格式；extra 为抓取时才计算的指标（如队列深度）"""
+        lines = []
+        for metric in list(self._metrics) + list(extra):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
     def get_summary(self) -> dict:
         """获取性能摘要"""
-        crawl_avg = (
-            self.stats["crawl_total_time"] / self.stats["crawl_count"]
-            if self.stats["crawl_count"] > 0 else 0
-        )
-        ai_avg = (
-            self.stats["ai_total_time"] / self.stats["ai_call_count"]
-            if self.stats["ai_call_count"] > 0 else 0
-        )
-        cache_hit_rate = (
-            self.stats["cache_hits"] / (self.stats["cache_hits"] + self.stats["cache_misses"])
-            if (self.stats["cache_hits"] + self.stats["cache_misses"]) > 0 else 0
-        )
-        
+        def count_and_sum(histogram: Histogram):
+            totals = histogram.totals().values()
+            return sum(c for c, _ in totals), sum(s for _, s in totals)
+
+        crawl_count, crawl_total = count_and_sum(self.fetch_seconds)
+        ai_count, ai_total = count_and_sum(self.llm_seconds)
+        hits = sum(v for (_, result), v in self.cache_requests._values.items() if result == "hit")
+        misses = sum(v for (_, result), v in self.cache_requests._values.items() if result == "miss")
+
         return {
             "crawl": {
-                "count": self.stats["crawl_count"],
-                "total_time": round(self.stats["crawl_total_time"], 2),
-                "avg_time": round(crawl_avg, 2),
+                "count": crawl_count,
+                "total_time": round(crawl_total, 2),
+                "avg_time": round(crawl_total / crawl_count, 2) if crawl_count else 0,
             },
             "ai": {
-                "count": self.stats["ai_call_count"],
-                "total_time": round(self.stats["ai_total_time"], 2),
-                "avg_time": round(ai_avg, 2),
+                "count": ai_count,
+                "total_time": round(ai_total, 2),
+                "avg_time": round(ai_total / ai_count, 2) if ai_count else 0,
             },
             "cache": {
-                "hits": self.stats["cache_hits"],
-                "misses": self.stats["cache_misses"],
-                "hit_rate": round(cache_hit_rate * 100, 2),
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses) * 100, 2) if hits + misses else 0,
             }
         }
-    
+
     def reset(self):
         """重置统计"""
-        self.stats = {
-            "crawl_count": 0,
-            "crawl_total_time": 0.0,
-            "ai_call_count": 0,
-            "ai_total_time": 0.0,
-            "cache_hits": 0,
-            "cache_misses": 0,
-        }
+        for metric in self._metrics:
+            metric.clear()
+
+
+class _Inflight:
+
+    def __init__(self, gauge: Gauge, kind: str):
+        self.gauge = gauge
+        self.kind = kind
+
+    async def __aenter__(self):
+        self.gauge.inc(self.kind)
+
+    async def __aexit__(self, *exc):
+        self.gauge.dec(self.kind)
+
+
+class MetricsMiddleware:
+    """记录每个接口的请求耗时和数据库耗时（按路由模板聚合，避免路径参数导致指标膨胀）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        db_time = [0.0]
+        token = _request_db_time.set(db_time)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_db_time.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or ("static" if scope["path"].startswith("/static") else "unmatched")
+            perf_stats.http_seconds.observe(time.perf_counter() - start, endpoint, scope["method"], status)
+            if db_time[0]:
+                perf_stats.db_seconds.observe(db_time[0], endpoint)
 
 # 全局统计实例
 perf_stats = PerformanceStats()
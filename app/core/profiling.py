@@ -0,0 +1,278 @@
+"""
+运行中进程的采样剖析（无需重启、无额外依赖）
+- 后台线程按固定间隔读取 sys._current_frames()，并遍历事件循环上挂起的协程（await 链），
+  wall 模式记录所有线程和所有挂起任务，cpu 模式只记录正在执行（非阻塞等待）的线程栈
+- 单个请求：带 X-Profile 头（且管理令牌正确）时只采样处理该请求的任务，结果按 X-Profile-Id 取回
+- 输出 collapsed stacks（flamegraph.pl / speedscope 均可导入）或 speedscope JSON
+未开启时没有任何采样线程；请求级剖析的中间件只在配置了 ADMIN_TOKEN 时挂载，且只检查一次请求头
+"""
+import asyncio
+import os
+import secrets
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+PROFILE_MODES = ("wall", "cpu")
+PROFILE_FORMATS = ("speedscope", "collapsed")
+PROFILE_MAX_SECONDS = 60
+PROFILE_DEFAULT_INTERVAL_MS = 5
+PROFILE_REQUEST_INTERVAL_MS = 1  # 单个请求通常只有几十到几百毫秒，采样更密
+PROFILE_MAX_STACK_DEPTH = 128
+PROFILE_STORE_SIZE = 20  # 保留最近的请求级剖析结果数
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+
+_STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+# cpu 模式下视为空闲（阻塞等待）的栈顶函数
+_IDLE_FUNCTIONS = {"select", "poll", "wait", "_wait_for_tstate_lock", "get", "accept", "sleep", "_worker"}
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    # 按字节比较：compare_digest 遇到非 ASCII 字符串会抛 TypeError
+    return bool(settings.ADMIN_TOKEN and token) and secrets.compare_digest(
+        token.encode(), settings.ADMIN_TOKEN.encode())
+
+
+def _frame_key(code) -> tuple:
+    return (getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno)
+
+
+def frame_stack(frame) -> list:
+    """从根到叶的帧列表"""
+    stack = []
+    while frame is not None and len(stack) < PROFILE_MAX_STACK_DEPTH:
+        stack.append(_frame_key(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _coroutine_stack(coro) -> list:
+    """挂起协程的 await 链（从外到内），末尾是正在等待的对象"""
+    stack = []
+    while coro is not None and len(stack) < PROFILE_MAX_STACK_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_key(frame.f_code))
+        awaited = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+        if awaited is not None and not hasattr(awaited, "cr_frame") and not hasattr(awaited, "gi_frame") \
+                and not hasattr(awaited, "ag_frame"):
+            # C 实现的 Future 迭代器类型名为 FutureIter
+            kind = "Future" if type(awaited).__name__ == "FutureIter" else type(awaited).__name__
+            stack.append((f"<await {kind}>", "", 0))
+            break
+        coro = awaited
+    return stack
+
+
+def _is_idle(stack: list) -> bool:
+    name, filename, _ = stack[-1]
+    return name.rsplit(".", 1)[-1] in _IDLE_FUNCTIONS and filename.startswith(_STDLIB_DIR)
+
+
+class StackSampler:
+    """
+    在后台线程中采样，samples 为 {(根帧, ..., 叶帧): 次数}；
+    指定 task 时只记录该任务：它在运行时取事件循环线程的栈，挂起时取它的 await 链
+    """
+
+    def __init__(self, mode: str = "wall", interval: float = PROFILE_DEFAULT_INTERVAL_MS / 1000,
+                 task: Optional[asyncio.Task] = None):
+        self.mode = mode
+        self.interval = interval
+        self.task = task
+        self.samples = Counter()
+        self.ticks = 0
+        self.duration = 0.0
+        self._started = 0.0
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            try:
+                if self.task is not None:
+                    self._sample_task()
+                else:
+                    self._sample_all(own)
+            except Exception:
+                # 与事件循环线程并发读取任务集合，偶发的竞争直接丢弃本次采样
+                continue
+            self.ticks += 1
+
+    def _add(self, root: str, stack: list):
+        if stack:
+            self.samples[((root, "", 0), *stack)] += 1
+
+    def _sample_all(self, own: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        for ident, frame in frames.items():
+            if ident == own:
+                continue
+            stack = frame_stack(frame)
+            if self.mode == "cpu" and (not stack or _is_idle(stack)):
+                continue
+            self._add(f"thread:{names.get(ident, ident)}", stack)
+
+        if self.mode == "wall":
+            running = asyncio.current_task(self._loop)
+            for task in asyncio.all_tasks(self._loop):
+                if task is not running:
+                    self._add(f"task:{task.get_name()}", _coroutine_stack(task.get_coro()))
+
+    def _sample_task(self):
+        if self.task.done():
+            return
+        if asyncio.current_task(self._loop) is self.task:
+            frame = sys._current_frames().get(self._loop_thread)
+            self._add("running", frame_stack(frame))
+        else:
+            self._add("awaiting", _coroutine_stack(self.task.get_coro()))
+
+    # --- 输出 ---
+
+    @property
+    def sample_ms(self) -> float:
+        """每个样本代表的时长（按实际采样次数折算，采样线程被延迟时也能反映真实耗时）"""
+        return self.duration * 1000 / self.ticks if self.ticks else self.interval * 1000
+
+    def collapsed(self) -> str:
+        """flamegraph.pl 的 folded 格式：a;b;c 次数"""
+        return "\n".join(
+            ";".join(frame_label(frame) for frame in stack) + f" {count}"
+            for stack, count in self.samples.most_common()
+        ) + "\n"
+
+    def speedscope(self, name: str) -> dict:
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.samples.most_common():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    func, filename, line = frame
+                    frames.append({"name": func, "file": filename, "line": line} if filename else {"name": func})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(round(count * self.sample_ms, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "exporter": settings.PROJECT_NAME,
+            "name": name,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"{name} ({self.mode}, {self.ticks} samples)",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def render(self, fmt: str, name: str):
+        return self.collapsed() if fmt == "collapsed" else self.speedscope(name)
+
+
+def frame_label(frame: tuple) -> str:
+    func, filename, line = frame
+    if not filename:
+        return func
+    return f"{func} ({os.path.basename(filename)}:{line})"
+
+
+class Profiler:
+    """进程级剖析（同一时间只允许一个）和请求级剖析结果的保存"""
+
+    def __init__(self):
+        self._busy = False
+        self._results = OrderedDict()
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    async def profile(self, seconds: float, mode: str = "wall",
+                      interval_ms: float = PROFILE_DEFAULT_INTERVAL_MS) -> StackSampler:
+        """采样整个进程 seconds 秒（调用方先检查 busy）"""
+        self._busy = True
+        try:
+            sampler = StackSampler(mode, interval_ms / 1000).start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                sampler.stop()
+            print(f"[Profile] {mode} profile: {sampler.ticks} samples in {sampler.duration:.1f}s")
+            return sampler
+        finally:
+            self._busy = False
+
+    def save(self, sampler: StackSampler, profile_id: Optional[str] = None) -> str:
+        profile_id = profile_id or uuid.uuid4().hex[:12]
+        self._results[profile_id] = sampler
+        while len(self._results) > PROFILE_STORE_SIZE:
+            self._results.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[StackSampler]:
+        return self._results.get(profile_id)
+
+
+class ProfilingMiddleware:
+    """请求带 X-Profile 头和正确的 X-Admin-Token 时，采样处理该请求的任务，响应头返回 X-Profile-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        # 与 Starlette 一致按 latin-1 解码，任意字节都不会解码失败
+        if PROFILE_HEADER not in headers or not is_admin_token(headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler("wall", PROFILE_REQUEST_INTERVAL_MS / 1000, task=asyncio.current_task()).start()
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.save(sampler.stop(), profile_id)
+
+
+# 全局单例
+profiler = Profiler()
@@ -1,39 +1,247 @@
 """
-数据库索引优化脚本
+数据库结构升级与索引优化脚本
+新表由启动时的 create_all 自动创建；已有表新增的列在这里补齐。
 运行: python -m app.db.migrations
 """
 from sqlalchemy import text
 from app.db.session import engine
+from app.db.models import Base, CJK_GRAMS_FUNCTION_SQL, SEARCH_GRAMS_SQL, SEARCH_TEXT_SQL, SEARCH_VECTOR_SQL
+from app.services.date_parser import parse_publish_date
+from app.services.trends import trend_service
+from app.services.url_normalizer import normalize_url
 import asyncio
 
+async def apply_schema_updates():
+    """为已有表补充新增列"""
+    updates = [
+        # 中文子串检索依赖 pg_trgm
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        # contract_tasks: 批量分析所属批次
+        "ALTER TABLE contract_tasks ADD COLUMN IF NOT EXISTS batch_id VARCHAR REFERENCES contract_batches(id);",
+        # contract_tasks: 脱敏占位符映射
+        "ALTER TABLE contract_tasks ADD COLUMN IF NOT EXISTS token_map JSON;",
+        # intelligence_items: 规范化 URL（去重用）
+        "ALTER TABLE intelligence_items ADD COLUMN IF NOT EXISTS normalized_url TEXT;",
+        # intelligence_items: 解析后的发布日期
+        "ALTER TABLE intelligence_items ADD COLUMN IF NOT EXISTS published_on DATE;",
+        # updated_at: 读接口 ETag 使用的表版本
+        "ALTER TABLE intelligence_items ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc');",
+        "ALTER TABLE intelligence_sources ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc');",
+        "ALTER TABLE contract_tasks ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc');",
+        # intelligence_sources: 自适应定时采集
+        "ALTER TABLE intelligence_sources ADD COLUMN IF NOT EXISTS crawl_interval_minutes INTEGER;",
+        "ALTER TABLE intelligence_sources ADD COLUMN IF NOT EXISTS next_crawl_at TIMESTAMP;",
+        "ALTER TABLE intelligence_sources ADD COLUMN IF NOT EXISTS last_new_items INTEGER DEFAULT 0;",
+        "ALTER TABLE intelligence_sources ADD COLUMN IF NOT EXISTS items_per_run INTEGER;",
+        # 外键改为 ON DELETE CASCADE：删除信源/合同任务时由数据库删除下属记录
+        "ALTER TABLE intelligence_items DROP CONSTRAINT IF EXISTS intelligence_items_source_id_fkey, "
+        "ADD CONSTRAINT intelligence_items_source_id_fkey FOREIGN KEY (source_id) "
+        "REFERENCES intelligence_sources(id) ON DELETE CASCADE;",
+        "ALTER TABLE contract_risks DROP CONSTRAINT IF EXISTS contract_risks_task_id_fkey, "
+        "ADD CONSTRAINT contract_risks_task_id_fkey FOREIGN KEY (task_id) "
+        "REFERENCES contract_tasks(id) ON DELETE CASCADE;",
+        # intelligence_items: 全文检索生成列（添加时自动回填已有数据）
+        f"ALTER TABLE intelligence_items ADD COLUMN IF NOT EXISTS search_text TEXT GENERATED ALWAYS AS ({SEARCH_TEXT_SQL}) STORED;",
+        f"ALTER TABLE intelligence_items ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED;",
+        CJK_GRAMS_FUNCTION_SQL,
+        f"ALTER TABLE intelligence_items ADD COLUMN IF NOT EXISTS search_grams TEXT[] GENERATED ALWAYS AS ({SEARCH_GRAMS_SQL}) STORED;",
+    ]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for sql in updates:
+            print(f"Applying: {sql}")
+            await conn.execute(text(sql))
+
+    print("✅ Schema updated successfully!")
+
+async def migrate_item_bodies(batch_size: int = 500):
+    """把 intelligence_items 中的正文分批迁移到 intelligence_item_bodies，并清空旧列"""
+    moved = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(text("""
+                WITH batch AS (
+                    SELECT id, original_text, translated_text FROM intelligence_items
+                    WHERE original_text IS NOT NULL OR translated_text IS NOT NULL
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                ), inserted AS (
+                    INSERT INTO intelligence_item_bodies (item_id, original_text, translated_text)
+                    SELECT id, original_text, translated_text FROM batch
+                    ON CONFLICT (item_id) DO NOTHING
+                )
+                UPDATE intelligence_items SET original_text = NULL, translated_text = NULL
+                WHERE id IN (SELECT id FROM batch)
+            """), {"batch_size": batch_size})
+        if result.rowcount == 0:
+            break
+        moved += result.rowcount
+        print(f"Moved {moved} item bodies...")
+
+    print(f"✅ Item bodies migrated ({moved} rows). Run VACUUM intelligence_items to reclaim space.")
+
+async def backfill_normalized_urls(batch_size: int = 1000):
+    """
+    为历史数据回填 normalized_url。
+    同一规范化 URL 只保留最早的一条，其余重复记录保持 NULL（不参与唯一约束）。
+    """
+    filled = 0
+    duplicates = 0
+    last_key = None
+    async with engine.begin() as conn:
+        claimed = set(
+            row[0] for row in await conn.execute(text(
+                "SELECT normalized_url FROM intelligence_items WHERE normalized_url IS NOT NULL"
+            ))
+        )
+    while True:
+        async with engine.begin() as conn:
+            params = {"batch_size": batch_size}
+            where = "normalized_url IS NULL AND url IS NOT NULL"
+            if last_key:
+                where += " AND (created_at, id) > (:created_at, :id)"
+                params.update(created_at=last_key[0], id=last_key[1])
+            rows = (await conn.execute(text(f"""
+                SELECT id, url, created_at FROM intelligence_items
+                WHERE {where}
+                ORDER BY created_at, id
+                LIMIT :batch_size
+            """), params)).fetchall()
+            if not rows:
+                break
+            last_key = (rows[-1].created_at, rows[-1].id)
+
+            updates = []
+            for row in rows:
+                normalized = normalize_url(row.url)
+                if normalized in claimed:
+                    duplicates += 1
+                    continue
+                claimed.add(normalized)
+                updates.append({"id": row.id, "normalized_url": normalized})
+            if updates:
+                await conn.execute(
+                    text("UPDATE intelligence_items SET normalized_url = :normalized_url WHERE id = :id"),
+                    updates
+                )
+            filled += len(updates)
+        print(f"Backfilled {filled} normalized URLs ({duplicates} duplicates skipped)...")
+
+    print(f"✅ Normalized URLs backfilled ({filled} rows, {duplicates} duplicates left NULL).")
+
+async def backfill_published_on(batch_size: int = 1000):
+    """把历史数据的 publish_date 字符串解析为 published_on"""
+    parsed = 0
+    scanned = 0
+    last_id = None
+    while True:
+        async with engine.begin() as conn:
+            params = {"batch_size": batch_size}
+            where = "published_on IS NULL AND publish_date IS NOT NULL"
+            if last_id:
+                where += " AND id > :last_id"
+                params["last_id"] = last_id
+            rows = (await conn.execute(text(f"""
+                SELECT id, publish_date FROM intelligence_items
+                WHERE {where}
+                ORDER BY id
+                LIMIT :batch_size
+            """), params)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            scanned += len(rows)
+
+            updates = [
+                {"id": row.id, "published_on": published_on}
+                for row in rows
+                if (published_on := parse_publish_date(row.publish_date))
+            ]
+            if updates:
+                await conn.execute(
+                    text("UPDATE intelligence_items SET published_on = :published_on, updated_at = now() AT TIME ZONE 'utc' WHERE id = :id"),
+                    updates
+                )
+            parsed += len(updates)
+        print(f"Parsed {parsed}/{scanned} publish dates...")
+
+    print(f"✅ Publish dates backfilled ({parsed} parsed, {scanned - parsed} unrecognized).")
+
 async def add_indexes():
     """添加性能优化索引"""
     indexes = [
         # intelligence_items 表索引
         "CREATE INDEX IF NOT EXISTS idx_intelligence_items_url ON intelligence_items(url);",
+        # URL 去重：唯一索引（与模型 unique=True, index=True 生成的索引同名），供 ON CONFLICT 使用
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_intelligence_items_normalized_url ON intelligence_items(normalized_url);",
         "CREATE INDEX IF NOT EXISTS idx_intelligence_items_source_id ON intelligence_items(source_id);",
         "CREATE INDEX IF NOT EXISTS idx_intelligence_items_created_at ON intelligence_items(created_at DESC);",
-        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_publish_date ON intelligence_items(publish_date);",
-        
+        # publish_date 是字符串，无法用于范围查询，改为索引解析后的 published_on
+        "DROP INDEX IF EXISTS idx_intelligence_items_publish_date;",
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_published_on ON intelligence_items(published_on DESC, id DESC);",
+        # 列表游标分页及筛选：(created_at, id) 排序键，按信源/类型筛选时同样走索引顺序扫描
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_created_id ON intelligence_items(created_at DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_source_created ON intelligence_items(source_id, created_at DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_type_created ON intelligence_items(content_type, created_at DESC, id DESC);",
+        # 标签筛选：risk_tags @> '["tag"]'
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_risk_tags ON intelligence_items USING GIN ((risk_tags::jsonb) jsonb_path_ops);",
+        # HTTP 缓存表版本：max(updated_at)
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_updated_at ON intelligence_items(updated_at);",
+        # 全文检索：英文 tsvector + 中文三元组
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_search_vector ON intelligence_items USING GIN (search_vector);",
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_search_trgm ON intelligence_items USING GIN (search_text gin_trgm_ops);",
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_items_search_grams ON intelligence_items USING GIN (search_grams);",
+
         # intelligence_sources 表索引
         "CREATE INDEX IF NOT EXISTS idx_intelligence_sources_status ON intelligence_sources(status);",
         "CREATE INDEX IF NOT EXISTS idx_intelligence_sources_last_crawled ON intelligence_sources(last_crawled_at);",
-        
+        # HTTP 缓存表版本：max(updated_at)
+        "CREATE INDEX IF NOT EXISTS idx_intelligence_sources_updated_at ON intelligence_sources(updated_at);",
+
+        # crawl_jobs：领取任务（待执行按 run_at、执行中按租约到期时间）
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_crawl_jobs_active_source ON crawl_jobs(source_id) WHERE status IN ('queued', 'running');",
+        "CREATE INDEX IF NOT EXISTS idx_crawl_jobs_queued ON crawl_jobs(run_at) WHERE status = 'queued';",
+        "CREATE INDEX IF NOT EXISTS idx_crawl_jobs_running ON crawl_jobs(locked_until) WHERE status = 'running';",
+        "CREATE INDEX IF NOT EXISTS idx_crawl_jobs_created_at ON crawl_jobs(created_at DESC);",
+        # intelligence_sources：定时调度查找到期信源
+        "CREATE INDEX IF NOT EXISTS ix_intelligence_sources_next_crawl_at ON intelligence_sources(next_crawl_at);",
+        # crawl_frontier：按信源取优先级最高的待采集链接
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_crawl_frontier_source_url ON crawl_frontier(source_id, normalized_url);",
+        "CREATE INDEX IF NOT EXISTS idx_crawl_frontier_priority ON crawl_frontier(source_id, discovered_at DESC, position);",
+        # crawl_runs：按信源查看最近的采集记录、按时间范围汇总阶段耗时
+        "CREATE INDEX IF NOT EXISTS idx_crawl_runs_source_started ON crawl_runs(source_id, started_at DESC);",
+        "CREATE INDEX IF NOT EXISTS ix_crawl_runs_started_at ON crawl_runs(started_at);",
+        # llm_calls：按时间范围、信源、合同任务汇总用量
+        "CREATE INDEX IF NOT EXISTS ix_llm_calls_created_at ON llm_calls(created_at);",
+        "CREATE INDEX IF NOT EXISTS ix_llm_calls_source_id ON llm_calls(source_id);",
+        "CREATE INDEX IF NOT EXISTS ix_llm_calls_contract_task_id ON llm_calls(contract_task_id);",
+
         # contract_risks 表索引
         "CREATE INDEX IF NOT EXISTS idx_contract_risks_task_id ON contract_risks(task_id);",
         "CREATE INDEX IF NOT EXISTS idx_contract_risks_risk_level ON contract_risks(risk_level);",
-        
+
         # contract_tasks 表索引
         "CREATE INDEX IF NOT EXISTS idx_contract_tasks_status ON contract_tasks(status);",
         "CREATE INDEX IF NOT EXISTS idx_contract_tasks_upload_time ON contract_tasks(upload_time DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_contract_tasks_batch_id ON contract_tasks(batch_id);",
+        "CREATE INDEX IF NOT EXISTS idx_contract_tasks_updated_at ON contract_tasks(updated_at);",
     ]
-    
+
     async with engine.begin() as conn:
         for idx_sql in indexes:
             print(f"Creating index: {idx_sql}")
             await conn.execute(text(idx_sql))
-    
+
     print("✅ All indexes created successfully!")
 
+async def main():
+    await apply_schema_updates()
+    await migrate_item_bodies()
+    await backfill_normalized_urls()
+    await backfill_published_on()
+    await trend_service.rebuild()
+    await add_indexes()
+
 if __name__ == "__main__":
-    asyncio.run(add_indexes())
+    asyncio.run(main())
@@ -1,11 +1,36 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Text, JSON, Float, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, String, Boolean, Date, DateTime, Text, JSON, Float, ForeignKey, Integer, Computed, Index, text, DDL, event
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID, TSVECTOR
+from sqlalchemy.orm import relationship, declarative_base, deferred
 import uuid
 from datetime import datetime
 
 Base = declarative_base()
 
+# 全文检索生成列（由数据库在插入/更新时自动维护）
+SEARCH_TEXT_SQL = (
+    "coalesce(title, '') || ' ' || coalesce(title_zh, '') || ' ' || "
+    "coalesce(summary, '') || ' ' || coalesce(risk_hint, '')"
+)
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(title_zh, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(summary, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(risk_hint, '')), 'C')"
+)
+# 连续汉字串中的单字和相邻两字（字符范围与 app.services.search.CJK_PATTERN 一致）。
+# pg_trgm 对不足 3 个字的子串无法使用索引，而中文检索词多为两个字，这类词改用该数组上的 GIN 索引
+CJK_GRAMS_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION cjk_grams(doc text) RETURNS text[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(DISTINCT substr(run[1], i, n)), '{}')
+    FROM regexp_matches(doc, '[㐀-䶿一-鿿豈-﫿]+', 'g') AS run,
+         generate_series(1, char_length(run[1])) AS i,
+         (VALUES (1), (2)) AS width(n)
+    WHERE i + n - 1 <= char_length(run[1])
+$$
+"""
+SEARCH_GRAMS_SQL = f"cjk_grams({SEARCH_TEXT_SQL})"
+
 class IntelligenceSource(Base):
     __tablename__ = "intelligence_sources"
 
@@ -14,48 +39,175 @@ class IntelligenceSource(Base):
     status = Column(String, default="active")  # active, inactive, error
     last_crawled_at = Column(DateTime, nullable=True)
     error_message = Column(Text, nullable=True)
+    # 自适应定时采集：间隔随新文章产出调整
+    crawl_interval_minutes = Column(Integer, nullable=True)
+    next_crawl_at = Column(DateTime, nullable=True, index=True)
+    last_new_items = Column(Integer, default=0) # 最近一轮采到的新文章数
+    items_per_run = Column(Integer, nullable=True) # 每轮最多处理的新文章数，为空时使用全局配置
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # 用于 HTTP 缓存的表版本
 
-    items = relationship("IntelligenceItem", back_populates="source")
+    # 删除信源时由数据库级联删除其情报
+    items = relationship("IntelligenceItem", back_populates="source",
+                         cascade="all, delete-orphan", passive_deletes=True)
 
 class IntelligenceItem(Base):
     __tablename__ = "intelligence_items"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    source_id = Column(String, ForeignKey("intelligence_sources.id"))
+    source_id = Column(String, ForeignKey("intelligence_sources.id", ondelete="CASCADE"))
     url = Column(Text, nullable=True) # Specific article URL
+    normalized_url = Column(Text, nullable=True, unique=True, index=True) # 规范化 URL，用于去重
     
     title = Column(String, nullable=True)
     title_zh = Column(String, nullable=True)  # 中文标题
     publish_date = Column(String, nullable=True) # Keep as string for flexibility parsing
+    published_on = Column(Date, nullable=True) # publish_date 解析后的日期，用于排序和范围筛选
     content_type = Column(String, nullable=True)
     summary = Column(Text, nullable=True)
     risk_tags = Column(JSON, nullable=True)
     risk_hint = Column(Text, nullable=True)
-    original_text = Column(Text, nullable=True)
-    translated_text = Column(Text, nullable=True)
+    # 旧版正文列：正文已迁移到 intelligence_item_bodies，这里仅为未迁移的历史数据保留（延迟加载）
+    original_text = deferred(Column(Text, nullable=True))
+    translated_text = deferred(Column(Text, nullable=True))
     relevance_score = Column(Float, default=0.0)
     
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # 用于 HTTP 缓存的表版本
+
+    # 检索列：search_text 供 pg_trgm 做中文子串匹配，search_grams 供一两个字的中文词匹配，search_vector 供英文全文检索
+    search_text = deferred(Column(Text, Computed(SEARCH_TEXT_SQL, persisted=True)))
+    search_grams = deferred(Column(ARRAY(Text), Computed(SEARCH_GRAMS_SQL, persisted=True)))
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
     
     source = relationship("IntelligenceSource", back_populates="items")
+    body = relationship("IntelligenceItemBody", uselist=False, back_populates="item",
+                        cascade="all, delete-orphan", passive_deletes=True)
+
+# create_all 建表前先创建生成列依赖的函数
+event.listen(IntelligenceItem.__table__, "before_create", DDL(CJK_GRAMS_FUNCTION_SQL))
+
+class IntelligenceItemBody(Base):
+    """文章正文和译文，单独存放以保持 intelligence_items 表窄小"""
+    __tablename__ = "intelligence_item_bodies"
+
+    item_id = Column(String, ForeignKey("intelligence_items.id", ondelete="CASCADE"), primary_key=True)
+    original_text = Column(Text, nullable=True)
+    translated_text = Column(Text, nullable=True)
+
+    item = relationship("IntelligenceItem", back_populates="body")
+
+class CrawlJob(Base):
+    """
+    信源采集任务队列。
+    worker 用 FOR UPDATE SKIP LOCKED 领取任务并持有租约（locked_until），
+    租约过期未续期的任务会被其他 worker 重新领取；失败按指数退避重试。
+    """
+    __tablename__ = "crawl_jobs"
+    __table_args__ = (
+        # 每个信源同时最多一个待执行/执行中的任务
+        Index("uq_crawl_jobs_active_source", "source_id", unique=True,
+              postgresql_where=text("status IN ('queued', 'running')")),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    source_id = Column(String, ForeignKey("intelligence_sources.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, default="queued") # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_at = Column(DateTime, default=datetime.utcnow) # 最早可执行时间（重试退避）
+    locked_by = Column(String, nullable=True) # 持有租约的 worker
+    locked_until = Column(DateTime, nullable=True) # 租约到期时间
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class CrawlRun(Base):
+    """
+    单次信源采集记录。stages 按阶段汇总：
+    {"seed_fetch": {"n": 1, "ms": 5400, "max_ms": 5400, "bytes": 81234, "cache_hits": 0}, "extraction": {..., "tokens": 5210}, ...}
+    """
+    __tablename__ = "crawl_runs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    source_id = Column(String, ForeignKey("intelligence_sources.id", ondelete="CASCADE"), nullable=False)
+    started_at = Column(DateTime, default=datetime.utcnow, index=True)
+    duration_ms = Column(Integer, default=0)
+    outcome = Column(String, nullable=True) # ok, no_new, no_articles, fetch_failed, error
+    error = Column(Text, nullable=True) # 完整错误信息（信源上的 error_message 只保留 200 字符）
+    items_discovered = Column(Integer, default=0) # 列表页发现的新链接数
+    items_processed = Column(Integer, default=0) # 本轮处理的文章数
+    items_inserted = Column(Integer, default=0)
+    stages = Column(JSONB, nullable=True)
+
+class LLMCall(Base):
+    """单次 LLM 调用的用量和成本，删除信源 / 合同任务后保留记录用于成本统计"""
+    __tablename__ = "llm_calls"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    purpose = Column(String, nullable=False) # relevance, extract, discover, contract_clause
+    model = Column(String, nullable=True)
+    source_id = Column(String, ForeignKey("intelligence_sources.id", ondelete="SET NULL"), nullable=True, index=True)
+    contract_task_id = Column(String, ForeignKey("contract_tasks.id", ondelete="SET NULL"), nullable=True, index=True)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    cached_tokens = Column(Integer, default=0) # 命中上下文缓存的输入 token
+    latency_ms = Column(Integer, default=0)
+    ok = Column(Boolean, default=True)
+    cost_usd = Column(Float, default=0.0)
+
+class CrawlFrontierLink(Base):
+    """列表页发现但尚未处理的文章链接，按优先级分多轮消化"""
+    __tablename__ = "crawl_frontier"
+    __table_args__ = (
+        Index("uq_crawl_frontier_source_url", "source_id", "normalized_url", unique=True),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    source_id = Column(String, ForeignKey("intelligence_sources.id", ondelete="CASCADE"), nullable=False)
+    url = Column(Text, nullable=False)
+    normalized_url = Column(Text, nullable=False)
+    position = Column(Integer, default=0) # 在列表页中的位置，越靠前通常越新
+    attempts = Column(Integer, default=0) # 抓取失败次数
+    discovered_at = Column(DateTime, default=datetime.utcnow)
+
+class ContractBatch(Base):
+    __tablename__ = "contract_batches"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = Column(String, nullable=True)
+    status = Column(String, default="processing") # processing, done, failed
+    total_files = Column(Integer, default=0)
+    overall_risk_level = Column(String, nullable=True) # High, Medium, Low
+    summary = Column(JSON, nullable=True) # 组合级风险汇总
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    tasks = relationship("ContractTask", back_populates="batch")
 
 class ContractTask(Base):
     __tablename__ = "contract_tasks"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    batch_id = Column(String, ForeignKey("contract_batches.id"), nullable=True)
     filename = Column(String, nullable=False)
     upload_time = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # 用于 HTTP 缓存的表版本
     status = Column(String, default="processing") # processing, done, failed
     overall_risk_level = Column(String, nullable=True) # High, Medium, Low
+    token_map = Column(JSON, nullable=True) # 脱敏占位符 -> 原值，用于展示时还原
     
-    risks = relationship("ContractRisk", back_populates="task")
+    risks = relationship("ContractRisk", back_populates="task",
+                         cascade="all, delete-orphan", passive_deletes=True)
+    batch = relationship("ContractBatch", back_populates="tasks")
 
 class ContractRisk(Base):
     __tablename__ = "contract_risks"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    task_id = Column(String, ForeignKey("contract_tasks.id"))
+    task_id = Column(String, ForeignKey("contract_tasks.id", ondelete="CASCADE"))
     
     clause_id = Column(String, nullable=True)
     clause_text = Column(Text, nullable=True)
@@ -66,3 +218,17 @@ class ContractRisk(Base):
     confidence = Column(Float, default=0.0)
 
     task = relationship("ContractTask", back_populates="risks")
+
+class IntelligenceTrendRollup(Base):
+    """
+    情报数量日汇总（日期 × 信源 × 类型 × 风险标签），供趋势图直接读取。
+    risk_tag 为空字符串的行是该维度下的情报总数（每条情报只计一次），
+    其余行按标签计数（一条情报可计入多个标签）。
+    """
+    __tablename__ = "intelligence_trend_rollups"
+
+    day = Column(Date, primary_key=True)
+    source_id = Column(String, primary_key=True, default="")
+    content_type = Column(String, primary_key=True, default="")
+    risk_tag = Column(String, primary_key=True, default="")
+    item_count = Column(Integer, nullable=False, default=0)
@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.performance import perf_stats
 
 # 性能优化: 关闭SQL日志、配置连接池
 engine = create_async_engine(
@@ -12,6 +13,9 @@ engine = create_async_engine(
     pool_recycle=3600  # 1小时回收连接
 )
 
+# 按请求累计数据库耗时（/metrics）
+perf_stats.instrument_engine(engine)
+
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
@@ -1,10 +1,25 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.http_cache import FastJSONResponse
+from app.core.performance import Counter, Gauge, MetricsMiddleware, perf_stats
+from app.core.profiling import ProfilingMiddleware
 from app.api import endpoints
+from app.db.session import AsyncSessionLocal
+from app.services.cache_service import cache_service
+from app.services.events import event_bus
+from sqlalchemy import text
 
-app = FastAPI(title=settings.PROJECT_NAME)
+app = FastAPI(title=settings.PROJECT_NAME, default_response_class=FastJSONResponse)
+
+# 请求耗时 / 数据库耗时指标（放在最内层，才能拿到匹配后的路由模板）
+app.add_middleware(MetricsMiddleware)
+
+# 请求级性能剖析（X-Profile 头），只在配置了管理令牌时挂载
+if settings.ADMIN_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
 
 # CORS
 app.add_middleware(
@@ -13,8 +28,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Profile-Id"],
 )
 
+# 响应压缩（gzip / brotli）
+app.add_middleware(CompressionMiddleware)
+
 # Mount Static Files (Frontend)
 app.mount("/static", StaticFiles(directory="static", html=True), name="static")
 
@@ -24,6 +43,41 @@ app.include_router(endpoints.router, prefix="/api")
 async def root():
     return {"message": "Strategic Risk Intelligence System is Running"}
 
+async def collect_queue_metrics() -> list:
+    """抓取时计算的队列深度、缓存大小等指标"""
+    queue_depth = Gauge("crawl_jobs", "Crawl jobs by status", ("status",))
+    frontier = Gauge("crawl_frontier_links", "Discovered links waiting to be processed")
+    cache_entries = Gauge("cache_entries", "Entries held per cache and tier", ("cache", "tier"))
+    cache_bytes = Gauge("cache_bytes", "Bytes held per cache and tier (disk tier compressed)", ("cache", "tier"))
+    cache_events = Counter("cache_tier_events_total", "Cache hits, misses and evictions per tier",
+                           ("cache", "tier", "event"))
+    subscribers = Gauge("event_subscribers", "Connected change-feed subscribers")
+
+    for cache in cache_service.caches:
+        for tier, (entries, size) in cache.usage().items():
+            cache_entries.set(entries, cache.name, tier)
+            cache_bytes.set(size, cache.name, tier)
+        for tier, events in cache.stats.items():
+            for event, count in events.items():
+                cache_events.inc(cache.name, tier, event, amount=count)
+    subscribers.set(event_bus.subscriber_count)
+    try:
+        async with AsyncSessionLocal() as db:
+            for status, count in (await db.execute(text("SELECT status, count(*) FROM crawl_jobs GROUP BY status"))).all():
+                queue_depth.set(count, status)
+            frontier.set((await db.execute(text("SELECT count(*) FROM crawl_frontier"))).scalar())
+    except Exception as e:
+        print(f"[Metrics] Queue depth query failed: {e}")
+    return [queue_depth, frontier, cache_entries, cache_bytes, cache_events, subscribers]
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标"""
+    return Response(
+        perf_stats.render(await collect_queue_metrics()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -2,10 +2,13 @@ import json
 import re
 import yaml
 import os
+import time
 from urllib.parse import urlparse
 from openai import AsyncOpenAI
 from app.core.config import settings
+from app.core.performance import note_span, perf_stats
 from app.services.cache_service import cache_service
+from app.services.llm_usage import llm_usage
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 # Initialize Client - DeepSeek compatible endpoint
@@ -17,6 +20,38 @@ client = AsyncOpenAI(
 # 使用配置中的模型
 MODEL = settings.DEEPSEEK_MODEL
 
+
+async def chat_completion(call_type: str, **kwargs):
+    """调用 LLM 并记录耗时、token 用量和成本（/metrics、llm_calls）"""
+    start = time.perf_counter()
+    try:
+        response = await client.chat.completions.create(**kwargs)
+    except Exception:
+        elapsed = time.perf_counter() - start
+        perf_stats.record_ai_call(elapsed, call_type, ok=False)
+        llm_usage.record(call_type, kwargs.get("model"), None, elapsed * 1000, ok=False)
+        raise
+    elapsed = time.perf_counter() - start
+    usage = getattr(response, "usage", None)
+    perf_stats.record_ai_call(
+        elapsed, call_type,
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+    )
+    llm_usage.record(call_type, getattr(response, "model", None) or kwargs.get("model"), usage, elapsed * 1000)
+    note_span(llm_calls=1, tokens=getattr(usage, "total_tokens", None) or 0)
+    return response
+
+
+# 列表页单次发现的链接上限（未处理的链接进入信源待采集队列，分多轮消化）
+DISCOVERY_MAX_LINKS = 30
+
+# Markdown 链接 [文本](URL "标题")：文本不含方括号、URL 不含空白和方括号，
+# 未闭合的括号只会扫描到下一个括号为止，避免长页面上回溯成平方复杂度
+MARKDOWN_LINK_RE = re.compile(r'\[([^\[\]]*)\]\((https?://[^)\s\[\]]+(?:\s+"[^"\n]*")?)\)')
+# gov.uz 列表页的相对路径新闻链接
+GOV_UZ_NEWS_LINK_RE = re.compile(r'\[([^\[\]]*)\]\((/en/[^)\s\[\]]+/news/view/\d+)\)')
+
 # ============================================================
 # 站点提示词配置 - 从 YAML 文件加载
 # ============================================================
@@ -114,7 +149,8 @@ class AIEngine:
         """
         
         try:
-            response = await client.chat.completions.create(
+            response = await chat_completion(
+                "relevance",
                 model=MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -140,7 +176,7 @@ class AIEngine:
         """
         # 检查缓存
         content_hash = cache_service.hash_content(text[:1000])  # 用前1000字符做哈希
-        cached = cache_service.get_extraction(content_hash)
+        cached = await cache_service.get_extraction(content_hash)
         if cached:
             print(f"[Cache] Hit for extraction: {url}")
             return cached
@@ -185,7 +221,8 @@ class AIEngine:
 """
         
         try:
-            response = await client.chat.completions.create(
+            response = await chat_completion(
+                "extract",
                 model=MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -211,22 +248,20 @@ class AIEngine:
         Analyzes page type and extracts relevant article links if it's a list page.
         Uses site-specific prompts for better accuracy.
         """
-        import re
-        
         # 获取站点特定配置
         site_config = get_site_config(url)
         site_name = site_config.get("name", "通用")
         link_hints = site_config.get("link_hints", "")
         
         # 预处理：提取所有链接
-        all_links = re.findall(r'\[([^\]]*)\]\((https?://[^)]+)\)', markdown)
+        all_links = MARKDOWN_LINK_RE.findall(markdown)
         filtered_links = [(text, href) for text, href in all_links 
                           if 'javascript' not in href and '#' not in href]
         
         # 特殊处理：gov.uz 网站 - 提取相对路径的新闻链接
         if 'gov.uz' in url:
             # 提取相对路径链接
-            relative_links = re.findall(r'\[([^\]]*)\]\((/en/[^)]+/news/view/\d+)\)', markdown)
+            relative_links = GOV_UZ_NEWS_LINK_RE.findall(markdown)
             if relative_links:
                 news_links = [f"https://gov.uz{href}" for text, href in relative_links]
                 # 去重
@@ -234,7 +269,7 @@ class AIEngine:
                 print(f"[{site_name}] Found {len(news_links)} news links")
                 return {
                     "page_type": "list",
-                    "links": news_links[:10],
+                    "links": news_links[:DISCOVERY_MAX_LINKS],
                     "reason": f"乌兹别克斯坦政府网站，提取到 {len(news_links)} 个新闻链接"
                 }
         
@@ -253,7 +288,7 @@ class AIEngine:
                 print(f"[{site_name}] Found {len(subdomain_art_links)} subdomain article links")
                 return {
                     "page_type": "list",
-                    "links": subdomain_art_links[:15],
+                    "links": subdomain_art_links[:DISCOVERY_MAX_LINKS],
                     "reason": f"商务部境外风险预警页面，提取到 {len(subdomain_art_links)} 个子域名文章链接"
                 }
         
@@ -293,7 +328,7 @@ class AIEngine:
    - 分类/标签/作者页面链接
    - 图片/视频/下载链接
 
-3. **提取数量**：最多提取 5-10 个最相关的文章链接
+3. **提取数量**：按页面中的先后顺序，最多提取 {DISCOVERY_MAX_LINKS} 个文章链接
 
 【输出格式】
 返回 JSON：
@@ -319,7 +354,8 @@ class AIEngine:
 {markdown[:3000]}
 """
             
-            response = await client.chat.completions.create(
+            response = await chat_completion(
+                "discover",
                 model=MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -340,7 +376,7 @@ class AIEngine:
                     if "login" in link.lower() or "register" in link.lower():
                         continue
                     valid_links.append(link)
-                result["links"] = valid_links[:10]  # 最多10个
+                result["links"] = valid_links[:DISCOVERY_MAX_LINKS]
             
             print(f"[{site_name}] Page type: {result.get('page_type')}, Links: {len(result.get('links', []))}")
             return result
@@ -430,7 +466,8 @@ class AIEngine:
         user_content += f"\n【合同条款内容】\n{clause_text}"
         
         try:
-            response = await client.chat.completions.create(
+            response = await chat_completion(
+                "contract_clause",
                 model=MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
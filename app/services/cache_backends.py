@@ -0,0 +1,332 @@
+"""
+缓存共享层（两级缓存的第二级）
+- sqlite：本地文件（WAL），同一主机上的多个 uvicorn worker / 采集 worker 进程共用；按容量淘汰最久未访问的条目
+- redis：多主机共享；过期由 Redis TTL 处理，容量由服务端 maxmemory 策略（建议 allkeys-lru）控制
+键按 "命名空间:缓存名:键" 隔离（同一 Redis / 文件可供多套部署共用，修改 CACHE_NAMESPACE 即整体失效）。
+删除 / 清空会写入失效日志，各进程定时拉取并清掉自己内存层中的对应条目（跨 worker 失效）。
+读取在读取线程池中执行（Redis 往返、sqlite 查询都不占用事件循环）；写入、淘汰、失效日志、容量统计都在单个后台线程
+按提交顺序执行。sqlite 的读取使用独立连接（WAL 下不等待写入），不与后台线程的压缩、淘汰、锁等待竞争
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+CACHE_BACKENDS = ("sqlite", "redis", "none")
+SHARED_PRUNE_TARGET = 0.9  # 超过容量时淘汰到容量的 90%，避免每次写入都触发淘汰
+INVALIDATION_RETENTION_SECONDS = 3600  # 失效日志保留时长（远大于拉取间隔即可）
+INVALIDATION_STREAM_MAXLEN = 10000
+CACHE_READ_THREADS = 4
+
+
+class CacheBackend(ABC):
+    """
+    共享层接口，值为压缩后的字节串。
+    get 通过 read 在读取线程池执行（也可在其他非事件循环线程直接调用）；usage 只返回 refresh_usage 记录的结果；
+    其余方法通过 submit 在后台线程执行
+    """
+
+    name = "base"
+    errors: tuple = ()
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+        # 读取不排在写入后面
+        self._read_executor = ThreadPoolExecutor(max_workers=CACHE_READ_THREADS, thread_name_prefix="cache-reader")
+
+    def scope(self, cache: str) -> str:
+        return f"{self.namespace}:{cache}"
+
+    def submit(self, fn, *args) -> Future:
+        """交给后台线程执行 fn(*args)，出错时打印并返回 None"""
+        return self._executor.submit(self._guarded, fn, *args)
+
+    def read(self, fn, *args) -> Future:
+        """交给读取线程池执行 fn(*args)"""
+        return self._read_executor.submit(fn, *args)
+
+    def _guarded(self, fn, *args):
+        try:
+            return fn(*args)
+        except self.errors as e:
+            print(f"[Cache] {self.name} cache operation {fn.__name__} failed: {e}")
+
+    def flush(self):
+        """等待已提交的操作完成"""
+        self._executor.submit(lambda: None).result()
+
+    @abstractmethod
+    def get(self, cache: str, key: str) -> Optional[Tuple[bytes, float]]:
+        """返回 (值, 过期时间戳)；不存在或已过期返回 None"""
+
+    @abstractmethod
+    def put(self, cache: str, key: str, blob: bytes, expires_at: float, max_bytes: int) -> int:
+        """写入，返回因容量淘汰的条目数"""
+
+    def touch(self, cache: str, key: str):
+        """记录访问时间（按最久未访问淘汰时使用）"""
+
+    @abstractmethod
+    def delete(self, cache: str, key: str):
+        """删除单个条目"""
+
+    @abstractmethod
+    def clear(self, cache: str):
+        """删除该缓存的全部条目"""
+
+    def usage(self, cache: str) -> Optional[Tuple[int, int]]:
+        """最近一次统计的 (条目数, 字节数)；未统计或无法统计时返回 None"""
+        return None
+
+    def refresh_usage(self, cache: str):
+        """重新统计容量（后台线程）"""
+
+    # --- 跨进程失效 ---
+
+    @abstractmethod
+    def publish(self, cache: str, key: Optional[str], origin: str):
+        """记录一次失效（key 为 None 表示整个缓存）"""
+
+    @abstractmethod
+    def latest_cursor(self):
+        """当前失效日志的位置，新进程从这里开始拉取"""
+
+    @abstractmethod
+    def poll(self, cursor) -> Tuple[object, List[Tuple[str, Optional[str], str]]]:
+        """返回 (新位置, [(缓存名, 键, 来源)])"""
+
+
+class SqliteBackend(CacheBackend):
+
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+
+    def __init__(self, path: str, namespace: str):
+        super().__init__(namespace)
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        # 读取专用连接：写连接可能因压缩、淘汰或等待其他进程的写锁（最长 5 秒）被占用
+        self._reader = None
+        self._read_lock = threading.Lock()
+        # 每个缓存在磁盘上的字节数估计值（淘汰时按实际值校正），超过容量才触发淘汰
+        self._used = {}
+        # refresh_usage 的统计结果，供 /metrics 直接读取
+        self._usage = {}
+
+    def _open(self, timeout: float) -> sqlite3.Connection:
+        """打开连接并确保表已创建（表已存在时不需要写锁）"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (cache, key)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed ON cache_entries (cache, accessed_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_invalidations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    namespace TEXT NOT NULL,
+                    cache TEXT NOT NULL,
+                    key TEXT,
+                    origin TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self._open(timeout=5)
+        return self._conn
+
+    def _read(self, sql: str, params: tuple = ()) -> list:
+        with self._read_lock:
+            if self._reader is None:
+                # 锁冲突时很快放弃（按未命中处理），不长时间阻塞调用线程
+                self._reader = self._open(timeout=0.1)
+            return self._reader.execute(sql, params).fetchall()
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            self._connect().execute(sql, params)
+
+    def _fetch(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def get(self, cache: str, key: str) -> Optional[Tuple[bytes, float]]:
+        rows = self._read(
+            "SELECT value, expires_at FROM cache_entries WHERE cache = ? AND key = ?", (self.scope(cache), key)
+        )
+        if not rows or rows[0][1] <= time.time():
+            return None
+        return rows[0]
+
+    def put(self, cache: str, key: str, blob: bytes, expires_at: float, max_bytes: int) -> int:
+        scope = self.scope(cache)
+        self._execute(
+            "INSERT OR REPLACE INTO cache_entries (cache, key, value, size, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (scope, key, blob, len(blob), expires_at, time.time()),
+        )
+        if scope not in self._used:
+            self._used[scope] = self._count(scope)[1]
+        else:
+            self._used[scope] += len(blob)
+        if self._used[scope] <= max_bytes:
+            return 0
+        return self._prune(scope, max_bytes)
+
+    def _prune(self, scope: str, max_bytes: int) -> int:
+        """删除过期条目，仍超过容量时按最久未访问淘汰"""
+        with self._lock:
+            conn = self._connect()
+            evicted = conn.execute(
+                "DELETE FROM cache_entries WHERE cache = ? AND expires_at <= ?", (scope, time.time())
+            ).rowcount
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE cache = ?", (scope,)
+            ).fetchone()[0]
+            if total > max_bytes:
+                keys = []
+                for key, size in conn.execute(
+                    "SELECT key, size FROM cache_entries WHERE cache = ? ORDER BY accessed_at", (scope,)
+                ):
+                    if total <= max_bytes * SHARED_PRUNE_TARGET:
+                        break
+                    keys.append((scope, key))
+                    total -= size
+                conn.executemany("DELETE FROM cache_entries WHERE cache = ? AND key = ?", keys)
+                evicted += len(keys)
+        self._used[scope] = total
+        return evicted
+
+    def touch(self, cache: str, key: str):
+        self._execute(
+            "UPDATE cache_entries SET accessed_at = ? WHERE cache = ? AND key = ?", (time.time(), self.scope(cache), key)
+        )
+
+    def delete(self, cache: str, key: str):
+        self._execute("DELETE FROM cache_entries WHERE cache = ? AND key = ?", (self.scope(cache), key))
+
+    def clear(self, cache: str):
+        self._execute("DELETE FROM cache_entries WHERE cache = ?", (self.scope(cache),))
+        self._used[self.scope(cache)] = 0
+
+    def usage(self, cache: str) -> Optional[Tuple[int, int]]:
+        return self._usage.get(self.scope(cache))
+
+    def refresh_usage(self, cache: str):
+        scope = self.scope(cache)
+        self._usage[scope] = self._count(scope)
+
+    def _count(self, scope: str) -> Tuple[int, int]:
+        return tuple(self._fetch(
+            "SELECT count(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE cache = ?", (scope,)
+        )[0])
+
+    def publish(self, cache: str, key: Optional[str], origin: str):
+        now = time.time()
+        self._execute(
+            "INSERT INTO cache_invalidations (namespace, cache, key, origin, created_at) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, cache, key, origin, now),
+        )
+        self._execute("DELETE FROM cache_invalidations WHERE created_at < ?", (now - INVALIDATION_RETENTION_SECONDS,))
+
+    def latest_cursor(self) -> int:
+        return self._fetch("SELECT COALESCE(MAX(id), 0) FROM cache_invalidations")[0][0]
+
+    def poll(self, cursor: int):
+        rows = self._fetch(
+            "SELECT id, cache, key, origin FROM cache_invalidations WHERE id > ? AND namespace = ? ORDER BY id",
+            (cursor, self.namespace),
+        )
+        if not rows:
+            return cursor, []
+        return rows[-1][0], [(cache, key, origin) for _, cache, key, origin in rows]
+
+
+class RedisBackend(CacheBackend):
+    """client 可传入任何 redis-py 兼容的客户端（如测试用的 fakeredis.FakeRedis）"""
+
+    name = "redis"
+
+    def __init__(self, url: str, namespace: str, client=None):
+        super().__init__(namespace)
+        import redis
+
+        self.errors = (redis.RedisError, OSError)
+        self.client = client or redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.stream = f"{namespace}:invalidations"
+
+    def _key(self, cache: str, key: str) -> str:
+        return f"{self.scope(cache)}:{key}"
+
+    def get(self, cache: str, key: str) -> Optional[Tuple[bytes, float]]:
+        name = self._key(cache, key)
+        blob, ttl_ms = self.client.pipeline(transaction=False).get(name).pttl(name).execute()
+        if blob is None:
+            return None
+        # 没有过期时间的键（pttl 为 -1）不过期，由内存层 LRU 和跨进程失效淘汰
+        return blob, (time.time() + ttl_ms / 1000 if ttl_ms > 0 else math.inf)
+
+    def put(self, cache: str, key: str, blob: bytes, expires_at: float, max_bytes: int) -> int:
+        ttl_ms = int((expires_at - time.time()) * 1000)
+        if ttl_ms > 0:
+            self.client.set(self._key(cache, key), blob, px=ttl_ms)
+        return 0
+
+    def delete(self, cache: str, key: str):
+        self.client.delete(self._key(cache, key))
+
+    def clear(self, cache: str):
+        batch = []
+        for name in self.client.scan_iter(match=f"{self.scope(cache)}:*", count=1000):
+            batch.append(name)
+            if len(batch) >= 500:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
+
+    def publish(self, cache: str, key: Optional[str], origin: str):
+        self.client.xadd(self.stream, {"cache": cache, "key": key if key is not None else "", "origin": origin},
+                         maxlen=INVALIDATION_STREAM_MAXLEN, approximate=True)
+
+    def latest_cursor(self) -> str:
+        last = self.client.xrevrange(self.stream, count=1)
+        return _text(last[0][0]) if last else "0-0"
+
+    def poll(self, cursor: str):
+        response = self.client.xread({self.stream: cursor}, count=1000)
+        if not response:
+            return cursor, []
+        entries = response[0][1]
+        events = []
+        for _, fields in entries:
+            fields = {_text(k): _text(v) for k, v in fields.items()}
+            events.append((fields["cache"], fields["key"] or None, fields["origin"]))
+        return _text(entries[-1][0]), events
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
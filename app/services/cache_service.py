@@ -1,45 +1,309 @@
 """
-简单的内存缓存服务 (Phase 1)
-后续可升级为 Redis
+两级缓存服务
+- 内存层：进程内按字节数限制的 LRU，条目带过期时间
+- 共享层：CACHE_BACKEND 选择的 SQLite 文件或 Redis（见 cache_backends），值经 zlib 压缩，多个 worker 进程共用，
+  重启后仍可命中
+- 写入先进内存，共享层写入交给后台线程；内存未命中时在共享层的读取线程中查询并解压（aget），都不阻塞事件循环
+- 删除 / 清空通过共享层的失效日志通知其他进程，各进程每秒拉取一次并清掉自己的内存层
+URL 缓存和 AI 提取结果缓存使用同一套实现，容量各自独立
 """
-from cachetools import TTLCache
-from typing import Optional
+import asyncio
 import hashlib
 import json
+import os
+import sys
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.performance import note_span, perf_stats
+from app.services.cache_backends import CACHE_BACKENDS, CacheBackend, RedisBackend, SqliteBackend
+
+CACHE_TIERS = ("memory", "shared")
+CACHE_EVENTS = ("hit", "miss", "eviction")
+CACHE_NAMES = ("url", "extraction")
+CACHE_INVALIDATION_POLL_SECONDS = 1
+CACHE_USAGE_REFRESH_SECONDS = 15  # 共享层容量统计间隔（count / SUM 需扫描整个缓存）
+
+
+def _sizeof(value: Any) -> int:
+    """内存层的条目大小（字符串按实际占用，其它按 JSON 长度估算）"""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    return len(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def _done() -> Future:
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+class MemoryLRU:
+    """按字节数限制容量的 LRU"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.time():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: str, value: Any, size: int, expires_at: float) -> int:
+        """写入并返回被淘汰的条目数；单条超过总容量的不进内存"""
+        self.delete(key)
+        if size > self.max_bytes:
+            return 0
+        self._entries[key] = (value, size, expires_at)
+        self.bytes += size
+        evicted = 0
+        while self.bytes > self.max_bytes:
+            _, (_, old_size, _) = self._entries.popitem(last=False)
+            self.bytes -= old_size
+            evicted += 1
+        return evicted
+
+    def delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+
+class TieredCache:
+    """内存 LRU + 共享层；值需可 JSON 序列化"""
+
+    def __init__(self, name: str, ttl: int, memory_bytes: int, shared_bytes: int,
+                 backend: Optional[CacheBackend] = None, origin: str = ""):
+        self.name = name
+        self.ttl = ttl
+        self.memory = MemoryLRU(memory_bytes)
+        self.backend = backend
+        self.shared_bytes = shared_bytes
+        self.origin = origin
+        self.stats = {tier: dict.fromkeys(CACHE_EVENTS, 0) for tier in CACHE_TIERS}
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    def get(self, key: str) -> Optional[Any]:
+        """同步读取，内存未命中时在调用线程读共享层；事件循环中使用 aget"""
+        value = self._get_memory(key)
+        if value is not None or self.backend is None:
+            return value
+        return self._promote(key, self._read_shared(key))
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """内存未命中时在共享层的读取线程中查询并解压"""
+        value = self._get_memory(key)
+        if value is not None or self.backend is None:
+            return value
+        return self._promote(key, await asyncio.wrap_future(self.backend.read(self._read_shared, key)))
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        self.stats["memory"]["hit" if value is not None else "miss"] += 1
+        return value
+
+    def _read_shared(self, key: str) -> Optional[tuple]:
+        """读取共享层并解压，返回 (值, 过期时间戳)；读取失败按未命中处理"""
+        try:
+            row = self.backend.get(self.name, key)
+        except self.backend.errors as e:
+            print(f"[Cache] {self.backend.name} cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        blob, expires_at = row
+        return json.loads(zlib.decompress(blob)), expires_at
+
+    def _promote(self, key: str, loaded: Optional[tuple]) -> Optional[Any]:
+        """记录共享层命中情况，命中时回填内存层"""
+        if loaded is None:
+            self.stats["shared"]["miss"] += 1
+            return None
+        self.stats["shared"]["hit"] += 1
+        value, expires_at = loaded
+        self.stats["memory"]["eviction"] += self.memory.set(key, value, _sizeof(value), expires_at)
+        self.backend.submit(self.backend.touch, self.name, key)
+        return value
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl
+        self.stats["memory"]["eviction"] += self.memory.set(key, value, _sizeof(value), expires_at)
+        if self.backend is not None:
+            self.backend.submit(self._write, key, value, expires_at)
+
+    def _write(self, key: str, value: Any, expires_at: float):
+        """后台线程：序列化、压缩、写入共享层"""
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False, default=str).encode())
+        self.stats["shared"]["eviction"] += self.backend.put(self.name, key, blob, expires_at, self.shared_bytes)
+
+    def delete(self, key: str) -> Future:
+        """删除条目并通知其他进程"""
+        self.memory.delete(key)
+        if self.backend is None:
+            return _done()
+        return self.backend.submit(self._invalidate_shared, key)
+
+    def clear(self) -> Future:
+        """清空本进程内存层，共享层的清空和失效通知在后台线程执行（返回其 Future）"""
+        self.memory.clear()
+        if self.backend is None:
+            return _done()
+        return self.backend.submit(self._invalidate_shared, None)
+
+    def _invalidate_shared(self, key: Optional[str]):
+        if key is None:
+            self.backend.clear(self.name)
+        else:
+            self.backend.delete(self.name, key)
+        self.backend.publish(self.name, key, self.origin)
+
+    def invalidate_local(self, key: Optional[str]):
+        """应用其他进程发布的失效（只动内存层）"""
+        if key is None:
+            self.memory.clear()
+        else:
+            self.memory.delete(key)
+
+    def usage(self) -> dict:
+        """{tier: (条目数, 字节数)}；共享层返回后台最近一次统计的结果，尚未统计或无法统计时不返回"""
+        usage = {"memory": (len(self.memory), self.memory.bytes)}
+        shared = self.backend.usage(self.name) if self.backend is not None else None
+        if shared is not None:
+            usage["shared"] = shared
+        return usage
+
+
+def create_backend() -> Optional[CacheBackend]:
+    """按 CACHE_BACKEND 创建共享层，none（或 sqlite 未配置目录）时只用进程内存"""
+    if settings.CACHE_BACKEND not in CACHE_BACKENDS:
+        raise ValueError(f"CACHE_BACKEND must be one of {', '.join(CACHE_BACKENDS)}")
+    if settings.CACHE_BACKEND == "redis":
+        return RedisBackend(settings.REDIS_URL, settings.CACHE_NAMESPACE)
+    if settings.CACHE_BACKEND == "sqlite" and settings.CACHE_DIR:
+        return SqliteBackend(os.path.join(settings.CACHE_DIR, "cache.sqlite3"), settings.CACHE_NAMESPACE)
+    return None
+
 
 class CacheService:
-    def __init__(self):
-        # URL -> Markdown 缓存 (24小时)
-        self.url_cache = TTLCache(maxsize=1000, ttl=86400)
-        
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        memory_bytes = settings.CACHE_MEMORY_MB * 1024 * 1024
+        shared_bytes = settings.CACHE_DISK_MB * 1024 * 1024
+        self.backend = backend
+        # 本进程发布的失效记录带上该标识，拉取时跳过
+        self.origin = uuid.uuid4().hex[:12]
+        self._cursor = None
+
+        # URL -> Markdown 缓存 (24小时)，页面较大，占总容量的 3/4
+        self.url_cache = TieredCache(
+            "url", 86400, memory_bytes * 3 // 4, shared_bytes * 3 // 4, backend, self.origin)
+
         # AI提取结果缓存 (7天)
-        self.extraction_cache = TTLCache(maxsize=500, ttl=604800)
-    
-    def get_url_content(self, url: str) -> Optional[str]:
+        self.extraction_cache = TieredCache(
+            "extraction", 604800, memory_bytes // 4, shared_bytes // 4, backend, self.origin)
+
+    @property
+    def caches(self) -> tuple:
+        return self.url_cache, self.extraction_cache
+
+    async def get_url_content(self, url: str) -> Optional[str]:
         """获取缓存的URL内容"""
-        return self.url_cache.get(url)
-    
+        content = await self.url_cache.aget(url)
+        if content is None:
+            perf_stats.record_cache_miss("url")
+        else:
+            perf_stats.record_cache_hit("url")
+            note_span(cache_hits=1)
+        return content
+
     def set_url_content(self, url: str, content: str):
         """缓存URL内容"""
-        self.url_cache[url] = content
-    
-    def get_extraction(self, content_hash: str) -> Optional[dict]:
+        self.url_cache.set(url, content)
+
+    async def get_extraction(self, content_hash: str) -> Optional[dict]:
         """获取缓存的AI提取结果"""
-        return self.extraction_cache.get(content_hash)
-    
+        data = await self.extraction_cache.aget(content_hash)
+        if data is None:
+            perf_stats.record_cache_miss("extraction")
+        else:
+            perf_stats.record_cache_hit("extraction")
+            note_span(cache_hits=1)
+        return data
+
     def set_extraction(self, content_hash: str, data: dict):
         """缓存AI提取结果"""
-        self.extraction_cache[content_hash] = data
-    
+        self.extraction_cache.set(content_hash, data)
+
     @staticmethod
     def hash_content(content: str) -> str:
         """生成内容哈希"""
         return hashlib.md5(content.encode()).hexdigest()
-    
+
+    def clear(self, names: Iterable[str] = CACHE_NAMES) -> List[Future]:
+        """清空指定缓存（所有进程），返回共享层清空的 Future"""
+        return [cache.clear() for cache in self.caches if cache.name in names]
+
     def clear_all(self):
-        """清空所有缓存"""
-        self.url_cache.clear()
-        self.extraction_cache.clear()
+        """清空所有缓存（包括共享层，其他进程的内存层在下次拉取失效记录时清空）"""
+        for future in self.clear():
+            future.result()
+
+    # --- 跨进程失效 ---
+
+    def poll_invalidations(self) -> list:
+        """读取其他进程发布的失效记录（在共享层后台线程中执行）；首次调用只记录当前位置"""
+        if self._cursor is None:
+            self._cursor = self.backend.latest_cursor()
+            return []
+        self._cursor, events = self.backend.poll(self._cursor)
+        return [(cache, key) for cache, key, origin in events if origin != self.origin]
+
+    def apply_invalidations(self, events: list):
+        caches = {cache.name: cache for cache in self.caches}
+        for name, key in events:
+            if name in caches:
+                caches[name].invalidate_local(key)
+
+    def refresh_usage(self):
+        """重新统计共享层容量（在共享层后台线程中执行）"""
+        for cache in self.caches:
+            self.backend.refresh_usage(cache.name)
+
+    async def run_periodic(self):
+        """后台定时拉取失效记录、统计共享层容量；没有共享层时不运行"""
+        if self.backend is None:
+            return
+        usage_refreshed_at = 0.0
+        while True:
+            if time.monotonic() - usage_refreshed_at >= CACHE_USAGE_REFRESH_SECONDS:
+                usage_refreshed_at = time.monotonic()
+                self.backend.submit(self.refresh_usage)
+            try:
+                events = await asyncio.wrap_future(self.backend.submit(self.poll_invalidations))
+                self.apply_invalidations(events or [])
+            except Exception as e:
+                print(f"[Cache] Invalidation poll failed: {e}")
+            await asyncio.sleep(CACHE_INVALIDATION_POLL_SECONDS)
 
 # 全局单例
-cache_service = CacheService()
+cache_service = CacheService(create_backend())
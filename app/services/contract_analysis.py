@@ -0,0 +1,294 @@
+"""
+合同分析流水线
+- analyze_contract_text: 单份合同的脱敏 → 规则预筛 → LLM 分析，单文件上传和批量分析共用
+- 批量组合分析: 解析在进程池中并行，LLM 分析受全局并发上限约束，最后汇总组合级风险
+"""
+import asyncio
+import io
+import os
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.performance import perf_stats
+from app.db.models import ContractBatch, ContractTask, ContractRisk
+from app.db.session import AsyncSessionLocal
+from app.services.ai_engine import ai_engine
+from app.services.contract_parser import ContractParser, contract_parser
+from app.services.contract_rules import contract_rule_engine
+from app.services.events import event_bus
+from app.services.llm_usage import llm_attribution
+
+CONTRACT_CHUNK_SIZE = 6000
+CONTRACT_MAX_LLM_CHUNKS = 3  # 每份合同最多送 LLM 分析的分块数
+CONTRACT_EXTENSIONS = (".pdf", ".docx")
+
+# ZIP 防护：限制文件数和解压后总大小
+ZIP_MAX_FILES = 500
+ZIP_MAX_TOTAL_BYTES = 500 * 1024 * 1024
+
+RISK_LEVEL_ORDER = {"High": 3, "Medium": 2, "Low": 1}
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """获取全局解析进程池（按需创建）"""
+    global _parse_pool
+    if _parse_pool is None:
+        workers = settings.CONTRACT_PARSE_WORKERS or os.cpu_count() or 1
+        if settings.LOW_MEMORY_MODE:
+            workers = 1
+        _parse_pool = ProcessPoolExecutor(max_workers=workers)
+        print(f"[Contract] Parse pool started with {workers} workers")
+    return _parse_pool
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """获取全局 LLM 分析并发上限（按需创建，所有批次共用）"""
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(settings.CONTRACT_BATCH_LLM_CONCURRENCY)
+    return _llm_semaphore
+
+
+async def analyze_contract_text(text: str, filename: str, task_id: Optional[str] = None) -> dict:
+    """
+    分析单份合同文本，LLM 用量记到 task_id 名下。
+    返回 {"risks": [...去重后的风险点...], "overall_risk_level": "High/Medium/Low", "token_map": {...}}
+    风险点中的引用文本保持脱敏状态，展示时用 token_map 还原。
+    """
+    safe_text, token_map = contract_parser.desensitize_with_map(text)
+
+    # 规则预筛: 单次扫描全文，只把命中规则得分最高的分块送 LLM 分析
+    selected = contract_rule_engine.select_chunks(safe_text, CONTRACT_CHUNK_SIZE, CONTRACT_MAX_LLM_CHUNKS)
+    total_chunks = (len(safe_text) + CONTRACT_CHUNK_SIZE - 1) // CONTRACT_CHUNK_SIZE
+    print(f"[Contract] {filename}: pre-screen selected chunks {[c.index + 1 for c in selected]} of {total_chunks} "
+          f"(scores: {[c.score for c in selected]})")
+
+    # 性能优化: 并行处理chunks
+    async def analyze_chunk(chunk):
+        print(f"[Contract] Analyzing chunk {chunk.index+1}/{total_chunks} (rules: {chunk.rule_ids})...")
+        return await ai_engine.analyze_contract_clause(
+            safe_text[chunk.start:chunk.end],
+            context=f"{filename} (第{chunk.index+1}部分，共{total_chunks}部分)",
+            contract_type=""
+        )
+
+    with llm_attribution(contract_task_id=task_id):
+        results = await asyncio.gather(*[analyze_chunk(chunk) for chunk in selected])
+
+    all_ai_risks = []
+    overall_levels = []
+    for ai_result in results:
+        if ai_result.get("risks"):
+            all_ai_risks.extend(ai_result["risks"])
+        if ai_result.get("overall_risk_level"):
+            overall_levels.append(ai_result["overall_risk_level"])
+
+    print(f"[Contract] Found {len(all_ai_risks)} risks")
+
+    risks = []
+    seen_clauses = set()
+    for risk in all_ai_risks:
+        clause_text = risk.get("clause_text", "")
+        clause_key = clause_text[:80] if clause_text else ""
+        if clause_key and clause_key not in seen_clauses:
+            seen_clauses.add(clause_key)
+            clause_id = risk.get("clause_id", "")
+            if not clause_id or clause_id == "无":
+                clause_id = f"风险点-{len(risks) + 1}"
+            risks.append({**risk, "clause_id": clause_id, "clause_text": clause_text})
+
+    if "High" in overall_levels or any(r.get("risk_level") == "High" for r in all_ai_risks):
+        overall = "High"
+    elif "Medium" in overall_levels or any(r.get("risk_level") == "Medium" for r in all_ai_risks):
+        overall = "Medium"
+    else:
+        overall = "Low"
+
+    return {"risks": risks, "overall_risk_level": overall, "token_map": token_map}
+
+
+def contract_task_event(task: ContractTask) -> dict:
+    """合同任务摘要（列表接口和变更事件共用）"""
+    return {
+        "id": task.id,
+        "filename": task.filename,
+        "status": task.status,
+        "overall_risk_level": task.overall_risk_level,
+        "batch_id": task.batch_id,
+        "created_at": task.upload_time
+    }
+
+
+def build_risk_rows(task_id: str, risks: List[dict]) -> List[ContractRisk]:
+    """把分析结果转换为 ContractRisk 记录"""
+    return [
+        ContractRisk(
+            task_id=task_id,
+            clause_text=risk.get("clause_text"),
+            clause_id=risk.get("clause_id"),
+            risk_category=risk.get("risk_category"),
+            risk_level=risk.get("risk_level", "Low"),
+            risk_reason=risk.get("risk_reason"),
+            explanation=risk.get("explanation"),
+            confidence=risk.get("confidence", 0.0)
+        )
+        for risk in risks
+    ]
+
+
+# ============================================================
+# 批量组合分析
+# ============================================================
+
+def expand_uploads(files: List[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """
+    展开上传文件：ZIP 包解压为其中的 PDF/DOCX，普通文件原样保留。
+    其他类型的文件会被忽略。
+    """
+    expanded = []
+    total_bytes = 0
+    for filename, data in files:
+        if filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                for info in zf.infolist():
+                    name = info.filename
+                    if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                        continue
+                    if not name.lower().endswith(CONTRACT_EXTENSIONS):
+                        continue
+                    total_bytes += info.file_size
+                    if len(expanded) >= ZIP_MAX_FILES or total_bytes > ZIP_MAX_TOTAL_BYTES:
+                        raise ValueError(f"压缩包过大（最多 {ZIP_MAX_FILES} 个文件，解压后不超过 {ZIP_MAX_TOTAL_BYTES // 1024 // 1024}MB）")
+                    expanded.append((name, zf.read(info)))
+        elif filename.lower().endswith(CONTRACT_EXTENSIONS):
+            expanded.append((filename, data))
+    return expanded
+
+
+def build_portfolio_rollup(tasks: List[ContractTask], risks: List[ContractRisk]) -> dict:
+    """组合级风险汇总"""
+    by_level = Counter(t.overall_risk_level for t in tasks if t.status == "done")
+    risk_levels = Counter(r.risk_level for r in risks)
+
+    # 每个风险类别涉及的合同数量
+    category_contracts = {}
+    for r in risks:
+        if r.risk_category:
+            category_contracts.setdefault(r.risk_category, set()).add(r.task_id)
+    by_category = sorted(
+        ({"risk_category": c, "contracts": len(ids)} for c, ids in category_contracts.items()),
+        key=lambda x: -x["contracts"]
+    )
+
+    high_counts = Counter(r.task_id for r in risks if r.risk_level == "High")
+    names = {t.id: t.filename for t in tasks}
+    top_contracts = [
+        {"task_id": task_id, "filename": names.get(task_id), "high_risks": count}
+        for task_id, count in high_counts.most_common(10)
+    ]
+
+    return {
+        "total": len(tasks),
+        "done": sum(1 for t in tasks if t.status == "done"),
+        "failed": [t.filename for t in tasks if t.status == "failed"],
+        "contracts_by_level": {level: by_level.get(level, 0) for level in RISK_LEVEL_ORDER},
+        "risks_by_level": {level: risk_levels.get(level, 0) for level in RISK_LEVEL_ORDER},
+        "risks_by_category": by_category,
+        "top_contracts": top_contracts,
+    }
+
+
+async def _process_batch_file(task_id: str, filename: str, data: bytes):
+    """单个文件：进程池解析 → 受限并发的 LLM 分析 → 写库（解析和分析期间不占用数据库连接）"""
+    result = None
+    try:
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(get_parse_pool(), ContractParser.parse_bytes, filename, data)
+        if not text or len(text) < 50:
+            raise Exception(f"文件解析失败或内容过短 (长度: {len(text) if text else 0})")
+
+        async with get_llm_semaphore():
+            result = await analyze_contract_text(text, filename, task_id)
+    except Exception as e:
+        print(f"[Batch] {filename} failed: {e}")
+
+    try:
+        task = await _save_batch_file_result(task_id, result)
+    except Exception as e:
+        # 结果写库失败（如风险行不合法）时至少把任务标记为失败，否则批次汇总会一直等待
+        print(f"[Batch] {filename} save failed: {e}")
+        task = await _save_batch_file_result(task_id, None)
+    if task:
+        event_bus.publish("contract.task", contract_task_event(task))
+
+
+async def _save_batch_file_result(task_id: str, result: Optional[dict]) -> Optional[ContractTask]:
+    async with AsyncSessionLocal() as db:
+        task = await db.get(ContractTask, task_id)
+        if not task:
+            return None
+        if result:
+            db.add_all(build_risk_rows(task.id, result["risks"]))
+            task.overall_risk_level = result["overall_risk_level"]
+            task.token_map = result["token_map"]
+            task.status = "done"
+        else:
+            task.status = "failed"
+        await db.commit()
+    return task
+
+
+async def process_contract_batch_background(batch_id: str, files: List[Tuple[str, str, bytes]]):
+    """后台处理合同批次，files 为 (task_id, filename, data) 列表"""
+    start = datetime.utcnow()
+
+    async with perf_stats.track_inflight("contract_batch"):
+        outcomes = await asyncio.gather(*[
+            _process_batch_file(task_id, filename, data)
+            for task_id, filename, data in files
+        ], return_exceptions=True)
+    for (_, filename, _), outcome in zip(files, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"[Batch] {filename} could not be recorded: {outcome}")
+
+    try:
+        async with AsyncSessionLocal() as db:
+            batch = await db.get(ContractBatch, batch_id)
+            if not batch:
+                return
+            tasks = (await db.execute(select(ContractTask).where(ContractTask.batch_id == batch_id))).scalars().all()
+            task_ids = [t.id for t in tasks]
+            risks = (await db.execute(select(ContractRisk).where(ContractRisk.task_id.in_(task_ids)))).scalars().all() if task_ids else []
+
+            for task in tasks:
+                if task.status not in ("done", "failed"):
+                    task.status = "failed"  # 结果未能写库的文件，批次结束后不会再更新
+            rollup = build_portfolio_rollup(tasks, risks)
+            levels = [t.overall_risk_level for t in tasks if t.status == "done" and t.overall_risk_level]
+            batch.overall_risk_level = max(levels, key=lambda level: RISK_LEVEL_ORDER.get(level, 0)) if levels else None
+            batch.summary = rollup
+            batch.status = "done" if rollup["done"] else "failed"
+            batch.finished_at = datetime.utcnow()
+            await db.commit()
+        event_bus.publish("contract.batch", {
+            "id": batch_id,
+            "status": batch.status,
+            "overall_risk_level": batch.overall_risk_level,
+            "done": rollup["done"],
+            "total": rollup["total"],
+        })
+    except Exception as e:
+        print(f"[Batch] Rollup error for {batch_id}: {e}")
+        return
+
+    elapsed = (datetime.utcnow() - start).total_seconds()
+    print(f"[Batch] {batch_id}: {rollup['done']}/{rollup['total']} contracts analyzed in {elapsed:.1f}s")
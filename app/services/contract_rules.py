@@ -0,0 +1,302 @@
+"""
+合同风险规则引擎
+规则从 config/contract_rules.yaml 加载（支持热加载）。
+扫描只遍历一次全文，分两步完成：
+  1. 关键字预筛：从每条规则的各个分支提取前导字面量，合并成一个字面量正则，
+     在小写文本上快速定位候选位置（作用类似 Aho-Corasick 关键字过滤）
+  2. 规则确认：只在候选位置上用预编译的规则正则做锚定匹配
+返回全部命中及其偏移量，并按分块打分，作为 LLM 分析前的预筛。
+"""
+import heapq
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+import yaml
+
+CONTRACT_RULES_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'contract_rules.yaml')
+
+DEFAULT_LEVEL_WEIGHTS = {"High": 3, "Medium": 2, "Low": 1}
+
+_REGEX_META = set('.^$*+?{}[]\\|()')
+_QUANTIFIERS = set('*?{')
+
+
+def _unwrap_group(pattern: str) -> str:
+    """去掉包裹整个表达式的一层捕获括号，如 (a|b) -> a|b"""
+    if not (pattern.startswith('(') and pattern.endswith(')')) or pattern.startswith('(?'):
+        return pattern
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+            if depth == 0 and i != len(pattern) - 1:
+                return pattern  # 形如 (a)|(b)，首尾括号不是同一对
+        i += 1
+    return pattern[1:-1]
+
+
+def split_alternatives(pattern: str) -> List[str]:
+    """按顶层 | 拆分正则分支"""
+    pattern = _unwrap_group(pattern.strip())
+    parts, buf = [], []
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            buf.append(pattern[i:i + 2])
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != ']'
+        elif ch == '[':
+            in_class = True
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == '|' and depth == 0:
+            parts.append(''.join(buf))
+            buf = []
+            i += 1
+            continue
+        buf.append(ch)
+        i += 1
+    parts.append(''.join(buf))
+    return parts
+
+
+def leading_literal(alternative: str) -> str:
+    """提取分支开头的字面量（遇到元字符为止；后跟量词时去掉最后一个字符）"""
+    literal = []
+    for ch in alternative:
+        if ch in _REGEX_META:
+            if ch in _QUANTIFIERS and literal:
+                literal.pop()
+            break
+        literal.append(ch)
+    return ''.join(literal).lower()
+
+
+@dataclass
+class RuleMatch:
+    """单条规则命中"""
+    rule_id: str
+    risk_category: str
+    risk_level: str
+    start: int
+    end: int
+    text: str
+
+
+@dataclass
+class ChunkScore:
+    """分块预筛结果"""
+    index: int
+    start: int
+    end: int
+    score: int = 0
+    matches: List[RuleMatch] = field(default_factory=list)
+
+    @property
+    def rule_ids(self) -> List[str]:
+        return list(dict.fromkeys(m.rule_id for m in self.matches))
+
+
+class ContractRuleEngine:
+
+    def __init__(self, rules_file: str = CONTRACT_RULES_FILE):
+        self.rules_file = rules_file
+        self._mtime = 0
+        self._loaded = False
+        self.rules: List[dict] = []
+        self.level_weights = dict(DEFAULT_LEVEL_WEIGHTS)
+        self._compiled: List[re.Pattern] = []
+        self._anchor_pattern: Optional[re.Pattern] = None
+        self._anchor_pattern_ci: Optional[re.Pattern] = None
+        self._candidates: Dict[str, List[int]] = {}
+        self._unanchored: List[int] = []
+
+    def load(self, config: Optional[dict] = None):
+        """加载并编译规则；传入 config 时直接使用（测试/基准用）"""
+        if config is None:
+            with open(self.rules_file, 'r', encoding='utf-8') as f:
+                config = yaml.safe_load(f) or {}
+
+        rules = [r for r in config.get("rules", []) if r.get("id") and r.get("pattern")]
+        compiled = [re.compile(r["pattern"], re.IGNORECASE) for r in rules]
+
+        anchors = set()
+        candidates: Dict[str, List[int]] = {}
+        unanchored = []
+        for idx, rule in enumerate(rules):
+            literals = [leading_literal(alt) for alt in split_alternatives(rule["pattern"])]
+            if not all(literals):
+                # 有分支无法提取字面量，整条规则退回全文扫描
+                unanchored.append(idx)
+                continue
+            for literal in literals:
+                anchors.add(literal)
+                bucket = candidates.setdefault(literal[0], [])
+                if idx not in bucket:
+                    bucket.append(idx)
+
+        self.rules = rules
+        self.level_weights = {**DEFAULT_LEVEL_WEIGHTS, **(config.get("level_weights") or {})}
+        self._compiled = compiled
+        self._candidates = {ch: sorted(bucket) for ch, bucket in candidates.items()}
+        self._unanchored = unanchored
+        if anchors:
+            # 长关键字在前，保证同一位置优先命中更长的字面量
+            alternation = "|".join(re.escape(a) for a in sorted(anchors, key=len, reverse=True))
+            self._anchor_pattern = re.compile(alternation)
+            self._anchor_pattern_ci = re.compile(alternation, re.IGNORECASE)
+        else:
+            self._anchor_pattern = self._anchor_pattern_ci = None
+        self._loaded = True
+        print(f"[Rules] Loaded {len(rules)} contract rules ({len(anchors)} anchors, {len(unanchored)} unanchored)")
+
+    def _ensure_loaded(self):
+        """文件更新时自动重新编译"""
+        try:
+            current_mtime = os.path.getmtime(self.rules_file)
+        except OSError:
+            current_mtime = self._mtime
+        if not self._loaded or current_mtime != self._mtime:
+            try:
+                self.load()
+                self._mtime = current_mtime
+            except Exception as e:
+                print(f"[Rules] Failed to load contract_rules.yaml: {e}")
+
+    def _iter_anchored(self, text: str) -> Iterator[RuleMatch]:
+        if not self._anchor_pattern:
+            return
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            finder, haystack = self._anchor_pattern, lowered
+        else:
+            # 个别字符小写后长度变化，偏移量不可靠，改用不区分大小写的预筛
+            finder, haystack = self._anchor_pattern_ci, text
+
+        # 每条规则各自记录上次命中的结束位置：同一规则的命中互不重叠（与 finditer 一致），
+        # 不同规则可以在同一位置或相互重叠的位置各自命中
+        resume = [0] * len(self._compiled)
+        pos = 0
+        end = len(text)
+        while pos < end:
+            hit = finder.search(haystack, pos)
+            if not hit:
+                return
+            start = hit.start()
+            for idx in self._candidates.get(haystack[start].lower(), ()):
+                if start < resume[idx]:
+                    continue
+                m = self._compiled[idx].match(text, start)
+                if m and m.end() > start:
+                    yield self._make_match(idx, m)
+                    resume[idx] = m.end()
+            pos = start + 1
+
+    def _iter_full_scan(self, idx: int, text: str) -> Iterator[RuleMatch]:
+        for m in self._compiled[idx].finditer(text):
+            yield self._make_match(idx, m)
+
+    def _make_match(self, idx: int, m: re.Match) -> RuleMatch:
+        rule = self.rules[idx]
+        return RuleMatch(
+            rule_id=rule["id"],
+            risk_category=rule.get("risk_category", ""),
+            risk_level=rule.get("risk_level", "Low"),
+            start=m.start(),
+            end=m.end(),
+            text=m.group(),
+        )
+
+    def iter_matches(self, text: str) -> Iterator[RuleMatch]:
+        """单次扫描，按偏移量顺序返回所有命中"""
+        self._ensure_loaded()
+        if not text or not self.rules:
+            return
+        if not self._unanchored:
+            yield from self._iter_anchored(text)
+            return
+        streams = [self._iter_anchored(text)]
+        streams.extend(self._iter_full_scan(idx, text) for idx in self._unanchored)
+        yield from heapq.merge(*streams, key=lambda m: m.start)
+
+    def scan(self, text: str) -> List[RuleMatch]:
+        return list(self.iter_matches(text))
+
+    def score_chunks(self, text: str, chunk_size: int) -> List[ChunkScore]:
+        """
+        按固定长度切分文本并打分。
+        命中按起始偏移归属分块，同一规则在分块内只计一次分。
+        """
+        chunks = [
+            ChunkScore(index=i, start=start, end=min(start + chunk_size, len(text)))
+            for i, start in enumerate(range(0, len(text), chunk_size))
+        ]
+        for match in self.iter_matches(text):
+            chunks[match.start // chunk_size].matches.append(match)
+
+        for chunk in chunks:
+            levels = {m.rule_id: m.risk_level for m in chunk.matches}
+            chunk.score = sum(self.level_weights.get(level, 1) for level in levels.values())
+        return chunks
+
+    def select_chunks(self, text: str, chunk_size: int, max_chunks: int) -> List[ChunkScore]:
+        """
+        选出最值得送 LLM 分析的分块（按原文顺序返回）。
+        无规则命中的分块直接跳过；若全文都无命中，则退回分析第一个分块。
+        """
+        scored = self.score_chunks(text, chunk_size)
+        hits = [c for c in scored if c.score > 0]
+        if not hits:
+            return scored[:1]
+        top = sorted(hits, key=lambda c: (-c.score, c.index))[:max_chunks]
+        return sorted(top, key=lambda c: c.index)
+
+    def to_risks(self, text: str) -> list:
+        """
+        兼容旧版 local_rule_check 的输出：每条规则取首个命中，附带上下文。
+        """
+        first_hits = {}
+        for match in self.iter_matches(text):
+            first_hits.setdefault(match.rule_id, match)
+
+        risks = []
+        for rule in self.rules:
+            match = first_hits.get(rule["id"])
+            if not match:
+                continue
+            start = max(0, match.start - 40)
+            end = min(len(text), match.end + 40)
+            context = re.sub(r'\s+', ' ', text[start:end].strip())
+            if len(context) > 120:
+                context = context[:120] + "..."
+
+            risks.append({
+                "clause_id": rule["id"],
+                "clause_text": f"「{context}」",
+                "risk_category": rule.get("risk_category"),
+                "risk_level": rule.get("risk_level"),
+                "risk_reason": f"规则检测: {rule.get('risk_category')}",
+                "explanation": rule.get("explanation"),
+                "confidence": 0.85
+            })
+        return risks
+
+
+# 全局单例
+contract_rule_engine = ContractRuleEngine()
@@ -0,0 +1,227 @@
+"""
+采集任务队列（crawl_jobs 表）
+- enqueue: 为信源创建待执行任务（同一信源已有待执行/执行中任务时跳过）
+- worker: 用 FOR UPDATE SKIP LOCKED 领取任务，执行期间定期续租；
+  进程崩溃后租约过期，任务会被任意进程中的 worker 重新领取
+- 失败按指数退避重试，超过最大次数后标记为 failed
+多个 uvicorn worker 或独立的 worker 进程（python -m app.worker）可以共同消费同一队列。
+"""
+import asyncio
+import os
+import random
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.performance import perf_stats
+from app.db.session import AsyncSessionLocal
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+RETRY_MAX_DELAY_SECONDS = 3600
+IDLE_POLL_SECONDS = 5
+JOB_RETENTION_DAYS = 7
+
+# 处理函数：接收 (source_id, url)，成功返回 True，失败返回 False 或抛出异常
+JobHandler = Callable[[str, str], Awaitable[bool]]
+
+CLAIM_SQL = text("""
+    UPDATE crawl_jobs AS j
+    SET status = 'running', locked_by = :worker, locked_until = :locked_until,
+        attempts = j.attempts + 1, started_at = :now
+    FROM (
+        SELECT id FROM crawl_jobs
+        WHERE (status = 'queued' AND run_at <= :now)
+           OR (status = 'running' AND locked_until < :now AND attempts < max_attempts)
+        ORDER BY run_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) AS next_job, intelligence_sources AS s
+    WHERE j.id = next_job.id AND s.id = j.source_id
+    RETURNING j.id, j.source_id, s.url, j.attempts, j.max_attempts
+""")
+
+# 最后一次尝试中 worker 崩溃（租约过期）的任务不再重领，直接标记失败，信源标记为 error
+FAIL_EXHAUSTED_SQL = text("""
+    WITH exhausted AS (
+        UPDATE crawl_jobs
+        SET status = 'failed', finished_at = :now, locked_by = NULL, locked_until = NULL,
+            last_error = coalesce(last_error, 'Lease expired on the final attempt')
+        WHERE status = 'running' AND locked_until < :now AND attempts >= max_attempts
+        RETURNING source_id
+    ), sources AS (
+        UPDATE intelligence_sources SET status = 'error', updated_at = :now
+        WHERE id IN (SELECT source_id FROM exhausted) AND status = 'processing'
+    )
+    SELECT count(*) FROM exhausted
+""")
+
+ENQUEUE_SQL = text("""
+    INSERT INTO crawl_jobs (id, source_id, status, attempts, max_attempts, run_at, created_at)
+    SELECT gen_random_uuid()::text, s.id, 'queued', 0, :max_attempts, :run_at, :now
+    FROM intelligence_sources AS s
+    WHERE s.id = ANY(:source_ids)
+    ON CONFLICT (source_id) WHERE status IN ('queued', 'running') DO NOTHING
+    RETURNING id, source_id
+""")
+
+
+def retry_delay(attempts: int) -> float:
+    """第 n 次失败后的等待时间：base * 2^(n-1)，带 ±20% 抖动，上限 1 小时"""
+    delay = settings.CRAWL_JOB_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return min(delay, RETRY_MAX_DELAY_SECONDS) * random.uniform(0.8, 1.2)
+
+
+class CrawlQueue:
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def enqueue(self, db: AsyncSession, source_ids: List[str], delay_seconds: float = 0) -> List[str]:
+        """
+        为信源创建采集任务，返回实际入队的 source_id（已有活动任务的信源会被跳过）。
+        调用方负责提交事务，提交后调用 wake() 通知本进程的 worker。
+        """
+        if not source_ids:
+            return []
+        now = datetime.utcnow()
+        result = await db.execute(ENQUEUE_SQL, {
+            "source_ids": list(source_ids),
+            "max_attempts": settings.CRAWL_JOB_MAX_ATTEMPTS,
+            "run_at": now + timedelta(seconds=delay_seconds),
+            "now": now,
+        })
+        return [row.source_id for row in result]
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def claim(self, worker_id: str) -> Optional[dict]:
+        """领取一个到期任务（或租约已过期的任务）"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(CLAIM_SQL, {
+                "worker": worker_id,
+                "now": now,
+                "locked_until": now + timedelta(seconds=settings.CRAWL_JOB_LEASE_SECONDS),
+            })).first()
+            if row is None:
+                # 空闲时顺带清理用尽重试次数的过期任务，释放信源的活动任务名额
+                await db.execute(FAIL_EXHAUSTED_SQL, {"now": now})
+            await db.commit()
+        return dict(row._mapping) if row else None
+
+    async def heartbeat(self, job_id: str, worker_id: str):
+        """执行期间定期续租"""
+        interval = max(settings.CRAWL_JOB_LEASE_SECONDS / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("""
+                    UPDATE crawl_jobs SET locked_until = :locked_until
+                    WHERE id = :id AND locked_by = :worker AND status = 'running'
+                """), {
+                    "id": job_id,
+                    "worker": worker_id,
+                    "locked_until": datetime.utcnow() + timedelta(seconds=settings.CRAWL_JOB_LEASE_SECONDS),
+                })
+                await db.commit()
+
+    async def finish(self, job: dict, worker_id: str, ok: bool, error: Optional[str] = None):
+        """标记任务完成；失败时按退避重新排队或标记为 failed（只更新自己仍持有租约的任务）"""
+        now = datetime.utcnow()
+        params = {"id": job["id"], "worker": worker_id, "now": now, "error": error}
+        if ok:
+            sql = "status = 'done', finished_at = :now, last_error = NULL"
+        elif job["attempts"] < job["max_attempts"]:
+            sql = "status = 'queued', run_at = :run_at, last_error = :error"
+            params["run_at"] = now + timedelta(seconds=retry_delay(job["attempts"]))
+        else:
+            sql = "status = 'failed', finished_at = :now, last_error = :error"
+        async with AsyncSessionLocal() as db:
+            await db.execute(text(f"""
+                UPDATE crawl_jobs SET {sql}, locked_by = NULL, locked_until = NULL
+                WHERE id = :id AND locked_by = :worker
+            """), params)
+            await db.commit()
+
+    async def _run_job(self, job: dict, worker_id: str, handler: JobHandler):
+        heartbeat = asyncio.create_task(self.heartbeat(job["id"], worker_id))
+        ok, error = False, None
+        try:
+            async with perf_stats.track_inflight("crawl_job"):
+                ok = await handler(job["source_id"], job["url"])
+            if not ok:
+                error = "Crawl failed"
+        except Exception as e:
+            error = str(e)[:500]
+            print(f"[Queue] Job {job['id']} raised: {e}")
+        finally:
+            heartbeat.cancel()
+        await self.finish(job, worker_id, bool(ok), error)
+        print(f"[Queue] Job {job['id']} (source {job['source_id']}, attempt {job['attempts']}) "
+              f"{'done' if ok else 'failed'}")
+
+    async def worker_loop(self, index: int, handler: JobHandler):
+        worker_id = f"{self._prefix}:{index}"
+        print(f"[Queue] Worker {worker_id} started")
+        while True:
+            try:
+                job = await self.claim(worker_id)
+            except Exception as e:
+                print(f"[Queue] Worker {worker_id} claim error: {e}")
+                job = None
+            if job:
+                await self._run_job(job, worker_id, handler)
+                continue
+            # 空闲：等待本进程入队通知或超时后重新轮询（其他进程入队的任务靠轮询发现）
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=IDLE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def recover(self):
+        """
+        启动时恢复：把用尽重试次数且租约过期的任务标记为 failed，
+        为卡在 processing 且没有活动任务的信源补建任务，并清理过期的已完成任务。
+        """
+        async with AsyncSessionLocal() as db:
+            exhausted = (await db.execute(FAIL_EXHAUSTED_SQL, {"now": datetime.utcnow()})).scalar()
+            stuck = (await db.execute(text("""
+                SELECT s.id FROM intelligence_sources s
+                WHERE s.status = 'processing'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM crawl_jobs j
+                      WHERE j.source_id = s.id AND j.status IN ('queued', 'running')
+                  )
+            """))).scalars().all()
+            requeued = await self.enqueue(db, stuck)
+            pruned = await db.execute(text("""
+                DELETE FROM crawl_jobs WHERE status IN ('done', 'failed') AND finished_at < :before
+            """), {"before": datetime.utcnow() - timedelta(days=JOB_RETENTION_DAYS)})
+            await db.commit()
+        self.wake()
+        print(f"[Queue] Recovered {len(requeued)} stuck sources, failed {exhausted} exhausted jobs, "
+              f"pruned {pruned.rowcount} old jobs")
+
+    def start_workers(self, handler: JobHandler, count: Optional[int] = None):
+        """启动本进程的 worker 协程"""
+        count = settings.CRAWL_WORKERS if count is None else count
+        for index in range(count):
+            self._workers.append(asyncio.create_task(self.worker_loop(index, handler)))
+
+    async def stop_workers(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+# 全局单例
+crawl_queue = CrawlQueue()
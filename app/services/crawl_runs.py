@@ -0,0 +1,144 @@
+"""
+信源采集记录（crawl_runs 表）
+每次 process_source_background 记录一行：总耗时、结果、条目数，以及按阶段汇总的
+耗时 / 字节数 / token 数 / 缓存命中（stages JSONB，同一阶段多次执行时累加）。
+阶段：seed_fetch, discovery, dedup, item_fetch, extraction, db_write
+"""
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.performance import current_span
+from app.db.models import CrawlRun
+from app.db.session import AsyncSessionLocal
+
+CRAWL_STAGES = ("seed_fetch", "discovery", "dedup", "item_fetch", "extraction", "db_write")
+CRAWL_RUN_RETENTION_DAYS = 90
+CRAWL_RUN_ERROR_MAX_LENGTH = 4000
+
+# rank 为总耗时在（当天）内的名次，by_day 时 top 按天分别生效
+SLOWEST_STAGES_SQL = """
+    SELECT * FROM (
+        SELECT r.source_id, s.url AS source_url, st.key AS stage, {day_column}
+               count(*) AS runs,
+               round(sum((st.value->>'ms')::numeric)) AS total_ms,
+               round(avg((st.value->>'ms')::numeric)) AS avg_ms,
+               round(percentile_cont(0.95) WITHIN GROUP (ORDER BY (st.value->>'ms')::numeric)) AS p95_ms,
+               max((st.value->>'max_ms')::numeric) AS max_ms,
+               sum(coalesce((st.value->>'n')::int, 0)) AS calls,
+               sum(coalesce((st.value->>'bytes')::bigint, 0)) AS bytes,
+               sum(coalesce((st.value->>'tokens')::bigint, 0)) AS tokens,
+               sum(coalesce((st.value->>'cache_hits')::int, 0)) AS cache_hits,
+               row_number() OVER ({partition} ORDER BY sum((st.value->>'ms')::numeric) DESC) AS rank
+        FROM crawl_runs r
+        JOIN intelligence_sources s ON s.id = r.source_id
+        CROSS JOIN LATERAL jsonb_each(r.stages) AS st
+        WHERE r.started_at >= :since {filters}
+        GROUP BY r.source_id, s.url, st.key {day_group}
+    ) AS ranked
+    WHERE rank <= :top
+    ORDER BY {order}
+"""
+
+
+class CrawlRunTrace:
+    """一次采集的计时记录（只在内存中累加，结束时写一行）"""
+
+    def __init__(self, source_id: str):
+        self.source_id = source_id
+        self.started_at = datetime.utcnow()
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.outcome = "error"
+        self.error: Optional[str] = None
+        self.items_discovered = 0
+        self.items_processed = 0
+        self.items_inserted = 0
+
+    @asynccontextmanager
+    async def span(self, stage: str):
+        """记录一个阶段；阶段内的抓取 / LLM 调用通过 note_span 累加字节和 token"""
+        counters = {}
+        token = current_span.set(counters)
+        start = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            current_span.reset(token)
+            self._merge(stage, (time.perf_counter() - start) * 1000, counters)
+
+    def _merge(self, stage: str, elapsed_ms: float, counters: dict):
+        totals = self.stages.setdefault(stage, {"n": 0, "ms": 0, "max_ms": 0})
+        totals["n"] += 1
+        totals["ms"] += round(elapsed_ms)
+        totals["max_ms"] = max(totals["max_ms"], round(elapsed_ms))
+        for key, value in counters.items():
+            totals[key] = totals.get(key, 0) + value
+
+    async def save(self):
+        """写入采集记录；记录失败不影响采集本身"""
+        try:
+            async with AsyncSessionLocal() as db:
+                db.add(CrawlRun(
+                    source_id=self.source_id,
+                    started_at=self.started_at,
+                    duration_ms=round((time.perf_counter() - self._start) * 1000),
+                    outcome=self.outcome,
+                    error=self.error[:CRAWL_RUN_ERROR_MAX_LENGTH] if self.error else None,
+                    items_discovered=self.items_discovered,
+                    items_processed=self.items_processed,
+                    items_inserted=self.items_inserted,
+                    stages=self.stages,
+                ))
+                await db.commit()
+        except Exception as e:
+            print(f"[CrawlRuns] Failed to save run for {self.source_id}: {e}")
+
+
+class CrawlRunService:
+
+    async def slowest_stages(
+        self,
+        db: AsyncSession,
+        days: int = 7,
+        source_id: Optional[str] = None,
+        stage: Optional[str] = None,
+        by_day: bool = False,
+        top: int = 20,
+    ) -> list:
+        """按 (信源, 阶段[, 日期]) 汇总耗时，按总耗时降序；by_day 时每天取 top 条，最近的日期在前"""
+        filters = []
+        params = {"since": datetime.utcnow() - timedelta(days=days), "top": top}
+        if source_id:
+            filters.append("AND r.source_id = :source_id")
+            params["source_id"] = source_id
+        if stage:
+            filters.append("AND st.key = :stage")
+            params["stage"] = stage
+        sql = SLOWEST_STAGES_SQL.format(
+            day_column="date_trunc('day', r.started_at)::date AS day," if by_day else "",
+            filters=" ".join(filters),
+            day_group=", day" if by_day else "",
+            partition="PARTITION BY date_trunc('day', r.started_at)::date" if by_day else "",
+            order="day DESC, total_ms DESC" if by_day else "total_ms DESC",
+        )
+        result = await db.execute(text(sql), params)
+        return [dict(row._mapping) for row in result]
+
+    async def prune(self):
+        """删除过期的采集记录"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(CrawlRun).where(
+                CrawlRun.started_at < datetime.utcnow() - timedelta(days=CRAWL_RUN_RETENTION_DAYS)
+            ))
+            await db.commit()
+        if result.rowcount:
+            print(f"[CrawlRuns] Pruned {result.rowcount} old runs")
+
+
+# 全局单例
+crawl_run_service = CrawlRunService()
@@ -1,8 +1,10 @@
 from crawl4ai import AsyncWebCrawler
 from app.core.config import settings
+from app.core.performance import note_span, perf_stats
 from app.services.cache_service import cache_service
 import logging
 import re
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -28,19 +30,33 @@ class CrawlerService:
         Uses optimized Playwright settings.
         性能优化: 添加缓存
         """
+        start = time.perf_counter()
         # 检查缓存
-        cached = cache_service.get_url_content(url)
+        cached = await cache_service.get_url_content(url)
         if cached:
             logger.info(f"Cache hit for {url}")
+            perf_stats.record_fetch(url, "cache", time.perf_counter() - start)
+            note_span(bytes=len(cached))
             return cached
         
         # gov.uz 网站使用专门的 Playwright 爬取（低内存模式下使用普通爬虫）
         if 'gov.uz' in url and not settings.LOW_MEMORY_MODE:
+            tier = "playwright"
             markdown = await CrawlerService._fetch_with_playwright(url)
-            if markdown:
-                cache_service.set_url_content(url, markdown)
-            return markdown
+        else:
+            tier = "crawl4ai"
+            markdown = await CrawlerService._fetch_with_crawl4ai(url)
+        perf_stats.record_fetch(url, tier, time.perf_counter() - start, ok=bool(markdown))
+        note_span(bytes=len(markdown or ""))
         
+        # 缓存结果
+        if markdown:
+            cache_service.set_url_content(url, markdown)
+        return markdown
+    
+    @staticmethod
+    async def _fetch_with_crawl4ai(url: str) -> str:
+        """使用 crawl4ai 爬取（复用全局浏览器实例）"""
         try:
             crawler = await CrawlerService.get_crawler()
             
@@ -62,10 +78,6 @@ class CrawlerService:
             if 'mofcom.gov.cn' in url and '/art/' in url:
                 markdown = CrawlerService._extract_mofcom_article(markdown)
             
-            # 缓存结果
-            if markdown:
-                cache_service.set_url_content(url, markdown)
-            
             return markdown
         except Exception as e:
             logger.error(f"Exception during crawl: {str(e)}")
@@ -259,7 +271,10 @@ class CrawlerService:
             content = content.strip()
             if len(content) > 30:
                 source = source_match.group(1).strip() if source_match else "商务部"
-                source = re.sub(r'\s*类型[：:].+', '', source)
+                # 去掉 "类型：..." 后缀（先定位再截断，r'\s*类型' 在长空白串上会回溯成平方复杂度）
+                type_match = re.search(r'类型[：:].', source)
+                if type_match:
+                    source = source[:type_match.start()].rstrip()
                 date = date_match.group(1) if date_match else ""
                 
                 return f"""来源: {source}
@@ -0,0 +1,79 @@
+"""
+发布日期解析
+LLM 抽取的 publish_date 是自由格式字符串，这里统一解析为 date，用于排序和范围筛选。
+支持：ISO（2026-01-08 / 2026/01/08 / 2026-01-08T10:00:00Z）、日/月/年（08.01.2026）、
+英文月份（January 8, 2026 / 8 Jan 2026）、俄文月份（8 января 2026）、中文（2026年1月8日）。
+所有格式合并为一个预编译正则，单次匹配完成。
+"""
+import re
+from datetime import date
+from typing import Optional
+
+_EN_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_RU_MONTHS = {
+    "январ": 1, "феврал": 2, "март": 3, "апрел": 4, "ма": 5, "июн": 6,
+    "июл": 7, "август": 8, "сентябр": 9, "октябр": 10, "ноябр": 11, "декабр": 12,
+}
+
+_EN_MONTH = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+_RU_MONTH = r"(?:январ[ьяе]|феврал[ьяе]|марта?|апрел[ьяе]|ма[йяе]|июн[ьяе]|июл[ьяе]|августа?|сентябр[ьяе]|октябр[ьяе]|ноябр[ьяе]|декабр[ьяе])"
+
+DATE_PATTERN = re.compile(
+    # 中文：2026年1月8日
+    r"(?P<zh_y>\d{4})\s*年\s*(?P<zh_m>\d{1,2})\s*月\s*(?P<zh_d>\d{1,2})\s*[日号]?"
+    # ISO：年在前
+    r"|(?<!\d)(?P<iso_y>\d{4})[-/.](?P<iso_m>\d{1,2})[-/.](?P<iso_d>\d{1,2})(?!\d)"
+    # 日/月/年（日在前；第二段大于 12 时按 月/日/年）
+    r"|(?<!\d)(?P<dmy_a>\d{1,2})[-/.](?P<dmy_b>\d{1,2})[-/.](?P<dmy_y>\d{4})(?!\d)"
+    # January 8, 2026
+    r"|(?P<mdy_m>" + _EN_MONTH + r")\.?\s+(?P<mdy_d>\d{1,2})(?:st|nd|rd|th)?,?\s+(?P<mdy_y>\d{4})"
+    # 8 January 2026 / 8 января 2026
+    r"|(?<!\d)(?P<dm_d>\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<dm_m>" + _EN_MONTH + r"|" + _RU_MONTH + r")\.?,?\s+(?P<dm_y>\d{4})",
+    re.IGNORECASE
+)
+
+
+def _month_number(name: str) -> Optional[int]:
+    name = name.lower()
+    month = _EN_MONTHS.get(name[:3])
+    if month:
+        return month
+    for prefix, number in _RU_MONTHS.items():
+        if name.startswith(prefix):
+            return number
+    return None
+
+
+def _build(year: str, month, day: str) -> Optional[date]:
+    try:
+        return date(int(year), int(month), int(day))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_publish_date(value: Optional[str]) -> Optional[date]:
+    """解析发布日期字符串，无法识别时返回 None"""
+    if not value:
+        return None
+    m = DATE_PATTERN.search(value)
+    if not m:
+        return None
+    g = m.groupdict()
+    if g["zh_y"]:
+        return _build(g["zh_y"], g["zh_m"], g["zh_d"])
+    if g["iso_y"]:
+        return _build(g["iso_y"], g["iso_m"], g["iso_d"])
+    if g["dmy_y"]:
+        day, month = g["dmy_a"], g["dmy_b"]
+        if int(month) > 12:
+            day, month = month, day
+        return _build(g["dmy_y"], month, day)
+    if g["mdy_y"]:
+        return _build(g["mdy_y"], _month_number(g["mdy_m"]), g["mdy_d"])
+    return _build(g["dm_y"], _month_number(g["dm_m"]), g["dm_d"])
@@ -0,0 +1,219 @@
+"""
+合同脱敏
+所有敏感信息类型合并为一个预编译正则，单次扫描完成替换：
+  金额 / 日期（ISO、日/月/年、英文月份、中文格式）/ 当事方名称 / 账号 / 邮箱 / 电话
+同一原值始终映射到同一占位符（如 [PARTY_1]），并返回 占位符 -> 原值 的映射，
+用于在展示 LLM 引用的条款原文时还原。
+支持分段输入（stream），大文本无需整体载入即可线性时间处理。
+"""
+import re
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+_MONTHS = (
+    r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?"
+    r"|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)"
+)
+
+_PARTY_LABELS = (
+    r"(?:甲方|乙方|丙方|买方|卖方|出租方|承租方|发包方|承包方|委托方|受托方|"
+    r"Party\s[A-D]|Buyer|Seller|Purchaser|Supplier|Contractor|Employer|Lessor|Lessee)"
+)
+
+# 注意：各分支都以字面量或窄字符集开头，且量词有上限，保证整体线性时间
+SENSITIVE_PATTERN = re.compile(
+    # 邮箱：从 @ 开始匹配域名，本地部分在回调中向前扩展
+    r"(?P<email>@[A-Za-z0-9-]{1,63}(?:\.[A-Za-z0-9-]{1,63}){1,5})"
+    # IBAN
+    r"|(?P<iban>\b[A-Z]{2}\d{2}(?:\s?[A-Z0-9]{4}){3,7}(?:\s?[A-Z0-9]{1,3})?\b)"
+    # 带标签的当事方：甲方：XXX / Seller: XXX
+    r"|(?P<label>" + _PARTY_LABELS + r"\s{0,3}[:：]\s{0,3})(?P<party>[^\n,，;；。(（)]{2,60})"
+    # 公司后缀：名称部分在回调中向前扩展
+    r"|(?P<company>集团有限公司|有限责任公司|股份有限公司|有限公司"
+    r"|(?:Co\.,?\s?Ltd\.?|Ltd\.|LLC|Inc\.|GmbH|LLP|JSC|PLC)(?![A-Za-z]))"
+    # 日期
+    r"|(?P<date>\d{4}年\d{1,2}月(?:\d{1,2}日)?"
+    r"|(?<!\d)\d{4}[-/.]\d{1,2}[-/.]\d{1,2}(?!\d)"
+    r"|(?<!\d)\d{1,2}[-/.]\d{1,2}[-/.](?:\d{4}|\d{2})(?!\d)"
+    r"|" + _MONTHS + r"\.?\s\d{1,2}(?:st|nd|rd|th)?,?\s\d{4}"
+    r"|(?<!\d)\d{1,2}(?:st|nd|rd|th)?\s" + _MONTHS + r"\.?,?\s\d{4})"
+    # 电话：国际格式 / 中国手机 / 中国固话
+    r"|(?P<phone>(?<![\w+])\+\d{1,3}[\s-]?(?:\(\d{1,4}\)[\s-]?)?\d{2,4}(?:[\s-]?\d{2,4}){1,3}(?!\d)"
+    r"|(?<!\d)1[3-9]\d{9}(?!\d)"
+    r"|(?<!\d)0\d{2,3}-\d{7,8}(?!\d))"
+    # 金额：币种前缀或后缀
+    r"|(?P<amount>(?:[$€¥£]|(?:RMB|USD|EUR|CNY|GBP|JPY|人民币)\s?)\d[\d,]{0,30}(?:\.\d{1,6})?"
+    r"(?:\s?(?:million|billion|thousand|万|亿))?元?"
+    r"|(?<![\d.,])\d[\d,]{0,30}(?:\.\d{1,6})?\s?(?:万元|亿元|元|美元|欧元|英镑|日元|(?:USD|EUR|RMB|CNY)\b))"
+    # 账号：12 位以上连续数字，或 4 位一组的卡号格式
+    r"|(?P<account>(?<![\d,])(?<!\d\.)(?:\d{12,30}|\d{4}(?:[ -]\d{4}){3,6}(?:[ -]\d{1,4})?)(?![\d,]|\.\d))"
+)
+
+PLACEHOLDER_PATTERN = re.compile(r"\[(?:AMOUNT|DATE|PARTY|ACCOUNT|EMAIL|PHONE)_\d+\]")
+
+_KINDS = {
+    "email": "EMAIL",
+    "iban": "ACCOUNT",
+    "party": "PARTY",
+    "company": "PARTY",
+    "date": "DATE",
+    "phone": "PHONE",
+    "amount": "AMOUNT",
+    "account": "ACCOUNT",
+}
+
+_EMAIL_LOCAL = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._%+-")
+_NAME_STOP = set("\n\r\t ,，.。;；:：、“”\"'()（）[]【】")
+_CJK_COMPANY_MAX = 30
+_EN_COMPANY_MAX_WORDS = 6
+
+# 分段处理时保留的尾部长度（须大于任何单个敏感片段的最大长度）
+STREAM_MARGIN = 512
+_STREAM_BREAKS = re.compile(r"[\n。；;]")
+
+
+def _expand_email(text: str, start: int, floor: int) -> int:
+    i = start
+    while i > floor and start - i < 64 and text[i - 1] in _EMAIL_LOCAL:
+        i -= 1
+    return i
+
+
+def _expand_company(text: str, start: int, floor: int) -> int:
+    """公司后缀向前扩展出名称部分；找不到名称时返回 start"""
+    if start > floor and not text[start - 1].isspace() and ord(text[start - 1]) > 0x2E80:
+        # 中文名称：向前扩展到分隔符
+        i = start
+        while i > floor and start - i < _CJK_COMPANY_MAX and text[i - 1] not in _NAME_STOP:
+            i -= 1
+        return i
+
+    # 英文名称：向前取连续的首字母大写单词（允许 &）
+    i = start
+    words = 0
+    while words < _EN_COMPANY_MAX_WORDS:
+        j = i
+        while j > floor and text[j - 1] in " ,":
+            j -= 1
+        k = j
+        while k > floor and (text[k - 1].isalnum() or text[k - 1] in "&.-'"):
+            k -= 1
+        word = text[k:j]
+        if not word or not (word[0].isupper() or word == "&"):
+            break
+        i = k
+        words += 1
+    return i if words else start
+
+
+class Desensitizer:
+    """
+    单次扫描脱敏器。一个实例对应一份文档，token_map 在多次调用/分段输入间共享，
+    保证同一原值得到同一占位符。
+    """
+
+    def __init__(self):
+        self.token_map: Dict[str, str] = {}
+        self._by_value: Dict[Tuple[str, str], str] = {}
+        self._counters: Dict[str, int] = {}
+        self._carry = ""
+
+    def _placeholder(self, kind: str, value: str) -> str:
+        key = (kind, value)
+        placeholder = self._by_value.get(key)
+        if placeholder is None:
+            self._counters[kind] = self._counters.get(kind, 0) + 1
+            placeholder = f"[{kind}_{self._counters[kind]}]"
+            self._by_value[key] = placeholder
+            self.token_map[placeholder] = value
+        return placeholder
+
+    def _process(self, text: str, limit: Optional[int]) -> Tuple[str, int]:
+        """
+        处理 text，返回 (输出, 已消费长度)。
+        limit 不为空时，结束位置超过 limit 的片段留待下一段处理。
+        """
+        out = []
+        last = 0
+        for m in SENSITIVE_PATTERN.finditer(text):
+            group = m.lastgroup
+            start, end = m.span(group)
+            if group == "party":
+                # 保留标签，去掉名称末尾空白
+                value = m.group(group).rstrip()
+                end = start + len(value)
+            elif group == "email":
+                start = _expand_email(text, start, last)
+                if start == m.start():
+                    continue
+            elif group == "company":
+                start = _expand_company(text, start, last)
+                if start == m.start():
+                    continue
+
+            if limit is not None and end > limit:
+                # 跨越段尾的片段连同标签/前缀一起留给下一段
+                defer = min(start, m.start())
+                return "".join(out) + text[last:defer], defer
+
+            kind = _KINDS[group]
+            out.append(text[last:start])
+            out.append(self._placeholder(kind, text[start:end]))
+            last = end
+
+        if limit is None:
+            out.append(text[last:])
+            return "".join(out), len(text)
+
+        # 尽量在句子/行边界处切分，避免拆开跨段的片段
+        cut = limit
+        brk = None
+        for brk in _STREAM_BREAKS.finditer(text, max(last, limit - STREAM_MARGIN // 2), limit):
+            pass
+        if brk:
+            cut = brk.end()
+        cut = max(cut, last)
+        out.append(text[last:cut])
+        return "".join(out), cut
+
+    def desensitize(self, text: str) -> str:
+        """脱敏整段文本"""
+        output, _ = self._process(text, None)
+        return output
+
+    def feed(self, piece: str) -> str:
+        """分段输入，返回可以安全输出的部分"""
+        buffer = self._carry + piece
+        if len(buffer) <= STREAM_MARGIN * 2:
+            self._carry = buffer
+            return ""
+        output, consumed = self._process(buffer, len(buffer) - STREAM_MARGIN)
+        self._carry = buffer[consumed:]
+        return output
+
+    def flush(self) -> str:
+        """输出剩余部分"""
+        output, _ = self._process(self._carry, None)
+        self._carry = ""
+        return output
+
+    def stream(self, pieces: Iterable[str]) -> Iterator[str]:
+        for piece in pieces:
+            output = self.feed(piece)
+            if output:
+                yield output
+        tail = self.flush()
+        if tail:
+            yield tail
+
+
+def desensitize(text: str) -> Tuple[str, Dict[str, str]]:
+    """脱敏文本，返回 (脱敏后文本, 占位符 -> 原值映射)"""
+    desensitizer = Desensitizer()
+    return desensitizer.desensitize(text), desensitizer.token_map
+
+
+def rehydrate(text: Optional[str], token_map: Optional[Dict[str, str]]) -> Optional[str]:
+    """把文本中的占位符还原为原值（未知占位符保持不变）"""
+    if not text or not token_map:
+        return text
+    return PLACEHOLDER_PATTERN.sub(lambda m: token_map.get(m.group(), m.group()), text)
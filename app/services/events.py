@@ -0,0 +1,100 @@
+"""
+变更事件总线（SSE 推送）
+采集、合同分析等流程在写库后发布事件，前端通过 /api/events 订阅，只接收增量，
+不再定时轮询完整列表。服务端开销与变更频率相关，而与打开的页面数无关。
+
+事件类型：
+  item.created     新情报（列表字段，不含正文）
+  item.deleted     情报删除 {"ids": [...]}
+  source.status    信源状态变化
+  source.deleted   信源删除
+  contract.task    合同任务状态变化
+  contract.batch   合同批次进度
+  resync           订阅方落后太多或断线过久，需要重新拉取全量
+
+事件保存在进程内存中（多 worker 部署时每个进程各自一份，需配合粘性会话或外部消息队列）。
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+EVENT_HISTORY_SIZE = 1000       # 断线重连时可补发的事件数
+SUBSCRIBER_QUEUE_SIZE = 500     # 单个订阅方最多积压的事件数，超过后要求其重新同步
+KEEPALIVE_SECONDS = 15
+
+
+class EventBus:
+
+    def __init__(self):
+        # 事件 ID 为 "<启动标识>-<序号>"，服务重启后旧 ID 失效，订阅方会收到 resync
+        self._epoch = format(int(time.time() * 1000), "x")
+        self._seq = 0
+        self._history: Deque[Tuple[int, str]] = deque(maxlen=EVENT_HISTORY_SIZE)
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def _format(self, seq: int, event_type: str, data) -> str:
+        payload = json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":"))
+        return f"id: {self._epoch}-{seq}\nevent: {event_type}\ndata: {payload}\n\n"
+
+    def _resync(self) -> str:
+        return self._format(self._seq, "resync", {})
+
+    def publish(self, event_type: str, data):
+        """发布事件（同步调用，不阻塞发布方）"""
+        self._seq += 1
+        message = self._format(self._seq, event_type, data)
+        self._history.append((self._seq, message))
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # 订阅方消费太慢：清空积压，只留一条重新同步的通知
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._resync())
+
+    def _replay(self, last_event_id: Optional[str]) -> list:
+        """断线重连：补发 last_event_id 之后的事件；无法补齐时返回 resync"""
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self._epoch or not seq.isdigit() or int(seq) > self._seq:
+            return [self._resync()]
+        last_seq = int(seq)
+        if last_seq == self._seq:
+            return []
+        if not self._history or last_seq + 1 < self._history[0][0]:
+            return [self._resync()]
+        return [message for event_seq, message in self._history if event_seq > last_seq]
+
+    async def subscribe(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """订阅事件流，产出 SSE 格式文本；空闲时发送注释行保活"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        backlog = self._replay(last_event_id)
+        self._subscribers.add(queue)
+        try:
+            # 告诉浏览器断线后 3 秒重连
+            yield "retry: 3000\n\n"
+            for message in backlog:
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield message
+        finally:
+            self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+# 全局单例
+event_bus = EventBus()
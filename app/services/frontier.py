@@ -0,0 +1,88 @@
+"""
+信源待采集队列（crawl_frontier 表）
+列表页发现的新链接先写入队列，每轮按优先级取出 items_per_run 条处理，其余留到后续轮次，
+不必为同一批链接反复抓取列表页、调用链接发现。
+优先级：发现时间越新越优先，同一轮发现的按列表页中的位置（越靠前越新）排序。
+"""
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import CrawlFrontierLink
+
+FRONTIER_MAX_ATTEMPTS = 3      # 抓取失败超过该次数的链接丢弃
+FRONTIER_MAX_AGE_DAYS = 14     # 长期未处理的链接视为过时
+
+
+def _stale_before() -> datetime:
+    return datetime.utcnow() - timedelta(days=FRONTIER_MAX_AGE_DAYS)
+
+
+class CrawlFrontier:
+
+    async def add_links(self, db: AsyncSession, source_id: str, links: List[Tuple[str, str]]) -> int:
+        """写入新发现的 (normalized_url, url)，已在队列中的链接保持原有优先级；返回新增数量"""
+        if not links:
+            return 0
+        now = datetime.utcnow()
+        result = await db.execute(
+            pg_insert(CrawlFrontierLink)
+            .values([
+                {"source_id": source_id, "normalized_url": normalized, "url": url,
+                 "position": position, "discovered_at": now}
+                for position, (normalized, url) in enumerate(links)
+            ])
+            .on_conflict_do_nothing(index_elements=["source_id", "normalized_url"])
+            .returning(CrawlFrontierLink.id)
+        )
+        return len(result.all())
+
+    async def next_links(self, db: AsyncSession, source_id: str, limit: int) -> list:
+        """采集流程中按优先级取出待处理链接（先删除过时链接）"""
+        await db.execute(delete(CrawlFrontierLink).where(
+            CrawlFrontierLink.source_id == source_id,
+            CrawlFrontierLink.discovered_at < _stale_before(),
+        ))
+        return await self.list_links(db, source_id, limit)
+
+    async def list_links(self, db: AsyncSession, source_id: str, limit: int) -> list:
+        """只读：按优先级列出未过时的待处理链接"""
+        if limit <= 0:
+            return []
+        result = await db.execute(
+            select(CrawlFrontierLink)
+            .where(CrawlFrontierLink.source_id == source_id, CrawlFrontierLink.discovered_at >= _stale_before())
+            .order_by(CrawlFrontierLink.discovered_at.desc(), CrawlFrontierLink.position, CrawlFrontierLink.id)
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    async def pending_count(self, db: AsyncSession, source_id: str) -> int:
+        """未过时的待处理链接数"""
+        return (await db.execute(
+            select(func.count()).select_from(CrawlFrontierLink)
+            .where(CrawlFrontierLink.source_id == source_id, CrawlFrontierLink.discovered_at >= _stale_before())
+        )).scalar()
+
+    async def finish(self, db: AsyncSession, done_ids: List[str], failed_ids: List[str]):
+        """已处理（无论是否入库）的链接移出队列；抓取失败的累计次数，超过上限后移出"""
+        if done_ids:
+            await db.execute(delete(CrawlFrontierLink).where(CrawlFrontierLink.id.in_(done_ids)))
+        if failed_ids:
+            await db.execute(
+                update(CrawlFrontierLink)
+                .where(CrawlFrontierLink.id.in_(failed_ids))
+                .values(attempts=CrawlFrontierLink.attempts + 1)
+            )
+            await db.execute(delete(CrawlFrontierLink).where(
+                CrawlFrontierLink.id.in_(failed_ids),
+                CrawlFrontierLink.attempts >= FRONTIER_MAX_ATTEMPTS,
+            ))
+
+
+# 全局单例
+crawl_frontier = CrawlFrontier()
@@ -0,0 +1,218 @@
+"""
+LLM 调用用量与成本统计（llm_calls 表）
+- 每次调用记录模型、用途、输入 / 输出 / 缓存命中 token、耗时、成本，并归属到当前信源或合同任务
+- 归属通过上下文变量传递：采集流程和合同分析进入时设置 llm_attribution(...)，
+  其中并发创建的子任务自动继承
+- 记录先放进内存缓冲区，后台每隔几秒批量写库，不给 LLM 调用路径增加数据库往返
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import LLMCall
+from app.db.session import AsyncSessionLocal
+
+LLM_PURPOSES = ("relevance", "extract", "discover", "contract_clause")
+USAGE_GROUPS = ("source", "purpose", "contract", "model", "day")
+FLUSH_INTERVAL_SECONDS = 5
+FLUSH_BATCH_SIZE = 200
+MAX_BUFFER_SIZE = 10000  # 数据库不可用时最多缓存的记录数
+
+_attribution: ContextVar[dict] = ContextVar("llm_attribution", default={})
+
+
+@contextmanager
+def llm_attribution(source_id: Optional[str] = None, contract_task_id: Optional[str] = None):
+    """把块内的 LLM 调用归属到信源 / 合同任务"""
+    token = _attribution.set({"source_id": source_id, "contract_task_id": contract_task_id})
+    try:
+        yield
+    finally:
+        _attribution.reset(token)
+
+
+def cached_prompt_tokens(usage) -> int:
+    """命中上下文缓存的输入 token（DeepSeek: prompt_cache_hit_tokens；OpenAI: prompt_tokens_details.cached_tokens）"""
+    hit = getattr(usage, "prompt_cache_hit_tokens", None)
+    if hit is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        hit = getattr(details, "cached_tokens", None)
+    return hit or 0
+
+
+def llm_cost(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """按配置单价计算单次调用成本（美元）"""
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (
+        uncached * settings.LLM_PRICE_INPUT_PER_M
+        + cached_tokens * settings.LLM_PRICE_CACHED_INPUT_PER_M
+        + completion_tokens * settings.LLM_PRICE_OUTPUT_PER_M
+    ) / 1_000_000
+
+
+# 按信源汇总时附带本时间段内新增的情报数，计算每条有效情报的 token 和成本
+USAGE_BY_SOURCE_SQL = """
+    WITH usage AS (
+        SELECT source_id, count(*) AS calls,
+               sum(prompt_tokens) AS prompt_tokens, sum(completion_tokens) AS completion_tokens,
+               sum(cached_tokens) AS cached_tokens, sum(cost_usd) AS cost_usd,
+               round(avg(latency_ms)) AS avg_latency_ms,
+               count(*) FILTER (WHERE NOT ok) AS errors
+        FROM llm_calls
+        WHERE created_at >= :since AND source_id IS NOT NULL {filters}
+        GROUP BY source_id
+    ), items AS (
+        SELECT source_id, count(*) AS items
+        FROM intelligence_items
+        WHERE created_at >= :since
+        GROUP BY source_id
+    )
+    SELECT u.source_id AS key, s.url AS name, u.calls, u.prompt_tokens, u.completion_tokens,
+           u.cached_tokens, u.cost_usd, u.avg_latency_ms, u.errors,
+           coalesce(i.items, 0) AS items,
+           round((u.prompt_tokens + u.completion_tokens)::numeric / nullif(i.items, 0)) AS tokens_per_item,
+           u.cost_usd / nullif(i.items, 0) AS cost_per_item
+    FROM usage u
+    LEFT JOIN intelligence_sources s ON s.id = u.source_id
+    LEFT JOIN items i ON i.source_id = u.source_id
+    ORDER BY u.cost_usd DESC
+    LIMIT :top
+"""
+
+USAGE_GROUPED_SQL = """
+    SELECT {key} AS key, {name} AS name, count(*) AS calls,
+           sum(prompt_tokens) AS prompt_tokens, sum(completion_tokens) AS completion_tokens,
+           sum(cached_tokens) AS cached_tokens, sum(cost_usd) AS cost_usd,
+           round(avg(latency_ms)) AS avg_latency_ms,
+           count(*) FILTER (WHERE NOT ok) AS errors
+    FROM llm_calls c {join}
+    WHERE c.created_at >= :since {filters}
+    GROUP BY 1, 2
+    ORDER BY {order}
+    LIMIT :top
+"""
+
+USAGE_GROUP_COLUMNS = {
+    "purpose": ("c.purpose", "c.purpose", "", "cost_usd DESC"),
+    "model": ("c.model", "c.model", "", "cost_usd DESC"),
+    "day": ("date_trunc('day', c.created_at)::date", "NULL", "", "key"),
+    "contract": ("c.contract_task_id", "t.filename",
+                 "LEFT JOIN contract_tasks t ON t.id = c.contract_task_id", "cost_usd DESC"),
+}
+
+
+class LLMUsageRecorder:
+
+    def __init__(self):
+        self._buffer = []
+        # 定时任务、统计接口、关闭钩子都会触发 flush，同一时间只允许一个
+        self._flush_lock = asyncio.Lock()
+
+    def record(self, purpose: str, model: str, usage, latency_ms: float, ok: bool = True):
+        """记录一次调用（同步、只写内存）"""
+        prompt = getattr(usage, "prompt_tokens", None) or 0
+        completion = getattr(usage, "completion_tokens", None) or 0
+        cached = cached_prompt_tokens(usage)
+        attribution = _attribution.get()
+        if len(self._buffer) >= MAX_BUFFER_SIZE:
+            self._buffer.pop(0)
+        self._buffer.append({
+            "created_at": datetime.utcnow(),
+            "purpose": purpose,
+            "model": model,
+            "source_id": attribution.get("source_id"),
+            "contract_task_id": attribution.get("contract_task_id"),
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "cached_tokens": cached,
+            "latency_ms": round(latency_ms),
+            "ok": ok,
+            "cost_usd": llm_cost(prompt, completion, cached),
+        })
+
+    async def flush(self):
+        """把缓冲区批量写入数据库；数据库不可用时保留记录等待下次重试"""
+        async with self._flush_lock:
+            while self._buffer:
+                # 先从缓冲区取出，写库期间 record() 追加或挤掉旧记录都不影响这一批
+                batch = self._buffer[:FLUSH_BATCH_SIZE]
+                del self._buffer[:len(batch)]
+                try:
+                    await self._insert(batch)
+                except IntegrityError:
+                    await self._insert_detached(batch)
+                except Exception:
+                    self._buffer[:0] = batch
+                    del self._buffer[:max(len(self._buffer) - MAX_BUFFER_SIZE, 0)]
+                    raise
+
+    async def _insert(self, batch: list):
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(LLMCall), batch)
+            await db.commit()
+
+    async def _insert_detached(self, batch: list):
+        """归属的信源 / 合同任务已被删除导致外键冲突：去掉归属后重写，仍失败则丢弃该批，避免阻塞后续记录"""
+        for row in batch:
+            row["source_id"] = None
+            row["contract_task_id"] = None
+        try:
+            await self._insert(batch)
+            print(f"[LLMUsage] Wrote {len(batch)} records without attribution (source or contract deleted)")
+        except IntegrityError as e:
+            print(f"[LLMUsage] Dropped {len(batch)} records that cannot be written: {e}")
+
+    async def run_periodic(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[LLMUsage] Flush failed ({len(self._buffer)} pending): {e}")
+
+    async def get_usage(
+        self,
+        db: AsyncSession,
+        days: int = 30,
+        group_by: str = "source",
+        purpose: Optional[str] = None,
+        top: int = 50,
+    ) -> dict:
+        """按维度汇总用量；group_by=source 时附带每条新增情报的 token 和成本"""
+        params = {"since": datetime.utcnow() - timedelta(days=days), "top": top}
+        if group_by == "source":
+            sql = USAGE_BY_SOURCE_SQL.format(filters="AND purpose = :purpose" if purpose else "")
+        else:
+            key, name, join, order = USAGE_GROUP_COLUMNS[group_by]
+            sql = USAGE_GROUPED_SQL.format(
+                key=key, name=name, join=join, order=order,
+                filters="AND c.purpose = :purpose" if purpose else "",
+            )
+        if purpose:
+            params["purpose"] = purpose
+        rows = [dict(row._mapping) for row in await db.execute(text(sql), params)]
+
+        totals = (await db.execute(text("""
+            SELECT count(*) AS calls,
+                   coalesce(sum(prompt_tokens), 0) AS prompt_tokens,
+                   coalesce(sum(completion_tokens), 0) AS completion_tokens,
+                   coalesce(sum(cached_tokens), 0) AS cached_tokens,
+                   coalesce(sum(cost_usd), 0) AS cost_usd
+            FROM llm_calls WHERE created_at >= :since
+        """ + (" AND purpose = :purpose" if purpose else "")), params)).one()._mapping
+        totals = dict(totals)
+        totals["cache_hit_ratio"] = (
+            round(totals["cached_tokens"] / totals["prompt_tokens"], 4) if totals["prompt_tokens"] else 0
+        )
+        return {"days": days, "group_by": group_by, "totals": totals, "rows": rows}
+
+
+# 全局单例
+llm_usage = LLMUsageRecorder()
@@ -0,0 +1,106 @@
+"""
+自适应定时采集
+- 每个信源有自己的采集间隔：待采集队列还有积压时缩短，没有新文章或失败则逐步拉长
+- 下次采集时间加 ±10% 抖动，避免大量信源在同一时刻到期
+- 全局预算：每小时最多创建 CRAWL_BUDGET_PER_HOUR 个采集任务（含手动触发），并均摊到每轮调度
+调度器只负责入队，采集由任务队列的 worker 执行。
+"""
+import asyncio
+import math
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, text
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.models import CrawlJob, IntelligenceSource
+from app.db.session import AsyncSessionLocal
+from app.services.crawl_queue import crawl_queue
+
+SCHEDULER_TICK_SECONDS = 60
+SCHEDULER_LOCK_KEY = 720391  # pg advisory lock：多进程部署时每轮只有一个进程调度
+SPEEDUP_FACTOR = 0.5
+SLOWDOWN_FACTOR = 1.5
+FAILURE_FACTOR = 2.0
+
+
+def next_crawl_interval(current_minutes, new_items: int, ok: bool = True, has_backlog: bool = False) -> int:
+    """根据本轮结果计算下次采集间隔（分钟），限制在 [最小, 最大] 之间"""
+    interval = current_minutes or settings.CRAWL_INTERVAL_DEFAULT_MINUTES
+    if not ok:
+        interval *= FAILURE_FACTOR
+    elif has_backlog:
+        # 待采集队列还有积压：尽快回来继续消化
+        interval *= SPEEDUP_FACTOR
+    elif new_items == 0:
+        interval *= SLOWDOWN_FACTOR
+    # 有新文章且已处理完：保持当前节奏
+    return int(min(max(interval, settings.CRAWL_INTERVAL_MIN_MINUTES), settings.CRAWL_INTERVAL_MAX_MINUTES))
+
+
+def reschedule_source(source: IntelligenceSource, new_items: int, ok: bool = True, has_backlog: bool = False):
+    """记录本轮结果并安排下次采集（调用方提交事务）"""
+    source.crawl_interval_minutes = next_crawl_interval(source.crawl_interval_minutes, new_items, ok, has_backlog)
+    source.last_new_items = new_items
+    jitter = random.uniform(0.9, 1.1)
+    source.next_crawl_at = datetime.utcnow() + timedelta(minutes=source.crawl_interval_minutes * jitter)
+
+
+class CrawlScheduler:
+
+    async def tick(self) -> int:
+        """把到期的信源加入采集队列，返回入队数量"""
+        budget = settings.CRAWL_BUDGET_PER_HOUR
+        async with AsyncSessionLocal() as db:
+            locked = (await db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SCHEDULER_LOCK_KEY}
+            )).scalar()
+            if not locked:
+                return 0
+
+            now = datetime.utcnow()
+            used = (await db.execute(
+                select(func.count()).select_from(CrawlJob).where(CrawlJob.created_at >= now - timedelta(hours=1))
+            )).scalar()
+            per_tick = max(1, math.ceil(budget * SCHEDULER_TICK_SECONDS / 3600))
+            limit = min(budget - used, per_tick)
+            if limit <= 0:
+                return 0
+
+            active_job = select(CrawlJob.id).where(
+                CrawlJob.source_id == IntelligenceSource.id,
+                CrawlJob.status.in_(("queued", "running")),
+            ).exists()
+            result = await db.execute(
+                select(IntelligenceSource.id)
+                .where(
+                    or_(IntelligenceSource.next_crawl_at.is_(None), IntelligenceSource.next_crawl_at <= now),
+                    IntelligenceSource.status != "inactive",
+                    ~active_job,
+                )
+                .order_by(IntelligenceSource.next_crawl_at.asc().nullsfirst())
+                .limit(limit)
+            )
+            queued = await crawl_queue.enqueue(db, result.scalars().all())
+            await db.commit()
+
+        if queued:
+            crawl_queue.wake()
+            print(f"[Scheduler] Queued {len(queued)} due sources ({used + len(queued)}/{budget} this hour)")
+        return len(queued)
+
+    async def run_periodic(self):
+        """后台定时调度；CRAWL_BUDGET_PER_HOUR 为 0 时不运行"""
+        if settings.CRAWL_BUDGET_PER_HOUR <= 0:
+            return
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"[Scheduler] Tick failed: {e}")
+            await asyncio.sleep(SCHEDULER_TICK_SECONDS)
+
+
+# 全局单例
+crawl_scheduler = CrawlScheduler()
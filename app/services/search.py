@@ -0,0 +1,65 @@
+"""
+情报全文检索辅助函数
+- 英文/拉丁文部分交给 Postgres tsvector（websearch_to_tsquery）
+- 中文没有分词，按连续汉字串匹配：三个字及以上走 pg_trgm 子串匹配，一两个字（pg_trgm 无法用索引）
+  走 search_grams（单字 + 相邻两字数组）的 GIN 索引
+- 高亮片段统一在这里做 HTML 转义后再加 <mark>
+"""
+import html
+import re
+from typing import List, Tuple
+
+CJK_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+CJK_GRAM_MAX = 2  # 不超过该长度的汉字串用 search_grams 包含查询
+
+# ts_headline 使用不可见分隔符标记命中，转义后再替换成 <mark>，避免正文中的 HTML 被原样输出
+HEADLINE_START = "\x02"
+HEADLINE_STOP = "\x03"
+HEADLINE_OPTIONS = f"StartSel={HEADLINE_START}, StopSel={HEADLINE_STOP}, MaxWords=35, MinWords=15, MaxFragments=2"
+
+
+def parse_search_query(q: str) -> Tuple[str, List[str]]:
+    """拆分查询：返回 (拉丁文部分, 汉字串列表)"""
+    cjk_terms = list(dict.fromkeys(CJK_PATTERN.findall(q)))
+    latin = " ".join(CJK_PATTERN.sub(" ", q).split())
+    # 只剩运算符/标点时视为无拉丁文查询
+    if not re.search(r"\w", latin):
+        latin = ""
+    return latin, cjk_terms
+
+
+def escape_like(term: str) -> str:
+    """转义 LIKE 通配符（配合 escape='\\\\' 使用）"""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def render_headline(headline: str) -> str:
+    """把 ts_headline 的输出转为安全的 HTML 片段"""
+    escaped = html.escape(headline or "")
+    return escaped.replace(HEADLINE_START, "<mark>").replace(HEADLINE_STOP, "</mark>")
+
+
+def _mark(fragment_html: str, terms: List[str]) -> str:
+    """单次替换高亮，长词优先，避免嵌套 <mark>"""
+    terms = [html.escape(t) for t in sorted(set(terms), key=len, reverse=True) if t]
+    if not terms:
+        return fragment_html
+    pattern = re.compile("|".join(re.escape(t) for t in terms))
+    return pattern.sub(lambda m: f"<mark>{m.group()}</mark>", fragment_html)
+
+
+def highlight_snippet(text: str, terms: List[str], width: int = 120) -> str:
+    """在文本中定位首个命中词，截取附近片段并高亮所有命中（已 HTML 转义）"""
+    if not text:
+        return ""
+    positions = [p for p in (text.find(t) for t in terms if t) if p >= 0]
+    first = min(positions) if positions else 0
+    start = max(0, first - width // 3)
+    snippet = _mark(html.escape(text[start:start + width]), terms)
+    return ("…" if start > 0 else "") + snippet + ("…" if start + width < len(text) else "")
+
+
+def mark_terms(fragment_html: str, terms: List[str]) -> str:
+    """在已转义的 HTML 片段中补充高亮汉字串（跳过已有的 <mark> 区段）"""
+    parts = re.split(r"(<mark>.*?</mark>)", fragment_html)
+    return "".join(p if p.startswith("<mark>") else _mark(p, terms) for p in parts)
@@ -0,0 +1,214 @@
+"""
+风险趋势汇总
+- 写入情报时在同一事务内增量更新 intelligence_trend_rollups
+- 后台定时全量重算一次，修正删除/修改带来的偏差
+- 趋势接口只读汇总表，耗时与历史数据量无关
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.models import IntelligenceSource, IntelligenceTrendRollup
+from app.db.session import AsyncSessionLocal
+
+TREND_GROUPS = ("none", "tag", "source", "content_type")
+TREND_MAX_DAYS = 366
+TREND_MAX_TAG_LENGTH = 64
+TREND_REBUILD_LOCK_KEY = 720392  # pg advisory lock：多进程部署时同一时间只有一个进程重算
+
+# 汇总日期：优先发布日期，没有时用入库日期
+ROLLUP_DAY_SQL = "coalesce(published_on, created_at::date)"
+
+REBUILD_SQL = f"""
+    WITH base AS (
+        SELECT id, {ROLLUP_DAY_SQL} AS day, coalesce(source_id, '') AS source_id,
+               coalesce(content_type, '') AS content_type, risk_tags
+        FROM intelligence_items
+    ), tags AS (
+        SELECT DISTINCT b.id, b.day, b.source_id, b.content_type,
+               left(btrim(t.tag, E' \\t\\r\\n'), {TREND_MAX_TAG_LENGTH}) AS risk_tag
+        FROM base b
+        CROSS JOIN LATERAL jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(b.risk_tags::jsonb) = 'array' THEN b.risk_tags::jsonb ELSE '[]'::jsonb END
+        ) AS t(tag)
+        WHERE btrim(t.tag, E' \\t\\r\\n') <> ''
+    )
+    INSERT INTO intelligence_trend_rollups (day, source_id, content_type, risk_tag, item_count)
+    SELECT day, source_id, content_type, risk_tag, count(*) FROM (
+        SELECT day, source_id, content_type, '' AS risk_tag FROM base
+        UNION ALL
+        SELECT day, source_id, content_type, risk_tag FROM tags
+    ) r
+    GROUP BY day, source_id, content_type, risk_tag
+"""
+
+
+def rollup_tags(tags) -> List[str]:
+    """清洗单条情报的风险标签（去空白、去重、截断）"""
+    if not isinstance(tags, list):
+        return []
+    cleaned = (str(tag).strip()[:TREND_MAX_TAG_LENGTH] for tag in tags if tag is not None)
+    return list(dict.fromkeys(tag for tag in cleaned if tag))
+
+
+def rollup_deltas(items: List[dict]) -> Counter:
+    """把新写入的情报折算成汇总表增量：(day, source_id, content_type, risk_tag) -> count"""
+    deltas = Counter()
+    for item in items:
+        day = item.get("published_on") or item["created_at"].date()
+        source_id = item.get("source_id") or ""
+        content_type = item.get("content_type") or ""
+        deltas[(day, source_id, content_type, "")] += 1
+        for tag in rollup_tags(item.get("risk_tags")):
+            deltas[(day, source_id, content_type, tag)] += 1
+    return deltas
+
+
+class TrendService:
+
+    async def record_items(self, db: AsyncSession, items: List[dict]):
+        """增量更新汇总表（调用方负责提交事务）"""
+        deltas = rollup_deltas(items)
+        if not deltas:
+            return
+        stmt = pg_insert(IntelligenceTrendRollup).values([
+            {"day": day, "source_id": source_id, "content_type": content_type, "risk_tag": tag, "item_count": count}
+            for (day, source_id, content_type, tag), count in deltas.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "source_id", "content_type", "risk_tag"],
+            set_={"item_count": IntelligenceTrendRollup.item_count + stmt.excluded.item_count}
+        )
+        await db.execute(stmt)
+
+    async def remove_items(self, db: AsyncSession, items: List[dict]):
+        """删除情报时扣减汇总表（调用方负责提交事务）"""
+        deltas = rollup_deltas(items)
+        if not deltas:
+            return
+        table = IntelligenceTrendRollup.__table__
+        await db.execute(
+            table.update()
+            .where(
+                table.c.day == bindparam("b_day"),
+                table.c.source_id == bindparam("b_source_id"),
+                table.c.content_type == bindparam("b_content_type"),
+                table.c.risk_tag == bindparam("b_risk_tag"),
+            )
+            .values(item_count=table.c.item_count - bindparam("b_count")),
+            [
+                {"b_day": day, "b_source_id": source_id, "b_content_type": content_type, "b_risk_tag": tag, "b_count": count}
+                for (day, source_id, content_type, tag), count in deltas.items()
+            ]
+        )
+        days = sorted({day for day, _, _, _ in deltas})
+        await db.execute(table.delete().where(table.c.day.in_(days), table.c.item_count <= 0))
+
+    async def rebuild(self) -> bool:
+        """全量重算汇总表（单事务内替换，读请求始终看到完整数据）；其他进程正在重算时跳过并返回 False"""
+        start = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            locked = (await db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": TREND_REBUILD_LOCK_KEY}
+            )).scalar()
+            if not locked:
+                return False
+            await db.execute(text("DELETE FROM intelligence_trend_rollups"))
+            await db.execute(text(REBUILD_SQL))
+            await db.commit()
+        elapsed = (datetime.utcnow() - start).total_seconds()
+        print(f"[Trends] Rollups rebuilt in {elapsed:.2f}s")
+        return True
+
+    async def run_periodic(self):
+        """后台定时重算；TREND_ROLLUP_INTERVAL_MINUTES 为 0 时不运行"""
+        interval = settings.TREND_ROLLUP_INTERVAL_MINUTES
+        if interval <= 0:
+            return
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                print(f"[Trends] Rebuild failed: {e}")
+            await asyncio.sleep(interval * 60)
+
+    async def get_trends(
+        self,
+        db: AsyncSession,
+        days: int = 30,
+        group_by: str = "none",
+        top: int = 8,
+        source_id: Optional[str] = None,
+        content_type: Optional[str] = None,
+        tag: Optional[str] = None,
+    ) -> dict:
+        """
+        返回可直接绘图的序列：
+        {"dates": [...], "total": [...], "series": [{"key", "name", "data": [...]}]}
+        """
+        end = datetime.utcnow().date()
+        since = end - timedelta(days=days - 1)
+        dates = [since + timedelta(days=i) for i in range(days)]
+        index = {d: i for i, d in enumerate(dates)}
+
+        rollup = IntelligenceTrendRollup
+        filters = [rollup.day >= since, rollup.day <= end]
+        if source_id:
+            filters.append(rollup.source_id == source_id)
+        if content_type:
+            filters.append(rollup.content_type == content_type)
+        # 标签为空的行是总数行，标签行之间有重叠，不能相加得到总数
+        total_filters = filters + [rollup.risk_tag == (tag or "")]
+
+        total = [0] * days
+        rows = await db.execute(
+            select(rollup.day, func.sum(rollup.item_count).label("count")).where(*total_filters).group_by(rollup.day)
+        )
+        for row in rows:
+            total[index[row.day]] = int(row.count)
+
+        series = []
+        group_column = {
+            "tag": rollup.risk_tag,
+            "source": rollup.source_id,
+            "content_type": rollup.content_type,
+        }.get(group_by)
+        if group_column is not None:
+            if group_by == "tag":
+                group_filters = filters + ([rollup.risk_tag == tag] if tag else [rollup.risk_tag != ""])
+            else:
+                group_filters = total_filters
+            rows = await db.execute(
+                select(rollup.day, group_column.label("key"), func.sum(rollup.item_count).label("count"))
+                .where(*group_filters)
+                .group_by(rollup.day, group_column)
+            )
+            grouped: Dict[str, List[int]] = {}
+            for row in rows:
+                grouped.setdefault(row.key, [0] * days)[index[row.day]] = int(row.count)
+
+            top_keys = sorted(grouped, key=lambda k: -sum(grouped[k]))[:top]
+            names = {k: k or "未分类" for k in top_keys}
+            if group_by == "source" and top_keys:
+                sources = await db.execute(
+                    select(IntelligenceSource.id, IntelligenceSource.url).where(IntelligenceSource.id.in_(top_keys))
+                )
+                names.update({row.id: row.url for row in sources})
+            series = [{"key": k, "name": names[k], "data": grouped[k]} for k in top_keys]
+
+        return {
+            "dates": [d.isoformat() for d in dates],
+            "total": total,
+            "series": series,
+        }
+
+
+# 全局单例
+trend_service = TrendService()
@@ -0,0 +1,37 @@
+"""
+独立的采集 worker 进程
+运行: python -m app.worker [--workers N]
+Web 进程设置 CRAWL_WORKERS=0 时只负责入队，采集全部由这里执行。
+注意：事件总线是进程内的，worker 进程发布的事件不会推送到 Web 进程的 SSE 订阅方，
+前端会在下次刷新列表时看到结果。
+"""
+import argparse
+import asyncio
+
+from app.api.endpoints import run_crawl_job
+from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.services.cache_service import cache_service
+from app.services.crawl_queue import crawl_queue
+
+
+async def run(workers: int):
+    asyncio.create_task(loop_monitor.run_periodic())
+    asyncio.create_task(cache_service.run_periodic())
+    await crawl_queue.recover()
+    crawl_queue.start_workers(run_crawl_job, workers)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await crawl_queue.stop_workers()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=settings.CRAWL_WORKERS or 3)
+    args = parser.parse_args()
+    asyncio.run(run(args.workers))
+
+
+if __name__ == "__main__":
+    main()
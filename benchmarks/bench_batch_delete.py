@@ -0,0 +1,101 @@
+"""
+批量删除基准测试：旧版逐条 get + delete vs 单条 DELETE ... WHERE id = ANY(:ids)
+需要可用的数据库（DATABASE_URL），测试数据挂在临时信源下，结束后自动清理。
+运行: python -m benchmarks.bench_batch_delete [--sizes 100,500,2000]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Text, any_, bindparam, delete
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.api.endpoints import delete_items_where
+from app.db.models import IntelligenceItem, IntelligenceItemBody, IntelligenceSource
+from app.db.session import AsyncSessionLocal
+
+
+async def seed_items(source_id: str, count: int) -> list:
+    now = datetime.utcnow()
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    async with AsyncSessionLocal() as db:
+        await db.execute(pg_insert(IntelligenceItem).values([
+            {
+                "id": item_id,
+                "source_id": source_id,
+                "title": f"Benchmark item {i}",
+                "summary": "benchmark " * 20,
+                "risk_tags": ["benchmark", f"tag-{i % 5}"],
+                "url": f"https://bench.invalid/{source_id}/{i}",
+                "normalized_url": f"https://bench.invalid/{source_id}/{i}",
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i, item_id in enumerate(ids)
+        ]))
+        await db.execute(pg_insert(IntelligenceItemBody).values([
+            {"item_id": item_id, "original_text": "正文 " * 200} for item_id in ids
+        ]))
+        await db.commit()
+    return ids
+
+
+async def legacy_delete(ids: list) -> int:
+    """基线实现（复刻重构前的 batch_delete_intelligence_items）"""
+    async with AsyncSessionLocal() as db:
+        deleted = 0
+        for item_id in ids:
+            item = await db.get(IntelligenceItem, item_id)
+            if item:
+                await db.delete(item)
+                deleted += 1
+        await db.commit()
+    return deleted
+
+
+async def set_based_delete(ids: list) -> int:
+    async with AsyncSessionLocal() as db:
+        deleted = await delete_items_where(
+            db, IntelligenceItem.id == any_(bindparam("ids", ids, type_=ARRAY(Text)))
+        )
+        await db.commit()
+    return len(deleted)
+
+
+async def timed(fn, ids: list):
+    start = time.perf_counter()
+    count = await fn(ids)
+    return time.perf_counter() - start, count
+
+
+async def run(sizes: list):
+    source_id = str(uuid.uuid4())
+    async with AsyncSessionLocal() as db:
+        db.add(IntelligenceSource(id=source_id, url=f"https://bench.invalid/{source_id}", status="inactive"))
+        await db.commit()
+
+    try:
+        print(f"{'size':>8} {'legacy(s)':>10} {'set-based(s)':>13} {'speedup':>8}")
+        for size in sizes:
+            legacy_time, legacy_count = await timed(legacy_delete, await seed_items(source_id, size))
+            set_time, set_count = await timed(set_based_delete, await seed_items(source_id, size))
+            assert legacy_count == set_count == size
+            print(f"{size:>8} {legacy_time:>10.4f} {set_time:>13.4f} {legacy_time / set_time:>7.1f}x")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(IntelligenceSource).where(IntelligenceSource.id == source_id))
+            await db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="100,500,2000")
+    args = parser.parse_args()
+    asyncio.run(run([int(s) for s in args.sizes.split(",")]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+合同规则引擎基准测试：旧版逐条正则 vs 合并单次扫描
+运行: python -m benchmarks.bench_contract_rules [--sizes 100000,1000000,5000000]
+"""
+import argparse
+import random
+import re
+import time
+
+from app.services.contract_rules import contract_rule_engine
+
+CLAUSES = [
+    "本合同双方应按照约定履行各自义务，任何一方不得无故拖延。",
+    "甲方有权单方解约，且无需承担任何责任。",
+    "The Seller may terminate this Agreement upon thirty days written notice.",
+    "所有款项以美元作为支付货币，汇率风险由乙方承担。",
+    "The Contractor shall pay liquidated damages of 0.5% per day of delay.",
+    "本合同适用中华人民共和国法律，争议提交仲裁委员会仲裁。",
+    "Delivery shall be made to the site designated by the Buyer in good condition.",
+    "乙方应确保本地化采购比例不低于百分之三十，并遵守当地环保法规。",
+    "The parties agree to cooperate in good faith throughout the term hereof.",
+    "甲方保留根据市场情况单方调价的权利。",
+    "设备的质量标准以双方签署的技术附件为准。",
+    "Invoices shall be settled within forty-five days after receipt.",
+]
+
+FILLER = [
+    "双方应当按照技术附件完成设备安装调试工作。",
+    "The Engineer shall review the drawings within fourteen days.",
+    "交货地点为项目现场，运输费用由卖方承担。",
+    "All notices shall be in writing and delivered by courier.",
+]
+
+
+def legacy_local_rule_check(text: str, rules: list) -> list:
+    """基线实现（复刻重构前的 ContractParser.local_rule_check）"""
+    risks = []
+    for rule in rules:
+        matches = list(re.finditer(rule["pattern"], text, re.IGNORECASE))
+        if matches:
+            match = matches[0]
+            start = max(0, match.start() - 40)
+            end = min(len(text), match.end() + 40)
+            context = re.sub(r'\s+', ' ', text[start:end].strip())
+            risks.append({"clause_id": rule["id"], "clause_text": context})
+    return risks
+
+
+def build_contract(size: int, hit_ratio: float, seed: int = 42) -> str:
+    """生成指定长度的合同文本，hit_ratio 控制风险条款所占比例"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        pool = CLAUSES if rng.random() < hit_ratio else FILLER
+        clause = rng.choice(pool)
+        parts.append(clause)
+        length += len(clause) + 1
+    return " ".join(parts)[:size]
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="100000,1000000,5000000")
+    parser.add_argument("--hit-ratio", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    contract_rule_engine._ensure_loaded()
+    rules = contract_rule_engine.rules
+
+    print(f"{'size':>10} {'legacy(s)':>10} {'first-hit(s)':>12} {'all-hits(s)':>11} {'chunks(s)':>10} {'matches':>8} {'speedup':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        text = build_contract(size, args.hit_ratio)
+        legacy = timeit(lambda: legacy_local_rule_check(text, rules), args.repeat)
+        first_hit = timeit(lambda: contract_rule_engine.to_risks(text), args.repeat)
+        all_hits = timeit(lambda: contract_rule_engine.scan(text), args.repeat)
+        chunks = timeit(lambda: contract_rule_engine.select_chunks(text, 6000, 3), args.repeat)
+        matches = len(contract_rule_engine.scan(text))
+        print(f"{size:>10} {legacy:>10.4f} {first_hit:>12.4f} {all_hits:>11.4f} {chunks:>10.4f} {matches:>8} {legacy / first_hit:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+文本处理热点函数微基准：每个页面 / 每份合同都会执行的 CPU 侧辅助函数
+  gov.uz 正文清洗、商务部正文提取、Markdown 链接正则、合同清洗 / 脱敏 / 规则预筛、关键字相关性
+每个函数分别用贴近线上的输入和病态输入（未闭合的括号、长空白串、差一点命中 .{0,N} 的文本等，
+专门探测正则回溯）在 10KB / 1MB / 10MB 下取多次运行的最好成绩。
+"scaling" 列为相邻两档的耗时比 / 输入大小比：≈1 为线性，明显大于 1 说明存在超线性回溯。
+
+基线与回归检查（结果先按本机校准循环的耗时归一化，不同机器之间也可粗略比较）：
+  python -m benchmarks.bench_text_hotpaths --save benchmarks/baselines/text_hotpaths.json
+  python -m benchmarks.bench_text_hotpaths --compare benchmarks/baselines/text_hotpaths.json [--threshold 0.25]
+回归超过阈值时以非零状态码退出。CI（.gitlab-ci.yml 的 benchmark 任务）只跑 10k,1m 两档并用 --threshold 1.0：
+共享 runner 上单个用例的抖动可达 30% 以上，而回溯类回归通常是数倍的变慢。
+已提交的基线是本机三次运行各用例取中位数的结果，修改了被测函数的预期性能时需重新生成。
+运行: python -m benchmarks.bench_text_hotpaths [--sizes 10k,1m,10m] [--only link_regex]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+from app.services.ai_engine import MARKDOWN_LINK_RE, check_keyword_relevance
+from app.services.contract_parser import ContractParser
+from app.services.crawler import CrawlerService
+from benchmarks.bench_contract_rules import build_contract
+
+SIZE_UNITS = {"k": 1024, "m": 1024 * 1024}
+MAX_SECONDS_PER_RUN = 20  # 按上一档耗时线性外推超过该值时跳过更大的输入
+
+GOV_UZ_NAV = """\
+* [Home](https://gov.uz/en)
+* [About](https://gov.uz/en/about)
+* [Contact](https://gov.uz/en/contact)
+## About the ministry
+### Hotline
+"""
+
+GOV_UZ_FOOTER = """\
+#### Site map
+* [News](https://gov.uz/en/news)
+### Hotline
+Copyright © 2026
+"""
+
+MOFCOM_NAV = """\
+* [首页](https://www.mofcom.gov.cn/ "首页")
+* [政务公开](https://www.mofcom.gov.cn/zwgk/ "政务公开")
+* [新闻发布](https://www.mofcom.gov.cn/xwfb/ "新闻发布")
+"""
+
+MOFCOM_FOOTER = """\
+### 驻在国
+### 关于我们
+网站管理 智能问答
+"""
+
+SENTENCES = [
+    "The ministry announced new rules on foreign investment and currency exchange.",
+    "Officials said the tariff changes take effect at the start of next quarter.",
+    "中国企业在当地的投资项目面临政策变动和汇率波动风险。",
+    "商务部提醒企业关注当地安全形势，做好风险预警和应急预案。",
+    "Analysts expect sanctions to affect regional trade and logistics.",
+]
+
+
+def repeat_to(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def prose(size: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < size:
+        sentence = rng.choice(SENTENCES)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)[:size]
+
+
+def list_markdown(size: int) -> str:
+    """列表页 Markdown：导航 + 大量文章链接（带标题）+ 零散正文"""
+    rng = random.Random(11)
+    lines, length, i = [MOFCOM_NAV], len(MOFCOM_NAV), 0
+    while length < size:
+        line = (f"* [{rng.choice(SENTENCES)[:40]}](https://lk.mofcom.gov.cn/art/2026/art_{i}.html "
+                f"\"article {i}\") 2026-01-{i % 28 + 1:02d}")
+        if i % 5 == 0:
+            line += "\n" + rng.choice(SENTENCES)
+        lines.append(line)
+        length += len(line) + 1
+        i += 1
+    return "\n".join(lines)[:size]
+
+
+def gov_uz_markdown(size: int) -> str:
+    body = prose(max(size - len(GOV_UZ_NAV) - len(GOV_UZ_FOOTER) - 60, 0))
+    return f"{GOV_UZ_NAV}\n## Ministry announces new investment rules\n2026-01-08\n\n{body}\n{GOV_UZ_FOOTER}"
+
+
+def gov_uz_headings_without_dates(size: int) -> str:
+    """病态：大量 ## 标题但附近没有日期，标题扫描要走完全文再退回 Dear 备选"""
+    return repeat_to("## Section heading\ntext line\n", size)
+
+
+def mofcom_markdown(size: int) -> str:
+    body = prose(max(size - len(MOFCOM_NAV) - len(MOFCOM_FOOTER) - 60, 0))
+    return f"{MOFCOM_NAV}\n来源：商务部 类型：转载\n2026-01-08 10:30\n\n{body}\n{MOFCOM_FOOTER}"
+
+
+def mofcom_long_source_line(size: int) -> str:
+    """病态：来源行中有很长的空白串（旧实现的 r'\\s*类型' 在此回溯成平方复杂度）"""
+    return "来源：商务部" + " " * max(size - 40, 0) + "类型：转载\n2026-01-08 10:30\n正文"
+
+
+def contract_text(size: int) -> str:
+    return build_contract(size, hit_ratio=0.2)
+
+
+def rule_near_misses(size: int) -> str:
+    """病态：反复出现规则前缀但在 .{0,N} 窗口内不命中（单方……解约 / 价格……变更）"""
+    return repeat_to("单方面的书面通知与沟通 价格信息公开与变化 ", size)
+
+
+def digit_runs(size: int) -> str:
+    """病态：超长数字 / 逗号串，探测金额、账号模式中的 [\\d,]{0,30}"""
+    return repeat_to("1234567890,1234567890 ", size)
+
+
+# (名称, 被测函数, 输入构造函数)
+CASES = [
+    ("gov_uz_clean", CrawlerService._clean_gov_uz_content, gov_uz_markdown),
+    ("gov_uz_clean/headings_no_date", CrawlerService._clean_gov_uz_content, gov_uz_headings_without_dates),
+    ("mofcom_extract", CrawlerService._extract_mofcom_article, mofcom_markdown),
+    ("mofcom_extract/long_source_line", CrawlerService._extract_mofcom_article, mofcom_long_source_line),
+    ("link_regex", MARKDOWN_LINK_RE.findall, list_markdown),
+    ("link_regex/unclosed_brackets", MARKDOWN_LINK_RE.findall, lambda size: "[" * size),
+    ("link_regex/unclosed_urls", MARKDOWN_LINK_RE.findall, lambda size: repeat_to("[a](http://", size)),
+    ("clean_text", ContractParser.clean_text, contract_text),
+    ("clean_text/whitespace", ContractParser.clean_text, lambda size: repeat_to(" \t\n", size)),
+    ("desensitize", ContractParser.desensitize, contract_text),
+    ("desensitize/digit_runs", ContractParser.desensitize, digit_runs),
+    ("local_rule_check", ContractParser.local_rule_check, contract_text),
+    ("local_rule_check/near_misses", ContractParser.local_rule_check, rule_near_misses),
+    ("keyword_relevance", lambda text: check_keyword_relevance(text[:200], text), prose),
+    ("keyword_relevance/no_match", lambda text: check_keyword_relevance("", text),
+     lambda size: repeat_to("lorem ipsum dolor sit amet ", size)),
+]
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower().removesuffix("b")
+    if value[-1] in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def format_size(size: int) -> str:
+    if size >= SIZE_UNITS["m"]:
+        return f"{size // SIZE_UNITS['m']}MB"
+    return f"{size // SIZE_UNITS['k']}KB"
+
+
+def best_of(fn, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate() -> float:
+    """固定工作量（纯 Python 循环 + 正则）的耗时，用于在不同机器 / 负载下归一化结果"""
+    text = prose(256 * 1024)
+    pattern = re.compile(r"\b\w+ion\b")
+
+    def work(_):
+        total = 0
+        for i in range(300_000):
+            total += i * i
+        pattern.findall(text)
+        return total
+
+    return best_of(work, None, 5)
+
+
+def run(cases: list, sizes: list, repeat: int) -> dict:
+    results = {}
+    print(f"{'case':>34} {'size':>6} {'best(ms)':>10} {'MB/s':>8} {'scaling':>8}")
+    for name, fn, build in cases:
+        previous = None
+        for size in sizes:
+            key = f"{name}@{format_size(size)}"
+            if previous and previous[1] * size / previous[0] > MAX_SECONDS_PER_RUN:
+                print(f"{name:>34} {format_size(size):>6} {'skipped (estimated too slow)':>28}")
+                results[key] = None
+                continue
+            text = build(size)
+            # 小输入多跑几次减小抖动，大输入减少重复次数控制总耗时
+            if size <= 64 * SIZE_UNITS["k"]:
+                runs = repeat * 10
+            else:
+                runs = repeat if size <= SIZE_UNITS["m"] else max(1, repeat // 2)
+            elapsed = best_of(fn, text, runs)
+            scaling = ""
+            if previous:
+                scaling = f"{(elapsed / previous[1]) / (size / previous[0]):.2f}" if previous[1] else ""
+            print(f"{name:>34} {format_size(size):>6} {elapsed * 1000:>10.2f} "
+                  f"{size / SIZE_UNITS['m'] / elapsed if elapsed else 0:>8.1f} {scaling:>8}")
+            results[key] = elapsed
+            previous = (size, elapsed)
+    return results
+
+
+def compare(results: dict, calibration: float, baseline: dict, threshold: float) -> list:
+    """
+    返回超过阈值的回归项 [(key, 基线归一化耗时, 当前归一化耗时)]。
+    校准循环只能粗略抵消机器差异（CI 共享 runner 上各用例常整体快慢 30% 以上），
+    因此再除以所有用例变化的中位数：整体变慢不算回归，单个用例相对其他用例变慢才算
+    """
+    base_calibration = baseline["calibration"]
+    rows = []
+    for key, elapsed in results.items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        current_norm = elapsed / calibration if elapsed is not None else float("inf")
+        rows.append((key, base / base_calibration, current_norm))
+    ratios = sorted(current / base for _, base, current in rows if current != float("inf"))
+    drift = ratios[len(ratios) // 2] if ratios else 1.0
+
+    regressions = []
+    print()
+    print(f"overall drift vs baseline: {(drift - 1) * 100:+.1f}% (factored out)")
+    print(f"{'case':>42} {'baseline':>10} {'current':>10} {'change':>9}")
+    for key, base_norm, current_norm in rows:
+        change = current_norm / base_norm / drift - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{key:>42} {base_norm:>10.3f} {current_norm:>10.3f} {change * 100:>+8.1f}%{flag}")
+        if change > threshold:
+            regressions.append((key, base_norm, current_norm))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,1m,10m")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--save", help="把结果写入基线文件")
+    parser.add_argument("--compare", help="与基线文件对比，回归超过阈值时退出码为 1")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允许的相对退化（归一化后）")
+    args = parser.parse_args()
+
+    sizes = sorted(parse_size(s) for s in args.sizes.split(","))
+    cases = [case for case in CASES if not args.only or args.only in case[0]]
+    calibration = calibrate()
+    print(f"calibration: {calibration * 1000:.1f} ms")
+    results = run(cases, sizes, args.repeat)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"calibration": calibration, "results": results}, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, calibration, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+离线基准测试用的网页语料和本地 HTTP 服务
+按三类站点的页面结构生成确定性的列表页和文章页（同样的参数得到同样的页面）：
+  generic   普通新闻站：/generic/<n>/list.html -> /generic/<n>/article/<i>.html
+  mofcom    商务部风格：/mofcom.gov.cn/<n>/index.html -> /mofcom.gov.cn/<n>/art/2026/art_<i>.html
+            （路径中带 mofcom.gov.cn，走 ai_engine / crawler 的商务部专用逻辑）
+  govuz     gov.uz 风格：/gov.uz/<n>/en/news -> /gov.uz/<n>/en/news/view/<i>
+            （走 Playwright 抓取分支；链接为绝对地址，由 LLM 发现）
+页面里的链接都是指向本地服务的绝对地址，运行时不访问外网。
+"""
+import random
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+SITE_KINDS = ("generic", "mofcom", "govuz")
+LINKS_PER_LIST = 20
+
+TOPICS = [
+    "Central bank tightens foreign exchange rules",
+    "New tariff schedule announced for steel imports",
+    "Parliament approves amendments to investment law",
+    "Energy ministry revises gas export quotas",
+    "Sanctions list expanded to include logistics firms",
+    "Tax authority introduces digital invoicing mandate",
+    "Mining licences suspended pending environmental review",
+    "Customs clearance times rise after new inspection regime",
+]
+
+SENTENCES = [
+    "The measure takes effect at the start of next quarter and applies to all registered enterprises.",
+    "Officials said the change is intended to stabilise the domestic market and attract long-term capital.",
+    "Foreign investors will be required to submit additional documentation to the regulator.",
+    "Industry groups warned that compliance costs could rise significantly for small exporters.",
+    "The ministry will publish detailed implementation guidelines within thirty days.",
+    "Analysts expect the policy to affect supply chains across the region.",
+    "Penalties for non-compliance include fines and temporary suspension of operating licences.",
+    "The government described the reform as part of a broader programme of economic modernisation.",
+    "Several state-owned companies have already announced adjustments to their procurement plans.",
+    "Trade partners are monitoring the situation and may respond with reciprocal measures.",
+]
+
+NAV = """
+<header><nav>
+  <a href="{base}/">Home</a> <a href="{base}/about.html">About</a>
+  <a href="{base}/contact.html">Contact</a> <a href="{base}/login.html">Login</a>
+</nav></header>
+"""
+
+FOOTER = """<footer><p>Copyright 2026. All rights reserved.</p><a href="{base}/privacy.html">Privacy</a></footer>"""
+
+
+def site_prefix(kind: str, index: int) -> str:
+    if kind == "mofcom":
+        return f"/mofcom.gov.cn/{index}"
+    if kind == "govuz":
+        return f"/gov.uz/{index}"
+    return f"/generic/{index}"
+
+
+def list_path(kind: str, index: int) -> str:
+    if kind == "mofcom":
+        return f"{site_prefix(kind, index)}/index.html"
+    if kind == "govuz":
+        return f"{site_prefix(kind, index)}/en/news"
+    return f"{site_prefix(kind, index)}/list.html"
+
+
+def article_path(kind: str, index: int, article: int) -> str:
+    if kind == "mofcom":
+        return f"{site_prefix(kind, index)}/art/2026/art_{article}.html"
+    if kind == "govuz":
+        return f"{site_prefix(kind, index)}/en/news/view/{article}"
+    return f"{site_prefix(kind, index)}/article/{article}.html"
+
+
+def article_title(kind: str, index: int, article: int) -> str:
+    topic = TOPICS[(index * 7 + article) % len(TOPICS)]
+    return f"{topic} ({kind} {index}-{article})"
+
+
+def render_list(base: str, kind: str, index: int) -> str:
+    items = []
+    for article in range(LINKS_PER_LIST):
+        published = date(2026, 1, 1) - timedelta(days=article)
+        items.append(
+            f'<li><a href="{base}{article_path(kind, index, article)}">{article_title(kind, index, article)}</a>'
+            f' <span>{published.isoformat()}</span></li>'
+        )
+    return (
+        f"<html><head><title>News - {kind} {index}</title></head><body>"
+        f"{NAV.format(base=base)}<main><h1>Latest news</h1><ul>{''.join(items)}</ul>"
+        f'<div class="pager"><a href="{base}{list_path(kind, index)}?page=2">Next</a></div></main>'
+        f"{FOOTER.format(base=base)}</body></html>"
+    )
+
+
+def render_article(base: str, kind: str, index: int, article: int, paragraphs: int = 8) -> str:
+    rng = random.Random(f"{kind}-{index}-{article}")
+    published = date(2026, 1, 1) - timedelta(days=article)
+    body = "".join(
+        "<p>" + " ".join(rng.choice(SENTENCES) for _ in range(5)) + "</p>"
+        for _ in range(paragraphs)
+    )
+    return (
+        f"<html><head><title>{article_title(kind, index, article)}</title></head><body>"
+        f"{NAV.format(base=base)}<article><h1>{article_title(kind, index, article)}</h1>"
+        f"<p class=\"meta\">Published {published.isoformat()} by Staff Reporter</p>{body}</article>"
+        f"{FOOTER.format(base=base)}</body></html>"
+    )
+
+
+def resolve(base: str, path: str) -> str:
+    """按路径生成页面，未知路径返回 None"""
+    path = path.split("?")[0]
+    for kind in SITE_KINDS:
+        prefix = site_prefix(kind, 0).rsplit("/", 1)[0] + "/"
+        if not path.startswith(prefix):
+            continue
+        rest = path[len(prefix):]
+        index_part, _, _ = rest.partition("/")
+        if not index_part.isdigit():
+            return None
+        index = int(index_part)
+        if path == list_path(kind, index):
+            return render_list(base, kind, index)
+        for article in range(LINKS_PER_LIST):
+            if path == article_path(kind, index, article):
+                return render_article(base, kind, index, article)
+    return None
+
+
+class CorpusServer:
+    """在后台线程中运行的语料服务，可选为每个请求增加固定延迟"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        corpus = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if corpus.latency:
+                    threading.Event().wait(corpus.latency)
+                page = resolve(corpus.base_url, self.path)
+                if page is None:
+                    self.send_error(404)
+                    return
+                body = page.encode()
+                corpus.requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self) -> "CorpusServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def source_urls(self, count: int, kinds=SITE_KINDS) -> List[Tuple[str, str]]:
+        """生成 count 个信源 (kind, url)，按 kinds 轮流分配"""
+        return [
+            (kinds[i % len(kinds)], f"{self.base_url}{list_path(kinds[i % len(kinds)], i)}")
+            for i in range(count)
+        ]
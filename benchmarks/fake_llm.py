@@ -0,0 +1,141 @@
+"""
+离线基准测试用的 OpenAI 兼容 LLM 桩服务（POST /v1/chat/completions）
+按系统提示词判断调用用途（与 ai_engine 中的四类调用对应），返回结构正确的 JSON：
+  discover         从【页面中提取的所有链接】中挑出文章链接
+  extract          从页面 Markdown 中取标题、日期和正文
+  relevance        固定返回 High
+  contract_clause  返回空风险列表
+每次调用按 latency ± jitter 延迟后返回，usage 按字符数 / 4 估算 token，便于和真实调用的成本对比。
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ARTICLE_LINK_MARKERS = ("/article/", "/art/", "/news/view/")
+CHARS_PER_TOKEN = 4
+
+
+def classify(system_prompt: str) -> str:
+    if "网页结构分析专家" in system_prompt:
+        return "discover"
+    if "数据提取专家" in system_prompt:
+        return "extract"
+    if "合同法专家" in system_prompt:
+        return "contract_clause"
+    return "relevance"
+
+
+def discover_links(user_content: str) -> dict:
+    section = user_content.split("【页面中提取的所有链接】", 1)[-1].split("【页面内容摘要】", 1)[0]
+    links = re.findall(r"https?://\S+", section)
+    articles = [link for link in links if any(marker in link for marker in ARTICLE_LINK_MARKERS)]
+    if not articles:
+        return {"page_type": "article", "links": [], "reason": "no article links"}
+    return {"page_type": "list", "links": articles, "reason": f"{len(articles)} article links"}
+
+
+def extract_article(markdown: str) -> dict:
+    title = next((line[2:].strip() for line in markdown.splitlines() if line.startswith("# ")), None)
+    if not title:
+        return {}
+    date = re.search(r"\d{4}-\d{2}-\d{2}", markdown)
+    paragraphs = [line.strip() for line in markdown.splitlines() if len(line.strip()) > 80]
+    content = "\n\n".join(paragraphs)
+    return {
+        "title": title,
+        "title_zh": title,
+        "publish_date": date.group(0) if date else None,
+        "author": "Staff Reporter",
+        "content_type": "News",
+        "keywords": ["基准测试", "政策"],
+        "summary": "基准测试用的合成文章摘要，" + title[:40],
+        "risk_hint": "合成数据，无实际风险含义",
+        "main_content": content,
+        "translated_content": content,
+        "confidence": 0.9,
+    }
+
+
+def respond(purpose: str, messages: list) -> dict:
+    user_content = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+    if purpose == "discover":
+        return discover_links(user_content)
+    if purpose == "extract":
+        return extract_article(user_content)
+    if purpose == "contract_clause":
+        return {"risks": [], "overall_risk_level": "Low"}
+    return {"value_level": "High", "reason": "benchmark"}
+
+
+class FakeLLMServer:
+    """在后台线程中运行的 LLM 桩服务，calls 按用途统计调用次数"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.5,
+                 jitter: float = 0.0, seed: int = 0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                messages = request.get("messages", [])
+                system_prompt = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+                purpose = classify(system_prompt)
+                content = json.dumps(respond(purpose, messages), ensure_ascii=False)
+                time.sleep(stub.delay())
+
+                prompt_tokens = sum(len(m.get("content") or "") for m in messages) // CHARS_PER_TOKEN
+                completion_tokens = len(content) // CHARS_PER_TOKEN
+                with stub._lock:
+                    stub.calls[purpose] += 1
+                body = json.dumps({
+                    "id": f"bench-{purpose}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "bench"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.base_url = f"http://{host}:{self.server.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def start(self) -> "FakeLLMServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,4 +1,4 @@
-const { createApp, ref, computed, onMounted } = Vue;
+const { createApp, ref, computed, onMounted, watch, nextTick } = Vue;
 
 createApp({
     setup() {
@@ -38,8 +38,10 @@ createApp({
         const complianceTasks = ref([]); // History of all compliance reviews
 
         const chartDom = ref(null);
+        const trendChartDom = ref(null);
         const fileInputSidebar = ref(null);
         let riskChart = null;
+        let trendChart = null;
 
         // --- CLOCK ---
         setInterval(() => {
@@ -47,24 +49,52 @@ createApp({
         }, 1000);
 
         // --- API CALLS ---
+        const updateIntelligenceStats = () => {
+            const data = intelligenceItems.value;
+            totalSources.value = new Set(data.map(i => i.source_id)).size;
+            highRisks.value = data.filter(i => {
+                const hint = (i.risk_hint || '').toLowerCase();
+                const summary = (i.summary || '').toLowerCase();
+                const highRiskKeywords = ['高风险', '重大风险', '严重', '紧急', '预警', '警告', 'high risk', 'critical', 'urgent', 'warning'];
+                return highRiskKeywords.some(k => hint.includes(k) || summary.includes(k));
+            }).length;
+        };
+
+        // 列表分页：默认不含正文，正文在打开详情时按需加载
+        const INTELLIGENCE_PAGE_SIZE = 100;
+        const nextIntelligenceCursor = ref(null);
+        const loadingMoreIntelligence = ref(false);
+
         const fetchIntelligence = async () => {
             try {
-                const res = await fetch('/api/intelligence/list');
+                const res = await fetch(`/api/intelligence/list?limit=${INTELLIGENCE_PAGE_SIZE}`);
                 const data = await res.json();
                 intelligenceItems.value = data;
-                totalSources.value = new Set(data.map(i => i.source_id)).size;
-                highRisks.value = data.filter(i => {
-                    const hint = (i.risk_hint || '').toLowerCase();
-                    const summary = (i.summary || '').toLowerCase();
-                    const highRiskKeywords = ['高风险', '重大风险', '严重', '紧急', '预警', '警告', 'high risk', 'critical', 'urgent', 'warning'];
-                    return highRiskKeywords.some(k => hint.includes(k) || summary.includes(k));
-                }).length;
+                nextIntelligenceCursor.value = res.headers.get('X-Next-Cursor');
+                updateIntelligenceStats();
                 updateChart();
             } catch (e) {
                 console.error(e);
             }
         };
 
+        const loadMoreIntelligence = async () => {
+            if (!nextIntelligenceCursor.value || loadingMoreIntelligence.value) return;
+            loadingMoreIntelligence.value = true;
+            try {
+                const res = await fetch(`/api/intelligence/list?limit=${INTELLIGENCE_PAGE_SIZE}&cursor=${encodeURIComponent(nextIntelligenceCursor.value)}`);
+                const data = await res.json();
+                intelligenceItems.value = intelligenceItems.value.concat(data);
+                nextIntelligenceCursor.value = res.headers.get('X-Next-Cursor');
+                updateIntelligenceStats();
+                updateChart();
+            } catch (e) {
+                console.error(e);
+            } finally {
+                loadingMoreIntelligence.value = false;
+            }
+        };
+
         // --- SOURCE MANAGEMENT ACTIONS ---
         const fetchSources = async () => {
             try {
@@ -95,7 +125,6 @@ createApp({
 
                 await fetch(`/api/source/${id}/retry`, { method: 'POST' });
                 fetchSources();
-                fetchIntelligence();
             } catch (e) { alert("采集失败"); fetchSources(); }
         };
 
@@ -114,22 +143,12 @@ createApp({
                 const res = await fetch('/api/source/batch-crawl', { method: 'POST' });
                 const data = await res.json();
                 alert(`已启动 ${data.count} 个信源的采集任务`);
+                if (!data.count) batchCrawling.value = false;
                 
-                // Start polling for updates
-                const pollInterval = setInterval(() => {
-                    fetchSources();
-                    fetchIntelligence();
-                    // Check if all done
-                    const stillProcessing = sources.value.some(s => s.status === 'processing');
-                    if (!stillProcessing) {
-                        clearInterval(pollInterval);
-                        batchCrawling.value = false;
-                    }
-                }, 5000);
-                
-                // Auto stop after 5 minutes
+                // 进度通过变更事件推送（source.status / item.created），不再轮询
+                // 兜底：5 分钟后解除采集中状态
                 setTimeout(() => {
-                    clearInterval(pollInterval);
+                    if (!batchCrawling.value) return;
                     batchCrawling.value = false;
                     fetchSources();
                 }, 300000);
@@ -181,8 +200,7 @@ createApp({
                     method: 'POST'
                 });
                 newUrl.value = '';
-                fetchIntelligence();
-                fetchSources(); // Refresh list if open
+                fetchSources(); // Refresh list if open; new items arrive via the change feed
             } catch (e) {
                 alert("添加信源失败，请检查 URL 是否有效");
             } finally {
@@ -190,10 +208,24 @@ createApp({
             }
         };
 
-        const openDetail = (item) => {
+        const openDetail = async (item) => {
             currentDetailItem.value = item;
             showTranslation.value = false; // Reset to original by default
             showDetailModal.value = true;
+            if (item.original_text === undefined) {
+                try {
+                    const res = await fetch(`/api/intelligence/item/${encodeURIComponent(item.id)}`);
+                    const body = res.ok ? await res.json() : null;
+                    if (body) {
+                        Object.assign(item, body);
+                        if (currentDetailItem.value && currentDetailItem.value.id === item.id) {
+                            currentDetailItem.value = { ...item };
+                        }
+                    }
+                } catch (e) {
+                    console.error(e);
+                }
+            }
         };
 
         const deleteItem = async (itemId) => {
@@ -443,7 +475,117 @@ createApp({
             riskChart.setOption(option);
         };
 
+        // 风险趋势：读取服务端日汇总，按风险标签分组
+        const TREND_DAYS = 30;
+        const fetchTrends = async () => {
+            if (typeof echarts === 'undefined' || !trendChartDom.value) return;
+            try {
+                const res = await fetch(`/api/intelligence/trends?days=${TREND_DAYS}&group_by=tag&top=6`);
+                const data = await res.json();
+                if (!trendChart) {
+                    trendChart = echarts.init(trendChartDom.value);
+                    window.addEventListener('resize', () => trendChart.resize());
+                }
+                trendChart.setOption({
+                    backgroundColor: 'transparent',
+                    tooltip: { trigger: 'axis' },
+                    legend: { top: 0, textStyle: { color: '#cbd5e1' } },
+                    grid: { left: 40, right: 20, top: 50, bottom: 30 },
+                    xAxis: {
+                        type: 'category',
+                        data: data.dates.map(d => d.slice(5)),
+                        axisLabel: { color: '#94a3b8' }
+                    },
+                    yAxis: {
+                        type: 'value',
+                        minInterval: 1,
+                        axisLabel: { color: '#94a3b8' },
+                        splitLine: { lineStyle: { color: 'rgba(148,163,184,0.15)' } }
+                    },
+                    series: [
+                        { name: '情报总数', type: 'bar', data: data.total, itemStyle: { color: 'rgba(59,130,246,0.35)' } },
+                        ...data.series.map(s => ({ name: s.name, type: 'line', smooth: true, symbol: 'none', data: s.data }))
+                    ]
+                }, true);
+                trendChart.resize();
+            } catch (e) {
+                console.warn('Trend chart error:', e);
+            }
+        };
+
+        watch(chartTab, async (tab) => {
+            if (tab !== 'trend') return;
+            await nextTick();  // 等待容器显示后再初始化，否则图表尺寸为 0
+            fetchTrends();
+        });
+
+        // --- CHANGE FEED (SSE) ---
+        // 服务端推送增量变更，替代定时轮询；断线后浏览器自动重连并补发错过的事件
+        let eventSource = null;
+        const applyEvent = (handler) => (e) => {
+            try {
+                handler(JSON.parse(e.data));
+            } catch (err) {
+                console.error('Event handling error:', err);
+            }
+        };
+
+        const connectEvents = () => {
+            if (typeof EventSource === 'undefined') return;
+            eventSource = new EventSource('/api/events');
+
+            eventSource.addEventListener('item.created', applyEvent((items) => {
+                const known = new Set(intelligenceItems.value.map(i => i.id));
+                const fresh = items.filter(i => !known.has(i.id));
+                if (!fresh.length) return;
+                intelligenceItems.value = fresh.concat(intelligenceItems.value);
+                updateIntelligenceStats();
+            }));
+
+            eventSource.addEventListener('item.deleted', applyEvent(({ ids }) => {
+                const removed = new Set(ids);
+                intelligenceItems.value = intelligenceItems.value.filter(i => !removed.has(i.id));
+                updateIntelligenceStats();
+            }));
+
+            eventSource.addEventListener('source.status', applyEvent((source) => {
+                const idx = sources.value.findIndex(s => s.id === source.id);
+                if (idx !== -1) {
+                    sources.value[idx] = source;
+                } else {
+                    sources.value.push(source);
+                }
+                if (batchCrawling.value && !sources.value.some(s => s.status === 'processing')) {
+                    batchCrawling.value = false;
+                }
+            }));
+
+            eventSource.addEventListener('source.deleted', applyEvent(({ id }) => {
+                sources.value = sources.value.filter(s => s.id !== id);
+            }));
+
+            eventSource.addEventListener('contract.task', applyEvent((task) => {
+                const idx = contractTasks.value.findIndex(t => t.id === task.id);
+                if (idx !== -1) {
+                    contractTasks.value[idx] = task;
+                } else {
+                    contractTasks.value.unshift(task);
+                }
+                if (currentTask.value && currentTask.value.id === task.id && currentTask.value.status !== task.status) {
+                    viewContractResult(task.id);
+                }
+            }));
+
+            // 落后太多或服务重启：重新拉取全量
+            eventSource.addEventListener('resync', () => {
+                fetchIntelligence();
+                fetchSources();
+                fetchContractTasks();
+            });
+        };
+
         onMounted(() => {
+            connectEvents();
             fetchIntelligence();
             fetchContractTasks(); // Load contract history
 
@@ -540,9 +682,13 @@ createApp({
             loadingSource,
             addSource,
             intelligenceItems,
+            nextIntelligenceCursor,
+            loadingMoreIntelligence,
+            loadMoreIntelligence,
             totalSources,
             highRisks,
             chartDom,
+            trendChartDom,
             fileInputSidebar,
             uploadContract,
             currentTask,
@@ -49,3 +49,140 @@ async def test_add_source_validation():
         # 缺少 url 参数应该返回 422
         response = await client.post("/api/intelligence/source")
         assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_contract_batch_upload_rejects_unsupported_files():
+    """测试批量上传不支持的文件类型返回 400"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/contract/batch-upload",
+            files=[("files", ("notes.txt", b"not a contract", "text/plain"))]
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_intelligence_list_pagination_validation():
+    """测试情报列表分页参数校验"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/intelligence/list", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+        response = await client.get("/api/intelligence/list", params={"fields": "title,password"})
+        assert response.status_code == 400
+        response = await client.get("/api/intelligence/list", params={"limit": 0})
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_intelligence_item_not_found():
+    """测试情报详情接口对不存在的条目返回 404"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/intelligence/item/does-not-exist")
+        assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_intelligence_trends_validation():
+    """测试趋势接口参数校验"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/intelligence/trends", params={"group_by": "author"})
+        assert response.status_code == 422
+        response = await client.get("/api/intelligence/trends", params={"days": 0})
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_delete_by_filter_requires_filter():
+    """测试按条件删除必须提供至少一个筛选条件"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/intelligence/delete-by-filter")
+        assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_crawl_job_endpoints_validation():
+    """测试采集任务接口：非法状态返回 422，不存在的任务返回 404"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/crawl/jobs", params={"status": "paused"})
+        assert response.status_code == 422
+        response = await client.get("/api/crawl/jobs/does-not-exist")
+        assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_source_frontier_not_found():
+    """测试不存在的信源查询待采集队列返回 404"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/source/does-not-exist/frontier")
+        assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_crawl_stage_stats_validation():
+    """测试阶段耗时汇总接口参数校验"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/crawl/runs/stages", params={"stage": "render"})
+        assert response.status_code == 422
+        response = await client.get("/api/crawl/runs/stages", params={"days": 0})
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_llm_usage_validation():
+    """测试 LLM 用量接口参数校验"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/llm/usage", params={"group_by": "author"})
+        assert response.status_code == 422
+        response = await client.get("/api/llm/usage", params={"purpose": "chat"})
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_admin_profile_requires_token(monkeypatch):
+    """测试剖析接口：未配置令牌时不存在，令牌错误返回 403，参数非法返回 422"""
+    from app.core.config import settings
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+        response = await client.get("/api/admin/profile", params={"seconds": 1})
+        assert response.status_code == 404
+
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+        response = await client.get("/api/admin/profile", params={"seconds": 1}, headers={"X-Admin-Token": "wrong"})
+        assert response.status_code == 403
+        response = await client.get("/api/admin/profile", params={"mode": "memory"}, headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 422
+        response = await client.get("/api/admin/profile/unknown", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_admin_clear_cache(monkeypatch):
+    """测试清空缓存接口：需要管理令牌，缓存名非法返回 422"""
+    from app.core.config import settings
+    from app.services.cache_service import cache_service
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+        response = await client.delete("/api/admin/cache")
+        assert response.status_code == 404
+
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+        response = await client.delete("/api/admin/cache", params={"cache": "pages"}, headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 422
+
+        cache_service.set_url_content("https://example.com/cached", "page")
+        response = await client.delete("/api/admin/cache", params={"cache": "url"}, headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 200
+        assert response.json() == {"cleared": ["url"]}
+        assert await cache_service.get_url_content("https://example.com/cached") is None
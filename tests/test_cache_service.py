@@ -0,0 +1,170 @@
+"""
+两级缓存测试
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.services.cache_backends import CacheBackend, SqliteBackend
+from app.services.cache_service import CacheService, MemoryLRU, TieredCache
+
+
+def make_cache(tmp_path, memory_bytes=100_000, shared_bytes=1_000_000, ttl=60, namespace="test"):
+    backend = SqliteBackend(str(tmp_path / "cache.sqlite3"), namespace)
+    return TieredCache("url", ttl, memory_bytes, shared_bytes, backend)
+
+
+def test_memory_lru_is_bounded_in_bytes():
+    """测试内存层按字节数淘汰最久未访问的条目，超过总容量的单条不进内存"""
+    lru = MemoryLRU(300)
+    expires_at = time.time() + 60
+    assert lru.set("a", "A", 100, expires_at) == 0
+    assert lru.set("b", "B", 100, expires_at) == 0
+    lru.get("a")
+    assert lru.set("c", "C", 150, expires_at) == 1
+    assert lru.get("b") is None and lru.get("a") == "A"
+    assert lru.bytes == 250
+    assert lru.set("huge", "H", 1000, expires_at) == 0
+    assert lru.get("huge") is None
+
+
+def test_shared_tier_survives_restart_and_promotes_to_memory(tmp_path):
+    """测试共享层在新实例（模拟重启）中仍可命中，命中后回填内存层"""
+    cache = make_cache(tmp_path)
+    page = "正文 " * 5000
+    cache.set("https://example.com/a", page)
+    cache.set("hash", {"title": "标题", "summary": None})
+    cache.backend.flush()
+
+    restarted = make_cache(tmp_path)
+    assert restarted.get("https://example.com/a") == page
+    assert restarted.stats["memory"]["miss"] == 1 and restarted.stats["shared"]["hit"] == 1
+    assert restarted.get("https://example.com/a") == page
+    assert restarted.stats["memory"]["hit"] == 1
+    assert restarted.get("hash") == {"title": "标题", "summary": None}
+    assert restarted.get("missing") is None
+    assert restarted.stats["shared"]["miss"] == 1
+    # 压缩后的大小远小于原文；共享层容量由后台统计，统计前不返回
+    assert "shared" not in restarted.usage()
+    restarted.backend.refresh_usage("url")
+    assert restarted.usage()["shared"][1] < len(page.encode()) / 10
+
+
+def test_expired_entries_miss_in_both_tiers(tmp_path):
+    """测试过期条目在内存层和共享层都不命中"""
+    cache = make_cache(tmp_path, ttl=0.2)
+    cache.set("k", "v")
+    cache.backend.flush()
+    time.sleep(0.25)
+    assert cache.get("k") is None
+    assert cache.stats["shared"]["miss"] == 1
+
+
+def test_shared_tier_evicts_least_recently_used(tmp_path):
+    """测试 sqlite 共享层超过容量时淘汰最久未访问的条目"""
+    cache = make_cache(tmp_path, memory_bytes=0, shared_bytes=3000)
+    for i in range(10):
+        # 随机内容压缩后每条约 1KB
+        cache.set(f"k{i}", os.urandom(1000).hex())
+        cache.backend.flush()
+        time.sleep(0.01)
+    cache.backend.refresh_usage("url")
+    entries, size = cache.usage()["shared"]
+    assert size <= 3000
+    assert cache.stats["shared"]["eviction"] == 10 - entries
+    assert cache.get("k9") is not None
+    assert cache.get("k0") is None
+
+
+def test_namespaces_are_isolated(tmp_path):
+    """测试不同命名空间共用一个文件时互不可见，清空只影响本命名空间"""
+    cache = make_cache(tmp_path, namespace="a")
+    other = make_cache(tmp_path, namespace="b")
+    cache.set("k", "from a")
+    other.set("k", "from b")
+    cache.backend.flush()
+    other.backend.flush()
+    cache.clear().result()
+    assert cache.get("k") is None
+    assert make_cache(tmp_path, namespace="b").get("k") == "from b"
+
+
+def test_clear_and_delete_invalidate_other_workers(tmp_path):
+    """测试一个进程的删除 / 清空会清掉其他进程内存层中的条目"""
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a = CacheService(SqliteBackend(path, "test"))
+    worker_b = CacheService(SqliteBackend(path, "test"))
+    for worker in (worker_a, worker_b):
+        worker.poll_invalidations()
+
+    worker_a.set_url_content("https://example.com/1", "one")
+    worker_a.set_url_content("https://example.com/2", "two")
+    worker_a.backend.flush()
+    assert asyncio.run(worker_b.get_url_content("https://example.com/1")) == "one"
+    assert asyncio.run(worker_b.get_url_content("https://example.com/2")) == "two"
+    assert len(worker_b.url_cache.memory) == 2
+
+    worker_a.url_cache.delete("https://example.com/1").result()
+    worker_b.apply_invalidations(worker_b.poll_invalidations())
+    assert asyncio.run(worker_b.get_url_content("https://example.com/1")) is None
+    assert len(worker_b.url_cache.memory) == 1
+
+    worker_b.set_extraction("hash", {"title": "t"})
+    worker_a.clear_all()
+    assert worker_a.poll_invalidations() == []
+    worker_b.apply_invalidations(worker_b.poll_invalidations())
+    assert len(worker_b.url_cache.memory) == 0 and len(worker_b.extraction_cache.memory) == 0
+    assert asyncio.run(worker_b.get_url_content("https://example.com/2")) is None
+
+
+def test_reads_do_not_wait_for_writer(tmp_path):
+    """测试读取使用独立连接：后台线程占用写连接、其他进程持有写锁时读取不等待"""
+    cache = make_cache(tmp_path, memory_bytes=0)
+    cache.set("k", "v")
+    cache.backend.flush()
+    other_process = sqlite3.connect(str(tmp_path / "cache.sqlite3"), isolation_level=None)
+    other_process.execute("BEGIN IMMEDIATE")
+    try:
+        with cache.backend._lock:
+            started = time.perf_counter()
+            assert cache.get("k") == "v"
+            assert time.perf_counter() - started < 0.5
+    finally:
+        other_process.execute("ROLLBACK")
+        other_process.close()
+
+
+def test_async_get_reads_shared_tier_in_reader_thread(tmp_path):
+    """测试 aget 在读取线程中查询共享层，事件循环线程不执行共享层读取"""
+    cache = make_cache(tmp_path)
+    cache.set("k", {"title": "标题"})
+    cache.backend.flush()
+    restarted = make_cache(tmp_path)
+    backend_get = restarted.backend.get
+    threads = []
+
+    def get(cache_name, key):
+        threads.append(threading.current_thread().name)
+        return backend_get(cache_name, key)
+
+    restarted.backend.get = get
+    assert asyncio.run(restarted.aget("k")) == {"title": "标题"}
+    assert asyncio.run(restarted.aget("k")) == {"title": "标题"}
+    assert asyncio.run(restarted.aget("missing")) is None
+    assert len(threads) == 2 and all(name.startswith("cache-reader") for name in threads)
+    assert restarted.stats["memory"]["hit"] == 1
+    assert restarted.stats["shared"]["hit"] == 1 and restarted.stats["shared"]["miss"] == 1
+
+
+def test_incomplete_backend_cannot_be_created():
+    """测试未实现全部接口的共享层在创建时即报错"""
+    class GetOnly(CacheBackend):
+        def get(self, cache, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly("test")
@@ -0,0 +1,68 @@
+"""
+响应压缩中间件测试
+"""
+import asyncio
+import gzip
+
+from app.core.compression import (
+    CompressionMiddleware, add_vary_accept_encoding, choose_encoding, encoded_etag, strip_encoding_suffix,
+)
+
+
+def _run(app, headers):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    scope = {"type": "http", "method": "GET", "headers": headers}
+    asyncio.run(CompressionMiddleware(app, minimum_size=100)(scope, receive, send))
+    return sent
+
+
+def _json_app(body: bytes, content_type: bytes = b"application/json"):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type), (b"etag", b'"v1"')]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+def test_choose_encoding_and_etag_suffix():
+    """测试编码协商和 ETag 后缀"""
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert encoded_etag('"v1"', "gzip") == '"v1-gz"'
+    assert strip_encoding_suffix('"v1-gz", "v2-br"') == '"v1", "v2"'
+
+
+def test_large_json_is_gzipped_small_is_not():
+    """测试超过阈值的 JSON 被压缩，ETag 带编码后缀"""
+    body = b"[" + b'"item",' * 100 + b'"end"]'
+    start, message = _run(_json_app(body), [(b"accept-encoding", b"gzip")])
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"etag"] == b'"v1-gz"'
+    assert gzip.decompress(message["body"]) == body
+
+    start, message = _run(_json_app(b"[]"), [(b"accept-encoding", b"gzip")])
+    assert b"content-encoding" not in dict(start["headers"])
+    assert message["body"] == b"[]"
+
+
+def test_event_stream_passes_through():
+    """测试事件流不被缓冲或压缩"""
+    sent = _run(_json_app(b"data: x\n\n" * 50, b"text/event-stream"), [(b"accept-encoding", b"gzip")])
+    assert b"content-encoding" not in dict(sent[0]["headers"])
+
+
+def test_vary_is_appended_to_existing_header():
+    """测试已有 Vary 时追加 Accept-Encoding，已包含时不重复"""
+    assert add_vary_accept_encoding([]) == [(b"vary", b"Accept-Encoding")]
+    assert add_vary_accept_encoding([(b"vary", b"Origin"), (b"etag", b'"v1"')]) == [
+        (b"etag", b'"v1"'), (b"vary", b"Origin, Accept-Encoding")]
+    assert add_vary_accept_encoding([(b"vary", b"accept-encoding")]) == [(b"vary", b"accept-encoding")]
+    assert add_vary_accept_encoding([(b"vary", b"*")]) == [(b"vary", b"*")]
@@ -0,0 +1,56 @@
+"""
+合同规则引擎测试
+"""
+from app.services.contract_rules import ContractRuleEngine, contract_rule_engine, split_alternatives, leading_literal
+
+
+def test_split_alternatives_and_anchors():
+    """测试正则分支拆分和前导字面量提取"""
+    parts = split_alternatives(r"(assign(ment)?|transfer|合同.{0,3}转让)")
+    assert parts == ["assign(ment)?", "transfer", "合同.{0,3}转让"]
+    assert [leading_literal(p) for p in parts] == ["assign", "transfer", "合同"]
+    assert leading_literal("penalties?") == "penaltie"
+
+
+def test_scan_returns_all_matches_with_offsets():
+    """测试单次扫描返回全部命中及偏移量"""
+    text = "甲方有权单方解约。The Buyer may TERMINATE this Agreement. 争议提交仲裁。"
+    matches = contract_rule_engine.scan(text)
+    ids = [m.rule_id for m in matches]
+    assert ids == ["R1", "R1", "R9"]
+    for m in matches:
+        assert text[m.start:m.end] == m.text
+    assert matches[1].text == "TERMINATE"
+
+
+def test_select_chunks_skips_chunks_without_hits():
+    """测试无规则命中的分块不送 LLM"""
+    filler = "交货地点为项目现场。" * 100  # 1000 字符
+    text = filler + "甲方不承担任何责任，乙方应支付违约金。" + filler + filler
+    selected = contract_rule_engine.select_chunks(text, 1000, 3)
+    assert [c.index for c in selected] == [1]
+    assert selected[0].score > 0
+
+    no_hits = contract_rule_engine.select_chunks(filler * 3, 1000, 3)
+    assert [c.index for c in no_hits] == [0]
+
+
+def test_unanchored_rule_falls_back_to_full_scan():
+    """测试无法提取关键字的规则仍能命中"""
+    engine = ContractRuleEngine(rules_file="/nonexistent.yaml")
+    engine.load({"rules": [
+        {"id": "A", "pattern": "(fee)", "risk_category": "费用", "risk_level": "Low"},
+        {"id": "B", "pattern": r"(\d+%)", "risk_category": "比例", "risk_level": "Medium"},
+    ]})
+    matches = engine.scan("late FEE of 5% applies")
+    assert [(m.rule_id, m.text) for m in matches] == [("A", "FEE"), ("B", "5%")]
+
+
+def test_overlapping_rules_are_all_reported():
+    """测试同一位置 / 重叠文本上的多条规则都会命中（R1+R6、R8+R4）"""
+    matches = contract_rule_engine.scan("The Seller may unilaterally modify the specs.")
+    assert [(m.rule_id, m.text) for m in matches] == [("R1", "unilateral"), ("R6", "unilaterally modify")]
+
+    matches = contract_rule_engine.scan("The Contractor bears unlimited liability.")
+    assert [(m.rule_id, m.text) for m in matches] == [("R8", "unlimited liabilit"), ("R4", "liabilit")]
+    assert {r["clause_id"] for r in contract_rule_engine.to_risks("unlimited liability")} == {"R4", "R8"}
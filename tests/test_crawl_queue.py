@@ -0,0 +1,19 @@
+"""
+采集任务队列测试
+"""
+from app.core.config import settings
+from app.services.crawl_queue import RETRY_MAX_DELAY_SECONDS, retry_delay
+
+
+def test_retry_delay_grows_exponentially_with_jitter():
+    """测试重试退避按指数增长并带抖动"""
+    base = settings.CRAWL_JOB_RETRY_BASE_SECONDS
+    for attempts in (1, 2, 3):
+        delay = retry_delay(attempts)
+        expected = base * 2 ** (attempts - 1)
+        assert expected * 0.8 <= delay <= expected * 1.2
+
+
+def test_retry_delay_is_capped():
+    """测试退避时间有上限"""
+    assert retry_delay(30) <= RETRY_MAX_DELAY_SECONDS * 1.2
@@ -0,0 +1,33 @@
+"""
+采集记录测试
+"""
+import asyncio
+
+from app.core.performance import note_span
+from app.services.crawl_runs import CrawlRunTrace
+
+
+def test_trace_merges_stage_spans_and_counters():
+    """测试同一阶段多次执行时累加次数和计数，并发的阶段各自计数"""
+    trace = CrawlRunTrace("source-1")
+
+    async def fetch(size):
+        async with trace.span("item_fetch"):
+            note_span(bytes=size)
+            await asyncio.sleep(0)
+
+    async def run():
+        async with trace.span("extraction"):
+            note_span(tokens=1200, llm_calls=1)
+        await asyncio.gather(fetch(100), fetch(250))
+
+    asyncio.run(run())
+    assert trace.stages["item_fetch"]["n"] == 2
+    assert trace.stages["item_fetch"]["bytes"] == 350
+    assert trace.stages["extraction"]["tokens"] == 1200
+    assert "bytes" not in trace.stages["extraction"]
+
+
+def test_note_span_outside_trace_is_ignored():
+    """测试不在采集流程中时 note_span 不报错"""
+    note_span(bytes=10)
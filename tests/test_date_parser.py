@@ -0,0 +1,26 @@
+"""
+发布日期解析测试
+"""
+from datetime import date
+
+from app.services.date_parser import parse_publish_date
+
+
+def test_parse_common_formats():
+    """测试 ISO / 日月年 / 英文 / 俄文 / 中文格式"""
+    expected = date(2026, 1, 8)
+    for value in [
+        "2026-01-08", "2026-01-08T10:30:00Z", "2026/1/8", "08.01.2026",
+        "January 8, 2026", "Jan. 8th 2026", "8 January 2026", "8 января 2026 г.",
+        "2026年1月8日", "发布时间：2026 年 1 月 8 日",
+    ]:
+        assert parse_publish_date(value) == expected, value
+
+
+def test_parse_ambiguous_and_invalid():
+    """测试月/日互换及无法识别的输入"""
+    assert parse_publish_date("01/31/2026") == date(2026, 1, 31)
+    assert parse_publish_date("3 мая 2024") == date(2024, 5, 3)
+    assert parse_publish_date("2026-13-45") is None
+    assert parse_publish_date("今日") is None
+    assert parse_publish_date(None) is None
@@ -0,0 +1,43 @@
+"""
+合同脱敏测试
+"""
+from app.services.desensitizer import Desensitizer, desensitize, rehydrate
+
+SAMPLE = """甲方：北京星辰能源科技有限公司，乙方：Tashkent Solar Power LLC
+合同金额为人民币1,200,000元，应于2024年3月1日前支付至账号 6222 0212 3456 7890 123。
+The Seller shall pay $1,000,000 by January 8, 2026, 08/01/2026 or 2026-01-08.
+Contact: john.doe@example.com, +998 71 123 45 67, 13912345678.
+北京星辰能源科技有限公司 shall bear the costs.
+"""
+
+
+def test_masks_all_categories():
+    """测试各类敏感信息都被替换"""
+    masked, token_map = desensitize(SAMPLE)
+    for value in ["北京星辰能源科技有限公司", "Tashkent Solar Power LLC", "人民币1,200,000元", "2024年3月1日",
+                  "6222 0212 3456 7890 123", "$1,000,000", "January 8, 2026", "08/01/2026", "2026-01-08",
+                  "john.doe@example.com", "+998 71 123 45 67", "13912345678"]:
+        assert value not in masked
+        assert value in token_map.values()
+    # 标签保留，同一当事方使用同一占位符
+    assert masked.startswith("甲方：[PARTY_1]")
+    assert masked.count("[PARTY_1]") == 2
+
+
+def test_rehydrate_roundtrip():
+    """测试占位符可以还原"""
+    masked, token_map = desensitize(SAMPLE)
+    assert rehydrate(masked, token_map) == SAMPLE
+    assert rehydrate("「乙方应向[PARTY_1]支付[AMOUNT_1]」", token_map) == "「乙方应向北京星辰能源科技有限公司支付人民币1,200,000元」"
+    assert rehydrate("[AMOUNT_99]", token_map) == "[AMOUNT_99]"
+
+
+def test_stream_matches_whole_text():
+    """测试分段输入与整体处理结果一致"""
+    text = SAMPLE * 50
+    expected, expected_map = desensitize(text)
+    for step in (7, 300, 4096):
+        d = Desensitizer()
+        output = "".join(d.stream(text[i:i + step] for i in range(0, len(text), step)))
+        assert output == expected
+        assert d.token_map == expected_map
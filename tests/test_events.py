@@ -0,0 +1,42 @@
+"""
+变更事件总线测试
+"""
+import asyncio
+
+from app.services.events import EventBus
+
+
+def _event_types(messages):
+    return [line.split(": ", 1)[1] for m in messages for line in m.splitlines() if line.startswith("event: ")]
+
+
+def test_subscriber_receives_published_events():
+    """测试订阅方按顺序收到事件"""
+    bus = EventBus()
+
+    async def run():
+        stream = bus.subscribe()
+        assert (await stream.__anext__()).startswith("retry:")
+        receive = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        bus.publish("item.created", [{"id": "a"}])
+        message = await receive
+        await stream.aclose()
+        return message
+
+    message = asyncio.run(run())
+    assert _event_types([message]) == ["item.created"]
+    assert '"id":"a"' in message
+    assert bus.subscriber_count == 0
+
+
+def test_replay_after_reconnect_and_resync():
+    """测试断线重连补发，以及无法补齐时要求重新同步"""
+    bus = EventBus()
+    bus.publish("source.status", {"id": "s1"})
+    first_id = bus._history[0][1].split("\n", 1)[0][len("id: "):]
+    bus.publish("item.deleted", {"ids": ["a"]})
+
+    assert _event_types(bus._replay(first_id)) == ["item.deleted"]
+    assert _event_types(bus._replay("stale-1")) == ["resync"]
+    assert bus._replay(None) == []
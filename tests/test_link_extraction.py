@@ -0,0 +1,35 @@
+"""
+列表页 Markdown 链接提取测试
+"""
+import time
+
+from app.services.ai_engine import GOV_UZ_NEWS_LINK_RE, MARKDOWN_LINK_RE
+
+
+def test_markdown_link_regex_extracts_links_with_titles():
+    """测试提取普通链接和带标题的链接（标题保留在 href 中，由调用方按引号截断）"""
+    markdown = (
+        '* [首页](https://www.mofcom.gov.cn/ "首页")\n'
+        "* [Tariffs rise](https://lk.mofcom.gov.cn/art/2026/art_12.html)\n"
+        "[![logo](https://img.example.com/a.png)](https://example.com/)\n"
+        "[relative](/en/about) [mail](mailto:a@b.c)"
+    )
+    assert MARKDOWN_LINK_RE.findall(markdown) == [
+        ("首页", 'https://www.mofcom.gov.cn/ "首页"'),
+        ("Tariffs rise", "https://lk.mofcom.gov.cn/art/2026/art_12.html"),
+        ("logo", "https://img.example.com/a.png"),
+    ]
+
+
+def test_gov_uz_relative_news_links():
+    """测试 gov.uz 相对路径新闻链接"""
+    markdown = "[News](/en/mift/news/view/123) [About](/en/mift/about) [Old](/en/news/view/9)"
+    assert GOV_UZ_NEWS_LINK_RE.findall(markdown) == [("News", "/en/mift/news/view/123")]
+
+
+def test_markdown_link_regex_is_linear_on_unclosed_brackets():
+    """测试未闭合的括号不会触发平方级回溯（旧正则在 100KB 上需要数十秒）"""
+    for text in ("[" * 200_000, "[a](http://" * 20_000, "[a " * 70_000):
+        start = time.perf_counter()
+        assert MARKDOWN_LINK_RE.findall(text) == []
+        assert time.perf_counter() - start < 1
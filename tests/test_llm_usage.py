@@ -0,0 +1,68 @@
+"""
+LLM 用量统计测试
+"""
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.services.llm_usage import (
+    LLMUsageRecorder, cached_prompt_tokens, llm_attribution, llm_cost, llm_usage,
+)
+
+
+def test_cached_prompt_tokens_supports_both_usage_formats():
+    """测试读取 DeepSeek 和 OpenAI 两种缓存命中字段"""
+    assert cached_prompt_tokens(SimpleNamespace(prompt_cache_hit_tokens=300)) == 300
+    details = SimpleNamespace(cached_tokens=120)
+    assert cached_prompt_tokens(SimpleNamespace(prompt_tokens_details=details)) == 120
+    assert cached_prompt_tokens(SimpleNamespace(prompt_tokens=10)) == 0
+    assert cached_prompt_tokens(None) == 0
+
+
+def test_llm_cost_prices_cached_input_separately():
+    """测试缓存命中的输入按缓存单价计费"""
+    expected = (
+        700 * settings.LLM_PRICE_INPUT_PER_M
+        + 300 * settings.LLM_PRICE_CACHED_INPUT_PER_M
+        + 200 * settings.LLM_PRICE_OUTPUT_PER_M
+    ) / 1_000_000
+    assert abs(llm_cost(1000, 200, 300) - expected) < 1e-12
+
+
+def test_record_uses_current_attribution():
+    """测试调用记录归属到当前信源"""
+    usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=100, prompt_cache_hit_tokens=0)
+    llm_usage._buffer.clear()
+    with llm_attribution(source_id="source-1"):
+        llm_usage.record("extract", "deepseek-chat", usage, 1234.5)
+    llm_usage.record("relevance", "deepseek-chat", None, 10, ok=False)
+    first, second = llm_usage._buffer
+    assert first["source_id"] == "source-1" and first["prompt_tokens"] == 1000 and first["latency_ms"] == 1234
+    assert second["source_id"] is None and second["ok"] is False and second["cost_usd"] == 0
+    llm_usage._buffer.clear()
+
+
+def test_flush_is_serialized_and_skips_deleted_attribution():
+    """测试并发 flush 不重复写入；归属已删除导致外键冲突时去掉归属重写，不阻塞后续记录"""
+    recorder = LLMUsageRecorder()
+    written = []
+
+    async def insert(batch):
+        await asyncio.sleep(0.01)
+        if any(row["source_id"] == "deleted" for row in batch):
+            raise IntegrityError("INSERT", {}, Exception("foreign key violation"))
+        written.extend(dict(row) for row in batch)
+
+    recorder._insert = insert
+    with llm_attribution(source_id="deleted"):
+        recorder.record("extract", "deepseek-chat", None, 10)
+    recorder.record("relevance", "deepseek-chat", None, 10)
+
+    async def run():
+        await asyncio.gather(recorder.flush(), recorder.flush(), recorder.flush())
+
+    asyncio.run(run())
+    assert len(written) == 2 and all(row["source_id"] is None for row in written)
+    assert recorder._buffer == []
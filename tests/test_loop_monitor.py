@@ -0,0 +1,62 @@
+"""
+事件循环延迟监控测试
+"""
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.loop_monitor import LoopLagMonitor
+from app.core.performance import perf_stats
+
+
+def blocking_parse(seconds: float):
+    time.sleep(seconds)
+
+
+async def handler():
+    await asyncio.sleep(0.1)
+    blocking_parse(0.3)
+
+
+def test_stall_is_attributed_to_blocking_function(monkeypatch):
+    """测试阻塞超过阈值时记录阻塞任务和阻塞函数，并导出延迟直方图"""
+    monkeypatch.setattr(settings, "LOOP_LAG_THRESHOLD_MS", 50)
+    perf_stats.reset()
+    monitor = LoopLagMonitor()
+
+    async def main():
+        task = asyncio.create_task(monitor.run_periodic())
+        await asyncio.create_task(handler(), name="parser")
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(main())
+    assert len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert stall["task"] == "parser"
+    assert stall["site"].startswith("blocking_parse (test_loop_monitor.py:")
+    assert stall["blocked_ms"] >= 250
+    assert any(label.startswith("handler ") for label in stall["stack"])
+
+    summary = monitor.summary()
+    assert summary["sites"][0]["count"] == 1
+    assert summary["lag_ms"]["max"] >= 250
+    assert perf_stats.loop_stalls.get(stall["site"]) == 1
+    assert "event_loop_lag_seconds_count" in perf_stats.render()
+
+
+def test_short_pauses_are_not_stalls(monkeypatch):
+    """测试低于阈值的延迟只计入直方图"""
+    monkeypatch.setattr(settings, "LOOP_LAG_THRESHOLD_MS", 200)
+    monitor = LoopLagMonitor()
+
+    async def main():
+        task = asyncio.create_task(monitor.run_periodic())
+        for _ in range(3):
+            await asyncio.sleep(0.06)
+            blocking_parse(0.02)
+        task.cancel()
+
+    asyncio.run(main())
+    assert not monitor.stalls
+    assert monitor.summary()["lag_ms"]["samples"] > 0
@@ -0,0 +1,51 @@
+"""
+性能指标测试
+"""
+from app.core.performance import Histogram, PerformanceStats, domain_of
+
+
+def test_histogram_renders_cumulative_buckets():
+    """测试直方图按 Prometheus 格式输出累计桶"""
+    histogram = Histogram("fetch_seconds", "Fetch latency", ("domain",), buckets=(0.1, 1))
+    histogram.observe(0.05, "a.com")
+    histogram.observe(0.5, "a.com")
+    histogram.observe(5, "a.com")
+    lines = histogram.render()
+    assert 'fetch_seconds_bucket{domain="a.com",le="0.1"} 1' in lines
+    assert 'fetch_seconds_bucket{domain="a.com",le="1"} 2' in lines
+    assert 'fetch_seconds_bucket{domain="a.com",le="+Inf"} 3' in lines
+    assert 'fetch_seconds_count{domain="a.com"} 3' in lines
+    assert 'fetch_seconds_sum{domain="a.com"} 5.55' in lines
+
+
+def test_label_values_are_escaped():
+    """测试标签值中的引号和换行被转义"""
+    histogram = Histogram("x", "x", ("name",), buckets=(1,))
+    histogram.observe(0.5, 'a"b\nc')
+    assert 'x_count{name="a\\"b\\nc"} 1' in histogram.render()
+
+
+def test_summary_and_render():
+    """测试摘要统计和整体导出"""
+    stats = PerformanceStats()
+    stats.record_fetch("https://www.example.com/a", "crawl4ai", 2.0)
+    stats.record_ai_call(1.0, "extract", prompt_tokens=1200, completion_tokens=300)
+    stats.record_cache_hit("url")
+    stats.record_cache_miss("url")
+    summary = stats.get_summary()
+    assert summary["crawl"] == {"count": 1, "total_time": 2.0, "avg_time": 2.0}
+    assert summary["ai"]["count"] == 1
+    assert summary["cache"]["hit_rate"] == 50.0
+
+    text = stats.render()
+    assert 'crawler_fetch_seconds_count{domain="example.com",tier="crawl4ai",outcome="ok"} 1' in text
+    assert 'llm_tokens_sum{call_type="extract",kind="prompt"} 1200' in text
+    assert 'cache_requests_total{cache="url",result="hit"} 1' in text
+
+    stats.reset()
+    assert stats.get_summary()["crawl"]["count"] == 0
+
+
+def test_domain_of():
+    assert domain_of("https://www.Example.com:8080/path") == "example.com"
+    assert domain_of("not a url") == "unknown"
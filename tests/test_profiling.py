@@ -0,0 +1,95 @@
+"""
+采样剖析测试
+"""
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware, StackSampler, is_admin_token
+
+
+def busy_loop(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+async def waiting_task():
+    await asyncio.sleep(10)
+
+
+def test_wall_profile_includes_threads_and_suspended_tasks():
+    """测试 wall 模式同时记录事件循环线程栈和挂起任务的 await 链"""
+    async def main():
+        task = asyncio.create_task(waiting_task(), name="waiter")
+        await asyncio.sleep(0)
+        sampler = StackSampler("wall", 0.002).start()
+        busy_loop(0.1)
+        await asyncio.sleep(0.05)
+        sampler.stop()
+        task.cancel()
+        return sampler
+
+    sampler = asyncio.run(main())
+    assert sampler.ticks > 0
+    collapsed = sampler.collapsed()
+    assert "busy_loop (test_profiling.py:" in collapsed
+    assert "task:waiter;waiting_task (test_profiling.py:" in collapsed
+    assert "<await " in collapsed
+
+
+def test_request_profile_follows_one_task():
+    """测试按任务采样：运行时取线程栈，挂起时取 await 链，其他任务不计入"""
+    async def handler():
+        busy_loop(0.05)
+        await asyncio.sleep(0.05)
+
+    async def main():
+        other = asyncio.create_task(waiting_task())
+        task = asyncio.create_task(handler())
+        sampler = StackSampler("wall", 0.002, task=task).start()
+        await task
+        sampler.stop()
+        other.cancel()
+        return sampler
+
+    sampler = asyncio.run(main())
+    roots = {stack[0][0] for stack in sampler.samples}
+    assert roots <= {"running", "awaiting"}
+    assert any(stack[0][0] == "running" and stack[-1][0] == "busy_loop" for stack in sampler.samples)
+    assert any(stack[0][0] == "awaiting" and stack[1][0].endswith("handler") for stack in sampler.samples)
+    assert "waiting_task" not in sampler.collapsed()
+
+
+def test_speedscope_output_matches_samples():
+    """测试 speedscope 输出：帧去重、样本索引有效、权重之和等于总时长"""
+    async def main():
+        sampler = StackSampler("cpu", 0.002).start()
+        busy_loop(0.05)
+        return sampler.stop()
+
+    sampler = asyncio.run(main())
+    profile = sampler.speedscope("test")
+    frames = profile["shared"]["frames"]
+    sampled = profile["profiles"][0]
+    assert sampled["type"] == "sampled"
+    assert len(sampled["samples"]) == len(sampled["weights"]) == len(sampler.samples)
+    assert all(0 <= i < len(frames) for stack in sampled["samples"] for i in stack)
+    assert len({(f["name"], f.get("file"), f.get("line")) for f in frames}) == len(frames)
+    assert abs(sampled["endValue"] - sum(sampled["weights"])) < 0.01
+    assert any(frame["name"] == "busy_loop" for frame in frames)
+
+
+def test_non_ascii_admin_token_is_rejected(monkeypatch):
+    """测试非 ASCII / 非法 UTF-8 的管理令牌视为无效，而不是抛异常"""
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert is_admin_token("secret") and not is_admin_token("sécret") and not is_admin_token(None)
+
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope)
+
+    scope = {"type": "http", "headers": [(b"x-profile", b"1"), (b"x-admin-token", b"\xff\xfe")]}
+    asyncio.run(ProfilingMiddleware(app)(scope, None, None))
+    assert len(calls) == 1
@@ -0,0 +1,63 @@
+"""
+Redis 共享缓存层测试（fakeredis）
+"""
+import asyncio
+import json
+import math
+import zlib
+
+import pytest
+
+from app.services.cache_backends import RedisBackend
+from app.services.cache_service import CacheService
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def make_worker(server, namespace="test"):
+    return CacheService(RedisBackend("", namespace, client=fakeredis.FakeRedis(server=server)))
+
+
+def test_redis_tier_is_shared_with_ttl_and_namespace():
+    """测试 Redis 共享层：其他 worker 可命中、键带命名空间和 TTL、不同命名空间互不可见"""
+    server = fakeredis.FakeServer()
+    worker_a, worker_b = make_worker(server), make_worker(server)
+    worker_a.set_url_content("https://example.com/a", "page")
+    worker_a.set_extraction("hash", {"title": "标题"})
+    worker_a.backend.flush()
+
+    assert asyncio.run(worker_b.get_url_content("https://example.com/a")) == "page"
+    assert asyncio.run(worker_b.get_extraction("hash")) == {"title": "标题"}
+    assert worker_b.url_cache.stats["shared"]["hit"] == 1
+
+    client = fakeredis.FakeRedis(server=server)
+    assert 0 < client.pttl("test:url:https://example.com/a") <= 86400 * 1000
+    assert 86400 * 1000 < client.pttl("test:extraction:hash") <= 604800 * 1000
+    assert asyncio.run(make_worker(server, namespace="other").get_url_content("https://example.com/a")) is None
+
+
+def test_redis_clear_invalidates_other_workers():
+    """测试清空同时删除 Redis 中的键并通知其他 worker 清掉内存层"""
+    server = fakeredis.FakeServer()
+    worker_a, worker_b = make_worker(server), make_worker(server)
+    for worker in (worker_a, worker_b):
+        worker.poll_invalidations()
+    worker_a.set_url_content("https://example.com/a", "page")
+    worker_a.backend.flush()
+    assert asyncio.run(worker_b.get_url_content("https://example.com/a")) == "page"
+
+    worker_a.clear_all()
+    assert fakeredis.FakeRedis(server=server).keys("test:url:*") == []
+    worker_b.apply_invalidations(worker_b.poll_invalidations())
+    assert len(worker_b.url_cache.memory) == 0
+    assert asyncio.run(worker_b.get_url_content("https://example.com/a")) is None
+
+
+def test_redis_keys_without_ttl_do_not_expire():
+    """测试 Redis 中没有 TTL 的键按不过期处理"""
+    server = fakeredis.FakeServer()
+    worker = make_worker(server)
+    blob = zlib.compress(json.dumps("page").encode())
+    fakeredis.FakeRedis(server=server).set("test:url:https://example.com/a", blob)
+    assert worker.backend.get("url", "https://example.com/a") == (blob, math.inf)
+    assert asyncio.run(worker.get_url_content("https://example.com/a")) == "page"
@@ -0,0 +1,24 @@
+"""
+自适应定时采集测试
+"""
+from app.core.config import settings
+from app.services.scheduler import next_crawl_interval
+
+
+def test_interval_shrinks_when_source_is_busy():
+    """测试待采集队列有积压时缩短间隔，新文章已处理完时保持不变"""
+    assert next_crawl_interval(240, 3, has_backlog=True) == 120
+    assert next_crawl_interval(240, 3) == 240
+
+
+def test_interval_backs_off_when_dormant_or_failing():
+    """测试无新文章或失败时拉长间隔"""
+    assert next_crawl_interval(240, 0) == 360
+    assert next_crawl_interval(240, 0, ok=False) == 480
+
+
+def test_interval_is_clamped():
+    """测试间隔限制在最小/最大值之间，未设置时使用默认值"""
+    assert next_crawl_interval(settings.CRAWL_INTERVAL_MIN_MINUTES, 3, has_backlog=True) == settings.CRAWL_INTERVAL_MIN_MINUTES
+    assert next_crawl_interval(settings.CRAWL_INTERVAL_MAX_MINUTES, 0) == settings.CRAWL_INTERVAL_MAX_MINUTES
+    assert next_crawl_interval(None, 1) == settings.CRAWL_INTERVAL_DEFAULT_MINUTES
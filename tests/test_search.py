@@ -0,0 +1,30 @@
+"""
+情报检索辅助函数测试
+"""
+from app.services.search import (
+    HEADLINE_START, HEADLINE_STOP, parse_search_query, escape_like, render_headline, mark_terms, highlight_snippet
+)
+
+
+def test_parse_search_query_splits_cjk_and_latin():
+    """测试查询拆分为英文部分和汉字串"""
+    latin, cjk = parse_search_query('sanctions 制裁 "export control" 出口管制 制裁')
+    assert latin == 'sanctions "export control"'
+    assert cjk == ["制裁", "出口管制"]
+    assert parse_search_query("  -  ") == ("", [])
+    assert escape_like("100%_a\\b") == "100\\%\\_a\\\\b"
+
+
+def test_headline_is_escaped_and_marked():
+    """测试高亮片段先转义再加 <mark>"""
+    headline = f"<b>New</b> {HEADLINE_START}sanctions{HEADLINE_STOP} on 制裁 list"
+    rendered = mark_terms(render_headline(headline), ["制裁"])
+    assert rendered == "&lt;b&gt;New&lt;/b&gt; <mark>sanctions</mark> on <mark>制裁</mark> list"
+
+
+def test_highlight_snippet_centers_first_hit():
+    """测试纯中文查询的片段截取"""
+    text = "背景" * 100 + "美国宣布新的出口管制措施" + "其他" * 100
+    snippet = highlight_snippet(text, ["出口管制"], width=40)
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert "<mark>出口管制</mark>" in snippet
@@ -0,0 +1,28 @@
+"""
+趋势汇总测试
+"""
+from datetime import date, datetime
+
+from app.services.trends import rollup_deltas, rollup_tags
+
+
+def test_rollup_tags_cleans_and_dedupes():
+    """测试标签清洗"""
+    assert rollup_tags([" 制裁 ", "制裁", "", None, "Sanctions"]) == ["制裁", "Sanctions"]
+    assert rollup_tags("not a list") == []
+
+
+def test_rollup_deltas_counts_items_once_in_total_rows():
+    """测试总数行每条情报只计一次，标签行按标签计数"""
+    created = datetime(2026, 1, 10, 8, 0)
+    items = [
+        {"source_id": "s1", "content_type": "news", "risk_tags": ["制裁", "能源"], "published_on": date(2026, 1, 8), "created_at": created},
+        {"source_id": "s1", "content_type": "news", "risk_tags": ["制裁"], "published_on": None, "created_at": created},
+        {"source_id": None, "content_type": None, "risk_tags": None, "created_at": created},
+    ]
+    deltas = rollup_deltas(items)
+    assert deltas[(date(2026, 1, 8), "s1", "news", "")] == 1
+    assert deltas[(date(2026, 1, 8), "s1", "news", "制裁")] == 1
+    assert deltas[(date(2026, 1, 10), "s1", "news", "制裁")] == 1
+    assert deltas[(date(2026, 1, 10), "", "", "")] == 1
+    assert sum(v for k, v in deltas.items() if k[3] == "") == 3
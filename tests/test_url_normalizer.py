@@ -0,0 +1,19 @@
+"""
+URL 规范化测试
+"""
+from app.services.url_normalizer import normalize_url
+
+
+def test_normalize_url_strips_tracking_fragment_and_slash():
+    """测试去掉跟踪参数、锚点和末尾斜杠"""
+    assert normalize_url("HTTPS://News.Example.com:443/Article/123/?utm_source=tg&id=5&fbclid=x#comments") == \
+        "https://news.example.com/Article/123?id=5"
+    assert normalize_url("https://example.com/") == normalize_url("https://example.com")
+
+
+def test_normalize_url_keeps_meaningful_parts():
+    """测试保留非默认端口和业务参数（参数顺序无关）"""
+    assert normalize_url("http://example.com:8080/list?page=2&cat=1") == \
+        normalize_url("http://example.com:8080/list/?cat=1&page=2")
+    assert normalize_url("http://example.com:8080/a") != normalize_url("http://example.com/a")
+    assert normalize_url("not a url") == "not a url"